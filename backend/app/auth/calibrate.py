@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Calibrate the password hash cost for this host.
+
+Times werkzeug's hash at increasing cost and picks the most expensive
+parameters whose median time stays within the target, but never less
+than werkzeug's default cost, then records them as
+PASSWORD_HASH_METHOD in the env file Settings reads. Existing hashes
+of lower cost are upgraded on the next successful login.
+
+Usage, from the repository root:
+    python -m backend.app.auth.calibrate --target-ms 250
+    python -m backend.app.auth.calibrate --algorithm pbkdf2 --dry-run
+"""
+import argparse
+import os
+import statistics
+import time
+
+from werkzeug.security import generate_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+from ..settings import ENV_FILE
+
+
+DEFAULT_ENV_FILE = ENV_FILE
+SETTING = "PASSWORD_HASH_METHOD"
+
+
+def time_method(method: str, rounds: int = 5) -> float:
+    """Median milliseconds to hash with a method"""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash("calibration password", method=method)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def calibrate_scrypt(target_ms: float, rounds: int) -> tuple:
+    """Largest power of two work factor within the target, from werkzeug's 2**15"""
+    best = ("scrypt:32768:8:1", time_method("scrypt:32768:8:1", rounds))
+    for exponent in range(16, 21):
+        method = f"scrypt:{2 ** exponent}:8:1"
+        elapsed = time_method(method, rounds)
+        if elapsed > target_ms:
+            break
+        best = (method, elapsed)
+    return best
+
+def calibrate_pbkdf2(target_ms: float, rounds: int) -> tuple:
+    """Iteration count scaled linearly from a probe, from werkzeug's default"""
+    probe = 100_000
+    per_iteration = time_method(f"pbkdf2:sha256:{probe}", rounds) / probe
+    iterations = max(DEFAULT_PBKDF2_ITERATIONS, int(target_ms / per_iteration) // 10_000 * 10_000)
+    method = f"pbkdf2:sha256:{iterations}"
+    return method, time_method(method, rounds)
+
+def write_setting(env_file: str, method: str) -> None:
+    """Set PASSWORD_HASH_METHOD in the env file, keeping other lines"""
+    lines = []
+    if os.path.exists(env_file):
+        with open(env_file) as f:
+            lines = [line for line in f.read().splitlines() if not line.startswith(f"{SETTING}=")]
+    lines.append(f"{SETTING}={method}")
+    os.makedirs(os.path.dirname(env_file) or ".", exist_ok=True)
+    with open(env_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target-ms", type=float, default=250, help="hash time budget per login")
+    parser.add_argument("--algorithm", choices=("scrypt", "pbkdf2"), default="scrypt")
+    parser.add_argument("--rounds", type=int, default=5, help="timings per candidate")
+    parser.add_argument("--env-file", default=DEFAULT_ENV_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="print the result only")
+    args = parser.parse_args()
+
+    calibrate = calibrate_scrypt if args.algorithm == "scrypt" else calibrate_pbkdf2
+    method, elapsed = calibrate(args.target_ms, args.rounds)
+    print(f"{SETTING}={method}  ({elapsed:.0f} ms per hash, target {args.target_ms:.0f} ms)")
+    if elapsed > args.target_ms:
+        print("werkzeug's default cost exceeds the target on this host; keeping it rather than weakening hashes")
+
+    if not args.dry_run:
+        write_setting(args.env_file, method)
+        print(f"Recorded in {args.env_file}; restart the app to apply")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,65 +3,179 @@
 Authentication dependencies
 """
 import logging
+from dataclasses import dataclass
+from typing import Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.user import User, UserRole, UserStatus
-from .jwt import verify_token
-from ..db.session import get_db_session
+from .jwt import verify_token, is_stateless_payload
+from .identity_cache import identity_cache
+from .token_versions import token_versions
+from .revocation import revocation_list
+from ..db.session import get_async_db
+from ..settings import get_settings
 
 
 logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Get current authenticated user"""
-    logger = logging.getLogger(__name__)
-    logger.info(f"Verifying token: {token[:20]}...")  # Log first 20 chars of token for debugging
 
-    credentials_exception = HTTPException(
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """
+    Identity built from the claims of a stateless access token.
+    Carries what authorization and most routes need without a
+    database lookup.
+    """
+    id: int
+    username: str
+    role: UserRole
+    status: UserStatus
+
+    @classmethod
+    def from_claims(cls, payload: dict):
+        return cls(
+            id=int(payload["uid"]),
+            username=payload["sub"],
+            role=UserRole[str(payload["role"]).upper()],
+            status=UserStatus(payload["status"])
+        )
+
+
+# Either identity exposes id, username, role and status
+Principal = Union[TokenPrincipal, User]
+
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = verify_token(token)
-        if payload is None:
-            logger.warning("Token verification failed")
-            raise credentials_exception
+async def authenticate_token(token: str) -> dict:
+    """
+    Verify a token and check it has not been revoked
+    """
+    payload = verify_token(token)
+    if payload is None:
+        logger.warning("Token verification failed")
+        raise credentials_exception()
+    if await revocation_list.is_revoked(payload.get("jti")):
+        logger.warning(f"Revoked token presented for user: {payload.get('sub')}")
+        raise credentials_exception()
+    return payload
+
+async def load_user(username: str, session: AsyncSession):
+    """
+    Resolve a username to a User attached to the request's session.
+    A cached identity is merged in without querying the database.
+    """
+    identity = await identity_cache.get(username)
+    if identity is not None:
+        return await User.merge_identity_async(identity, session)
 
+    user = await User.get_user_by_username_async(username, session=session)
+    if user is None:
+        logger.warning(f"User {username} not found in database")
+        return None
+    await identity_cache.set(username, user.to_identity())
+    return user
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get current authenticated user. The user is attached to the
+    request's session, so routes can modify it without a merge.
+    """
+    logger.info(f"Verifying token: {token[:20]}...")  # Log first 20 chars of token for debugging
+    return await user_from_payload(await authenticate_token(token), session)
+
+async def user_from_payload(payload: dict, session: AsyncSession):
+    """
+    Resolve the subject of an authenticated token to a User
+    """
+    try:
         username: str = payload.get("sub")
         if username is None:
             logger.warning("Username not found in token")
-            raise credentials_exception
-
-        with get_db_session() as session:
-            user = User.get_user_by_username(username)
-            if user is None:
-                logger.warning(f"User {username} not found in database")
-                raise credentials_exception
-            logger.info(f"User authenticated: {username}, Role: {user.role}")
-            return user
+            raise credentials_exception()
+
+        user = await load_user(username, session)
+        if user is None:
+            raise credentials_exception()
+        logger.info(f"User authenticated: {username}, Role: {user.role}")
+        return user
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
-        raise credentials_exception
+        raise credentials_exception()
 
-async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    Get the identity behind a token. With STATELESS_AUTH enabled a
+    token carrying versioned claims is authorized from the claims
+    alone; any other token, or a token version store that cannot be
+    reached, is resolved to a User as in get_current_user.
+    """
+    payload = await authenticate_token(token)
+
+    if get_settings().STATELESS_AUTH and is_stateless_payload(payload):
+        try:
+            current = await token_versions.is_current(int(payload["uid"]), int(payload["tv"]))
+        except Exception as e:
+            logger.warning(f"Token version check failed, falling back to database: {str(e)}")
+        else:
+            if not current:
+                logger.warning(f"Revoked token presented for user: {payload['sub']}")
+                raise credentials_exception()
+            try:
+                return TokenPrincipal.from_claims(payload)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Malformed token claims: {str(e)}")
+                raise credentials_exception()
+
+    return await user_from_payload(payload, session)
+
+async def get_active_principal(
+    principal: Principal = Depends(get_current_principal)
 ):
-    """Check if user is active"""
-    if current_user.status != UserStatus.ACTIVE:
+    """Check if the token's user is active"""
+    if principal.status != UserStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return principal
 
-async def get_admin_user(current_user: User = Depends(get_current_active_user)):
+async def get_current_active_user(
+    principal: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """
+    Check if user is active and return the full User for routes
+    that read or modify the profile
+    """
+    if isinstance(principal, User):
+        return principal
+
+    user = await load_user(principal.username, session)
+    if user is None:
+        raise credentials_exception()
+    return user
+
+async def get_admin_user(
+    current_user: Principal = Depends(get_active_principal)
+):
     """Verify admin access using UserRole enum"""
     logger.info(f"Checking admin access for user: {current_user.username}, Role: {current_user.role}")
-    
+
     if current_user.role != UserRole.ADMIN:
         logger.warning(f"Admin access denied for user: {current_user.username}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
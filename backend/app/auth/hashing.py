@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Password hashing off the event loop.
+
+Hashing and verifying a password is deliberately slow CPU work.
+Running it inside an async route blocks every other request on the
+worker, so PasswordHasher runs it on a process pool instead. At most
+max_concurrency hashes are submitted at once; further callers wait in
+a queue whose depth is reported by stats() and, when max_queue is
+set, callers beyond that depth are turned away with HasherBusy.
+
+The hash method (and so its cost) comes from PASSWORD_HASH_METHOD,
+which `python -m backend.app.auth.calibrate` measures for the host.
+Hashes made at a lower cost are reported by needs_rehash so login can
+upgrade them; a stronger hash is never rewritten to a weaker one.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def normalize_method(method: str) -> str:
+    """
+    Spell out werkzeug's defaults so a method string matches the
+    prefix of the hashes it produces, e.g. scrypt -> scrypt:32768:8:1
+    """
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        args = (args + ["sha256"])[:1] + (args[1:] or [str(DEFAULT_PBKDF2_ITERATIONS)])
+    return ":".join([name, *args])
+
+def hash_method(password_hash: str) -> str:
+    """The method prefix of a werkzeug hash"""
+    return password_hash.split("$", 1)[0]
+
+def method_cost(method: str) -> tuple:
+    """
+    (algorithm, work) of a method, work comparable only within one
+    algorithm: n * r * p for scrypt, iterations for pbkdf2
+    """
+    name, *args = normalize_method(method).split(":")
+    try:
+        if name == "scrypt":
+            n, r, p = map(int, args)
+            return name, n * r * p
+        if name == "pbkdf2":
+            return f"{name}:{args[0]}", int(args[1])
+    except (ValueError, IndexError):
+        pass
+    return method, 0
+
+def _hash(password: str, method: str = "") -> str:
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing on a bounded process pool
+    """
+    def __init__(self, workers: int = 0, max_concurrency: int = 0, max_queue: int = 0,
+                 method: str = ""):
+        self.workers = workers
+        self.method = method
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers: Optional[int] = None, max_concurrency: Optional[int] = None,
+                  max_queue: Optional[int] = None, method: Optional[str] = None) -> None:
+        """
+        Apply settings at application startup. A worker count of 0
+        means one per CPU; a concurrency cap of 0 means one hash in
+        flight per worker; an empty method keeps werkzeug's default.
+        """
+        self.shutdown()
+        if method is not None:
+            self.method = method
+        if workers is not None:
+            self.workers = workers
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if max_queue is not None:
+            self.max_queue = max_queue
+
+    @property
+    def pool_size(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+    @property
+    def concurrency(self) -> int:
+        return self.max_concurrency or self.pool_size
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password on the pool
+        """
+        return await self._run(_hash, password, self.method)
+
+    def hash_sync(self, password: str) -> str:
+        """
+        Hash a password in the calling thread, for code that
+        is not running on the event loop
+        """
+        return _hash(password, self.method)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        True if a hash costs less than the configured method. A hash
+        of another algorithm is moved to the configured one only if
+        that is at least werkzeug's default cost for its algorithm.
+        Without a configured method nothing is upgraded.
+        """
+        if not self.method or not password_hash:
+            return False
+        stored_algorithm, stored_work = method_cost(hash_method(password_hash))
+        algorithm, work = method_cost(self.method)
+        if stored_algorithm == algorithm:
+            return stored_work < work
+        return work >= method_cost(algorithm.split(":")[0])[1]
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        """
+        Check a password against a hash on the pool
+        """
+        return await self._run(_verify, password_hash, password)
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._slots = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue and throughput counters for the metrics endpoint
+        """
+        return {
+            "method": normalize_method(self.method) if self.method else "default",
+            "workers": self.pool_size,
+            "max_concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self.wait_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+                self._slots = asyncio.Semaphore(self.concurrency)
+                logger.info(f"Started password hashing pool with {self.pool_size} workers")
+            return self._executor
+
+    async def _run(self, func, *args):
+        executor = self._get_executor()
+        slots = self._slots
+
+        if self.max_queue and slots.locked() and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HasherBusy("Too many password checks in progress")
+
+        queued_at = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await slots.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            slots.release()
+            self.completed += 1
+            self.wait_seconds += started_at - queued_at
+            self.run_seconds += time.perf_counter() - started_at
+
+
+password_hasher = PasswordHasher()
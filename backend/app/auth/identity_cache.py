@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Identity cache for authenticated requests.
+
+get_current_user resolves the JWT subject to a User on every
+request. This cache keeps a snapshot of the user's columns keyed
+by username so that lookup can skip the database. Entries are
+evicted on TTL expiry, in LRU order when full, and explicitly
+whenever a user's row changes (see invalidate_on_commit).
+
+With the in-process backend each worker has its own entries, so an
+invalidation is also published on a Redis pub/sub channel, the way
+the revocation list spreads revoked tokens, and every worker drops
+the username when the message arrives. A demoted or deactivated user
+is then not served from another worker's memory until the TTL ends.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+# Key in Session.info holding usernames to invalidate after commit
+PENDING_INVALIDATIONS = "identity_cache_pending"
+
+
+class IdentityCache:
+    """
+    Bounded TTL/LRU cache of user identities.
+
+    By default entries live in process memory, and invalidations
+    reach the other workers over the channel once start() is given
+    a Redis client. When a Redis client is configured as the backend,
+    entries are stored in Redis instead so every worker shares them.
+    """
+    def __init__(self, maxsize: int = 10_000, ttl: int = 60, redis=None,
+                 key_prefix: str = "identity:", channel: str = "identity_invalidated"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.channel = channel
+        # Client invalidations are published with, for the local backend
+        self.broadcast = None
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[int] = None,
+                  redis=None, enabled: Optional[bool] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if ttl is not None:
+            self.ttl = ttl
+        if enabled is not None:
+            self.enabled = enabled
+        self.redis = redis
+        self.clear()
+
+    async def start(self, redis) -> None:
+        """
+        Publish invalidations and follow the other workers' ones.
+        Only the local backend needs it: Redis entries are shared.
+        """
+        await self.stop()
+        if self.redis is None and redis is not None:
+            self.broadcast = redis
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stop the pub/sub listener
+        """
+        self.broadcast = None
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached identity for a username, or None
+        """
+        if not self.enabled:
+            return None
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self.key_prefix + username)
+            except Exception as e:
+                logger.warning(f"Identity cache read failed, falling back to database: {str(e)}")
+                raw = None
+            data = json.loads(raw) if raw else None
+        else:
+            data = self._get_local(username)
+
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    async def set(self, username: str, data: Dict[str, Any]) -> None:
+        """
+        Store an identity snapshot for a username
+        """
+        if not self.enabled:
+            return
+
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.key_prefix + username, json.dumps(data), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Identity cache write failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def invalidate(self, username: str) -> None:
+        """
+        Drop a username from the cache
+        """
+        self.invalidations += 1
+        self._drop_local(username)
+        await self._propagate(username)
+
+    def invalidate_soon(self, username: str) -> None:
+        """
+        Synchronous invalidation. The Redis delete or publish, if
+        any, is scheduled on the running event loop.
+        """
+        self._drop_local(username)
+        if self.redis is None and self.broadcast is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"No event loop to invalidate {username} in Redis; entry expires in {self.ttl}s")
+            return
+        loop.create_task(self._propagate(username))
+
+    def invalidate_on_commit(self, session, username: Optional[str]) -> None:
+        """
+        Invalidate a username now and again once the session commits,
+        so a request that re-reads the old row before the commit lands
+        cannot leave a stale entry behind.
+        """
+        if not username:
+            return
+        self.invalidations += 1
+        self.invalidate_soon(username)
+        session.info.setdefault(PENDING_INVALIDATIONS, set()).add(username)
+
+    def clear(self) -> None:
+        """
+        Drop every local entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters for the metrics endpoint
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis is not None else "local",
+            "enabled": self.enabled,
+            "broadcasting": self._listener is not None and not self._listener.done(),
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _get_local(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return data
+
+    def _drop_local(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    async def _propagate(self, username: str) -> None:
+        """
+        Delete the shared entry, or tell the other workers to drop theirs
+        """
+        try:
+            if self.redis is not None:
+                await self.redis.delete(self.key_prefix + username)
+            elif self.broadcast is not None:
+                await self.broadcast.publish(self.channel, username)
+        except Exception as e:
+            logger.error(f"Identity cache invalidation failed for {username}: {str(e)}")
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.broadcast.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Invalidations sent while not subscribed are lost
+                self.clear()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._drop_local(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Identity invalidation listener failed, retrying: {str(e)}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    """Flush invalidations recorded with invalidate_on_commit"""
+    for username in session.info.pop(PENDING_INVALIDATIONS, ()):
+        identity_cache.invalidate_soon(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    """Nothing changed, so recorded invalidations are moot"""
+    session.info.pop(PENDING_INVALIDATIONS, None)
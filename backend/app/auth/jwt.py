@@ -3,23 +3,13 @@
 JWT Authentication handling
 """
 import secrets
-import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from dotenv import load_dotenv
+from .token_cache import token_cache
+from ..settings import get_settings
 
 
-# Setting the secret key for JWT authentication
-# Explicit path to the .env file
-dotenv_path = os.path.join(os.path.dirname(__file__), "env", ".env")
-load_dotenv(dotenv_path)
-
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", secrets.token_urlsafe(32))
-
-if not SECRET_KEY:
-    raise ValueError("JWT_SECRET_KEY must be set in environment variables")
-
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
@@ -36,14 +26,39 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     
+    # A unique id lets a single token be revoked on logout
+    to_encode.setdefault("jti", secrets.token_urlsafe(16))
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, get_settings().JWT_SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str):
-    """Verify JWT token"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """
+    Verify JWT token. Verified payloads are cached until the
+    token expires (see token_cache).
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
         return payload
+    try:
+        payload = jwt.decode(token, get_settings().JWT_SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    token_cache.set(token, payload)
+    return payload
+
+def user_claims(user, token_version: Optional[int] = None) -> dict:
+    """
+    Claims identifying a user. Passing the user's token version
+    adds the uid, status and tv claims used by stateless auth.
+    """
+    role_value = user.role.value if hasattr(user.role, 'value') else str(user.role)
+    claims = {"sub": user.username, "role": role_value}
+    if token_version is not None:
+        status_value = user.status.value if hasattr(user.status, 'value') else str(user.status)
+        claims.update({"uid": user.id, "status": status_value, "tv": token_version})
+    return claims
+
+def is_stateless_payload(payload: dict) -> bool:
+    """True if a decoded token carries the stateless auth claims"""
+    return all(key in payload for key in ("sub", "uid", "role", "status", "tv"))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Brute-force throttling for the login endpoint.
+
+Every login attempt is counted in two Redis sliding windows, one per
+username and one per client IP, by a single Lua script, so the check
+costs one round trip and happens before any database or hashing work.
+A successful login is taken back from both windows: only failures
+count against a client IP.
+When a window is full the attempt is rejected with the number of
+seconds until the oldest attempt leaves the window.
+
+Each worker also remembers keys Redis has blocked until their block
+ends, and counts attempts per key over the last second, so a burst
+against one username or from one IP is rejected in memory instead of
+hitting Redis for every request.
+"""
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one sorted set per window. ARGV: now (ms), window (ms),
+# attempt id, then the limit for each key in KEYS order. Returns the
+# ms to wait for each key; the attempt is recorded only if all are 0.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local waits = {}
+local blocked = false
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    waits[i] = 0
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        waits[i] = math.max(1, tonumber(oldest[2]) + window - now)
+        blocked = true
+    end
+end
+if not blocked then
+    for _, key in ipairs(KEYS) do
+        redis.call('ZADD', key, now, ARGV[3])
+        redis.call('PEXPIRE', key, window)
+    end
+end
+return waits
+"""
+
+
+class LoginThrottle:
+    """
+    Sliding window limits on login attempts per username and per IP
+    """
+    def __init__(self, redis=None, max_per_username: int = 5, max_per_ip: int = 50,
+                 window: int = 300, key_prefix: str = "login_attempts:", local_maxsize: int = 10_000):
+        self.max_per_username = max_per_username
+        self.max_per_ip = max_per_ip
+        self.window = window
+        self.key_prefix = key_prefix
+        self.local_maxsize = local_maxsize
+        self.enabled = True
+        self.allowed = 0
+        self.rejected = 0
+        self.rejected_locally = 0
+        self.redis_checks = 0
+        self.redis_errors = 0
+        self._blocked: Dict[str, float] = {}
+        self._recent: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.configure(redis=redis)
+
+    def configure(self, redis=None, max_per_username: Optional[int] = None, max_per_ip: Optional[int] = None,
+                  window: Optional[int] = None, enabled: Optional[bool] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if max_per_username is not None:
+            self.max_per_username = max_per_username
+        if max_per_ip is not None:
+            self.max_per_ip = max_per_ip
+        if window is not None:
+            self.window = window
+        if enabled is not None:
+            self.enabled = enabled
+        self.redis = redis
+        self._script = redis.register_script(SLIDING_WINDOW_SCRIPT) if redis is not None else None
+        with self._lock:
+            self._blocked.clear()
+            self._recent.clear()
+
+    def _keys(self, username: str, client_ip: str):
+        return (
+            (f"{self.key_prefix}user:{username.strip().lower()}", self.max_per_username),
+            (f"{self.key_prefix}ip:{client_ip}", self.max_per_ip),
+        )
+
+    async def check(self, username: str, client_ip: str) -> int:
+        """
+        Count a login attempt. Returns 0 if it may proceed, otherwise
+        the seconds to wait. If Redis is unreachable attempts are
+        allowed rather than locking everyone out.
+        """
+        if not self.enabled or self._script is None:
+            return 0
+
+        keys = self._keys(username, client_ip)
+        wait = self._check_local(keys)
+        if wait:
+            self.rejected += 1
+            self.rejected_locally += 1
+            return wait
+
+        self.redis_checks += 1
+        try:
+            waits = await self._script(
+                keys=[key for key, _ in keys],
+                args=[int(time.time() * 1000), self.window * 1000, uuid.uuid4().hex,
+                      *(limit for _, limit in keys)]
+            )
+        except Exception as e:
+            self.redis_errors += 1
+            logger.error(f"Login throttle check failed, allowing attempt: {str(e)}")
+            return 0
+
+        wait = 0
+        for (key, _), wait_ms in zip(keys, waits):
+            if int(wait_ms) > 0:
+                key_wait = math.ceil(int(wait_ms) / 1000)
+                self._block_locally(key, key_wait)
+                wait = max(wait, key_wait)
+
+        if wait:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def record_success(self, username: str, client_ip: str) -> None:
+        """
+        Forget a username's attempts after a successful login, and
+        take the attempt back from the IP's window: only failures
+        count against an IP, so many users behind one proxy or NAT
+        are not locked out by logging in
+        """
+        if self.redis is None:
+            return
+        (user_key, _), (ip_key, _) = self._keys(username, client_ip)
+        with self._lock:
+            self._blocked.pop(user_key, None)
+            self._recent.pop(user_key, None)
+            recent = self._recent.get(ip_key)
+            if recent:
+                recent.pop()
+        try:
+            await self.redis.delete(user_key)
+            # Attempts are interchangeable; removing the newest keeps the count right
+            await self.redis.zpopmax(ip_key)
+        except Exception as e:
+            logger.warning(f"Failed to reset login attempts for {username}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "enabled": self.enabled,
+            "max_per_username": self.max_per_username,
+            "max_per_ip": self.max_per_ip,
+            "window": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "rejected_locally": self.rejected_locally,
+            "redis_checks": self.redis_checks,
+            "redis_errors": self.redis_errors,
+            "locally_blocked_keys": len(self._blocked),
+        }
+
+    def _check_local(self, keys) -> int:
+        """
+        Reject from memory while a key is blocked, or when more
+        attempts than its limit arrived within the last second
+        """
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key, limit in keys:
+                blocked_until = self._blocked.get(key)
+                if blocked_until is not None:
+                    if blocked_until > now:
+                        wait = max(wait, math.ceil(blocked_until - now))
+                        continue
+                    del self._blocked[key]
+
+                recent = self._recent.setdefault(key, deque())
+                while recent and recent[0] <= now - 1:
+                    recent.popleft()
+                recent.append(now)
+                if len(recent) > limit:
+                    wait = max(wait, 1)
+
+            if len(self._recent) > self.local_maxsize:
+                self._recent = {k: times for k, times in self._recent.items() if times and times[-1] > now - 1}
+        return wait
+
+    def _block_locally(self, key: str, seconds: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._blocked) >= self.local_maxsize:
+                self._blocked = {k: end for k, end in self._blocked.items() if end > now}
+            self._blocked[key] = now + seconds
+
+
+login_throttle = LoginThrottle()
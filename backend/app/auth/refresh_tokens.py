@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Opaque, rotating refresh tokens.
+
+A refresh token is a random string handed out at login. Redis keeps
+only its SHA-256 digest, mapped to the claims needed to mint a new
+access token, so renewing a session needs neither a password check
+nor a database query. Every use rotates the token: the presented one
+is consumed and a new one is issued in the same family. Presenting a
+token that was already consumed means it leaked (or a client raced
+itself), so the whole family is revoked and the user must log in.
+"""
+import hashlib
+import json
+import logging
+import secrets
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenReused(Exception):
+    """Raised when a consumed refresh token is presented again"""
+
+
+class RefreshTokenStore:
+    """
+    Refresh token records in Redis, keyed by token digest
+    """
+    def __init__(self, redis=None, ttl: int = 14 * 24 * 3600, key_prefix: str = "refresh:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.issued = 0
+        self.rotated = 0
+        self.reuse_detected = 0
+
+    def configure(self, redis=None, ttl: Optional[int] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        self.redis = redis
+        if ttl is not None:
+            self.ttl = ttl
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _token_key(self, digest: str) -> str:
+        return f"{self.key_prefix}token:{digest}"
+
+    def _used_key(self, digest: str) -> str:
+        return f"{self.key_prefix}used:{digest}"
+
+    def _family_key(self, family: str) -> str:
+        return f"{self.key_prefix}family:{family}"
+
+    async def issue(self, claims: Dict[str, Any], family: Optional[str] = None) -> str:
+        """
+        Issue a refresh token carrying the given access token claims.
+        A new family starts at login; rotation keeps the family.
+        """
+        token = secrets.token_urlsafe(32)
+        digest = self.digest(token)
+        family = family or uuid.uuid4().hex
+        record = json.dumps({"family": family, "claims": claims})
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(self._token_key(digest), record, ex=self.ttl)
+        pipe.set(self._family_key(family), digest, ex=self.ttl)
+        await pipe.execute()
+        self.issued += 1
+        return token
+
+    async def rotate(self, token: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Consume a refresh token. Returns its claims and a new refresh
+        token, None if the token is unknown or expired, and raises
+        RefreshTokenReused if it was already consumed.
+        """
+        digest = self.digest(token)
+
+        # GET and DEL in one transaction so a token can be consumed once
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.get(self._token_key(digest))
+        pipe.delete(self._token_key(digest))
+        raw, _ = await pipe.execute()
+
+        if raw is None:
+            family = await self.redis.get(self._used_key(digest))
+            if family is not None:
+                self.reuse_detected += 1
+                await self.revoke_family(family)
+                raise RefreshTokenReused(f"Refresh token reuse in family {family}")
+            return None
+
+        record = json.loads(raw)
+        family = record["family"]
+        if await self.redis.get(self._family_key(family)) != digest:
+            # The family was revoked since this token was issued
+            return None
+
+        await self.redis.set(self._used_key(digest), family, ex=self.ttl)
+        new_token = await self.issue(record["claims"], family=family)
+        self.rotated += 1
+        return record["claims"], new_token
+
+    async def revoke(self, token: str) -> None:
+        """
+        Revoke the family a refresh token belongs to
+        """
+        digest = self.digest(token)
+        raw = await self.redis.get(self._token_key(digest))
+        family = json.loads(raw)["family"] if raw else await self.redis.get(self._used_key(digest))
+        if family is not None:
+            await self.revoke_family(family)
+
+    async def revoke_family(self, family: str) -> None:
+        """
+        Invalidate the current token of a family
+        """
+        current = await self.redis.get(self._family_key(family))
+        keys = [self._family_key(family)]
+        if current is not None:
+            keys.append(self._token_key(current))
+        await self.redis.delete(*keys)
+        logger.info(f"Refresh token family {family} revoked")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "issued": self.issued,
+            "rotated": self.rotated,
+            "reuse_detected": self.reuse_detected,
+        }
+
+
+refresh_tokens = RefreshTokenStore()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Revocation list for access tokens.
+
+Logging out revokes the token's jti: a Redis key that expires when
+the token would have, plus a message on a pub/sub channel. Every
+worker keeps a Bloom filter of revoked jtis, fed by that channel and
+rebuilt from Redis periodically, so checking a token that was never
+revoked costs a few hashes in memory. Only a filter hit, which is
+either a revoked token or a rare false positive, is looked up in
+Redis.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter over strings
+    """
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: two 64 bit halves of one digest give all k positions
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked token ids in Redis, mirrored in a local Bloom filter
+    """
+    def __init__(self, redis=None, key_prefix: str = "revoked_jti:", channel: str = "revoked_jti",
+                 capacity: int = 100_000, error_rate: float = 0.001, rebuild_interval: int = 300):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.channel = channel
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.checks = 0
+        self.filter_hits = 0
+        self.revoked_hits = 0
+        self.revocations = 0
+        self._filter = BloomFilter(capacity, error_rate)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, redis, capacity: Optional[int] = None, error_rate: Optional[float] = None,
+                    rebuild_interval: Optional[int] = None) -> None:
+        """
+        Apply settings and start following the revocation channel
+        """
+        await self.stop()
+        self.redis = redis
+        if capacity is not None:
+            self.capacity = capacity
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if rebuild_interval is not None:
+            self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        if redis is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stop the pub/sub listener
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        Revoke a token id until the token's expiry (a unix timestamp)
+        """
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+        await self.redis.set(self.key_prefix + jti, 1, ex=ttl)
+        await self.redis.publish(self.channel, jti)
+        self._filter.add(jti)
+        self.revocations += 1
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        True if a token id has been revoked. Redis is only asked
+        when the local filter reports a possible match; if it can't
+        be reached the token is treated as revoked.
+        """
+        if not jti:
+            return False
+        self.checks += 1
+        if jti not in self._filter:
+            return False
+
+        self.filter_hits += 1
+        try:
+            revoked = bool(await self.redis.exists(self.key_prefix + jti))
+        except Exception as e:
+            logger.error(f"Revocation lookup failed, rejecting token: {str(e)}")
+            return True
+        if revoked:
+            self.revoked_hits += 1
+        return revoked
+
+    async def rebuild(self) -> None:
+        """
+        Replace the filter with one built from the keys still in
+        Redis, dropping revocations that have expired
+        """
+        rebuilt = BloomFilter(self.capacity, self.error_rate)
+        async for key in self.redis.scan_iter(match=self.key_prefix + "*", count=1000):
+            rebuilt.add(key[len(self.key_prefix):])
+        self._filter = rebuilt
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Filter counters for the metrics endpoint
+        """
+        false_positives = self.filter_hits - self.revoked_hits
+        return {
+            "listening": self._listener is not None and not self._listener.done(),
+            "filter_items": self._filter.count,
+            "filter_bits": self._filter.size,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "revoked_hits": self.revoked_hits,
+            "false_positives": false_positives,
+            "redis_lookup_rate": round(self.filter_hits / self.checks, 4) if self.checks else 0.0,
+            "revocations": self.revocations,
+        }
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Subscribe first so nothing revoked during the rebuild is missed
+                await self.rebuild()
+                next_rebuild = time.monotonic() + self.rebuild_interval
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._filter.add(message["data"])
+                    if time.monotonic() >= next_rebuild:
+                        await self.rebuild()
+                        next_rebuild = time.monotonic() + self.rebuild_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Revocation listener failed, retrying: {str(e)}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cache of verified JWT payloads.
+
+Clients send the same bearer token on every request, and verifying
+it means base64 decoding, an HMAC check and JSON parsing each time.
+verify_token keeps the decoded payload here, keyed by a digest of the
+token, until the token's own exp. Only successfully verified tokens
+are stored, so a cache hit is as good as a fresh verification.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of token digest -> decoded payload
+    """
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize: Optional[int] = None, enabled: Optional[bool] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if enabled is not None:
+            self.enabled = enabled
+        self.clear()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the cached payload, or None
+        """
+        if not self.enabled:
+            return None
+
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, token: str, payload: Dict[str, Any]) -> None:
+        """
+        Store a verified payload until its exp. Tokens without
+        an exp claim are not cached.
+        """
+        if not self.enabled or not isinstance(payload.get("exp"), (int, float)):
+            return
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (payload["exp"], dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        """
+        Drop a token from the cache
+        """
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def clear(self) -> None:
+        """
+        Drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters for the metrics endpoint
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache()
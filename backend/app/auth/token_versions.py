@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Per-user token versions for stateless authentication.
+
+Stateless access tokens and refresh tokens carry the user's token
+version in the ``tv`` claim. A token is only accepted while that
+claim matches the version stored here, so bumping a user's version
+revokes every token issued before the bump. Versions live in one Redis hash and
+are cached in-process for a few seconds.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+# Key in Session.info holding user ids whose version is bumped after commit
+PENDING_BUMPS = "token_versions_pending"
+
+# Changing any of these user fields invalidates the claims in issued tokens
+TOKEN_CLAIM_FIELDS = {"username", "role", "status", "password_hash"}
+
+
+class TokenVersionStore:
+    """
+    Redis hash of user id -> token version with a short local cache
+    """
+    def __init__(self, redis=None, hash_key: str = "token_versions", local_ttl: float = 5.0):
+        self.redis = redis
+        self.hash_key = hash_key
+        self.local_ttl = local_ttl
+        self._versions: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, redis=None, local_ttl: Optional[float] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        self.redis = redis
+        if local_ttl is not None:
+            self.local_ttl = local_ttl
+        with self._lock:
+            self._versions.clear()
+
+    async def get(self, user_id: int) -> int:
+        """
+        Current token version of a user. Raises if Redis is not
+        reachable so callers can fall back to a database lookup.
+        """
+        with self._lock:
+            entry = self._versions.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        if self.redis is None:
+            raise RuntimeError("Token version store is not configured")
+        raw = await self.redis.hget(self.hash_key, str(user_id))
+        version = int(raw) if raw else 0
+        with self._lock:
+            self._versions[user_id] = (time.monotonic() + self.local_ttl, version)
+        return version
+
+    async def is_current(self, user_id: int, version: int) -> bool:
+        """
+        True if a token issued with this version is still valid
+        """
+        return await self.get(user_id) == version
+
+    async def bump(self, user_id: int) -> None:
+        """
+        Revoke every outstanding token of a user
+        """
+        with self._lock:
+            self._versions.pop(user_id, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.hincrby(self.hash_key, str(user_id), 1)
+        except Exception as e:
+            logger.error(f"Failed to bump token version for user {user_id}: {str(e)}")
+
+    def bump_on_commit(self, session, user_id: Optional[int]) -> None:
+        """
+        Bump a user's version once the session commits
+        """
+        if user_id is None:
+            return
+        session.info.setdefault(PENDING_BUMPS, set()).add(user_id)
+
+    def _bump_soon(self, user_id: int) -> None:
+        with self._lock:
+            self._versions.pop(user_id, None)
+        if self.redis is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"No event loop to bump token version for user {user_id}")
+            return
+        loop.create_task(self.bump(user_id))
+
+
+token_versions = TokenVersionStore()
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    """Apply bumps recorded with bump_on_commit"""
+    for user_id in session.info.pop(PENDING_BUMPS, ()):
+        token_versions._bump_soon(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    """The change was rolled back, keep the current version"""
+    session.info.pop(PENDING_BUMPS, None)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Row counts for paginated responses.
+
+Counting every row a filter matches costs about as much as reading
+them, so list endpoints take a count mode:
+
+    exact     SELECT count(*), cached for a few seconds per statement
+    estimate  a maintained Redis counter when the filter has one,
+              otherwise the planner's row estimate on PostgreSQL
+    none      no count at all
+
+Responses report the kind of count they carry, which is "exact" when
+an estimate was asked for but none was available.
+
+Counters are one Redis hash of name -> rows, e.g. "users" and
+"users:role=doctor". Models register the columns they are counted
+by with track(); inserts, deletes and updates of those columns
+adjust the counters once the session commits. Bulk statements that
+bypass the ORM are not seen, so counters can drift: rebuild()
+recounts them, and runs at startup when the hash is missing.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from enum import Enum
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+logger = logging.getLogger(__name__)
+
+# Key in Session.info holding counter deltas applied after commit
+PENDING_DELTAS = "row_counts_pending"
+# Exact counts remembered at once
+MAX_CACHED_COUNTS = 1000
+
+# Background tasks still running. The event loop only holds weak
+# references to tasks, so they are kept here until done.
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(loop: asyncio.AbstractEventLoop, coroutine) -> asyncio.Task:
+    task = loop.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+
+def _task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Row counter task failed: {task.exception()!r}")
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN (FORMAT JSON) of a statement, compiled with the
+    statement's own bound parameters for whichever driver runs it
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def _plain(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def counter_key(name: str, **filters) -> str:
+    """
+    Counter of the rows of name matching the filters, e.g.
+    counter_key("users", role="doctor") -> "users:role=doctor"
+    """
+    return ":".join([name] + [f"{column}={_plain(filters[column])}" for column in sorted(filters)])
+
+
+class RowCounter:
+    """
+    Exact, estimated or no row counts, with Redis counters for
+    common filters and a short local cache of exact counts
+    """
+    def __init__(self, redis=None, hash_key: str = "row_counts", exact_ttl: float = 10.0):
+        self.redis = redis
+        self.hash_key = hash_key
+        self.exact_ttl = exact_ttl
+        self.counts = Counter()
+        self._tracked: Dict[type, Tuple[str, Tuple[Tuple[str, ...], ...]]] = {}
+        self._exact: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, redis=None, exact_ttl: Optional[float] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        self.redis = redis
+        if exact_ttl is not None:
+            self.exact_ttl = exact_ttl
+        with self._lock:
+            self._exact.clear()
+
+    def track(self, model, name: str, groups: Iterable[Sequence[str]]) -> None:
+        """
+        Maintain counters of a model's rows, one per combination of
+        values of each group of columns; an empty group counts all rows
+        """
+        self._tracked[model] = (name, tuple(tuple(group) for group in groups))
+        event.listen(model, "after_insert", self._after_insert)
+        event.listen(model, "after_delete", self._after_delete)
+        event.listen(model, "after_update", self._after_update)
+
+    async def count(self, session, query, mode: CountMode,
+                    counter: Optional[str] = None) -> Tuple[Optional[int], str]:
+        """
+        Count the rows a select would return. counter names the Redis
+        counter that matches the query's filters, if there is one.
+        Returns (total, kind), kind being the mode actually used.
+        """
+        if mode == CountMode.NONE:
+            return None, CountMode.NONE.value
+        query = query.order_by(None)
+        if mode == CountMode.ESTIMATE:
+            estimate = await self._estimate(session, query, counter)
+            if estimate is not None:
+                self.counts["estimate"] += 1
+                return estimate, CountMode.ESTIMATE.value
+        return await self._exact_count(session, query), CountMode.EXACT.value
+
+    async def rebuild(self, session) -> None:
+        """
+        Recount every tracked counter from the database
+        """
+        if self.redis is None:
+            return
+        values: Dict[str, int] = {}
+        for model, (name, groups) in self._tracked.items():
+            for group in groups:
+                columns = [getattr(model, column) for column in group]
+                rows = await session.execute(select(*columns, func.count()).group_by(*columns))
+                for row in rows:
+                    values[counter_key(name, **dict(zip(group, row[:-1])))] = row[-1]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.hash_key)
+            if values:
+                pipe.hset(self.hash_key, mapping=values)
+            await pipe.execute()
+        self.counts["rebuilds"] += 1
+
+    async def rebuild_if_missing(self, session_factory) -> None:
+        """
+        Build the counters if the hash does not exist yet
+        """
+        if self.redis is None:
+            return
+        try:
+            if await self.redis.exists(self.hash_key):
+                return
+            async with session_factory() as session:
+                await self.rebuild(session)
+        except Exception as e:
+            logger.error(f"Failed to build row counters: {str(e)}")
+
+    def rebuild_soon(self, session_factory) -> Optional[asyncio.Task]:
+        """
+        Run rebuild_if_missing in the background on the running loop,
+        so startup does not wait for a recount
+        """
+        if self.redis is None:
+            return None
+        return _spawn(asyncio.get_running_loop(), self.rebuild_if_missing(session_factory))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "exact_ttl": self.exact_ttl,
+            "redis": self.redis is not None,
+            "exact": self.counts["exact"],
+            "exact_cached": self.counts["exact_cached"],
+            "estimate": self.counts["estimate"],
+            "estimate_counter": self.counts["estimate_counter"],
+            "estimate_planner": self.counts["estimate_planner"],
+            "rebuilds": self.counts["rebuilds"],
+        }
+
+    async def _exact_count(self, session, query) -> int:
+        compiled = query.compile(dialect=session.bind.dialect)
+        key = (str(compiled), repr(sorted(compiled.params.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._exact.get(key)
+        if entry is not None and entry[0] > now:
+            self.counts["exact_cached"] += 1
+            return entry[1]
+
+        total = await session.scalar(select(func.count()).select_from(query.subquery()))
+        self.counts["exact"] += 1
+        with self._lock:
+            if len(self._exact) >= MAX_CACHED_COUNTS:
+                self._exact.clear()
+            self._exact[key] = (now + self.exact_ttl, total)
+        return total
+
+    async def _estimate(self, session, query, counter: Optional[str]) -> Optional[int]:
+        if counter is not None and self.redis is not None:
+            try:
+                raw = await self.redis.hget(self.hash_key, counter)
+            except Exception as e:
+                logger.warning(f"Row counter {counter} unavailable: {str(e)}")
+                raw = None
+            if raw is not None:
+                self.counts["estimate_counter"] += 1
+                return max(int(raw), 0)
+
+        if session.bind.dialect.name != "postgresql":
+            return None
+        plan = (await session.execute(Explain(query))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.counts["estimate_planner"] += 1
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _keys(self, model, values) -> list:
+        name, groups = self._tracked[model]
+        return [counter_key(name, **{column: values(column) for column in group}) for group in groups]
+
+    def _record(self, target, keys: Iterable[str], delta: int) -> None:
+        session = object_session(target)
+        if session is None:
+            return
+        pending = session.info.setdefault(PENDING_DELTAS, Counter())
+        for key in keys:
+            pending[key] += delta
+
+    def _after_insert(self, mapper, connection, target) -> None:
+        self._record(target, self._keys(mapper.class_, lambda column: getattr(target, column)), 1)
+
+    def _after_delete(self, mapper, connection, target) -> None:
+        self._record(target, self._keys(mapper.class_, lambda column: getattr(target, column)), -1)
+
+    def _after_update(self, mapper, connection, target) -> None:
+        state = inspect(target)
+
+        def old(column):
+            history = state.attrs[column].history
+            return history.deleted[0] if history.deleted else getattr(target, column)
+
+        before = self._keys(mapper.class_, old)
+        after = self._keys(mapper.class_, lambda column: getattr(target, column))
+        if before != after:
+            self._record(target, before, -1)
+            self._record(target, after, 1)
+
+    async def _apply(self, deltas: Counter) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, delta in deltas.items():
+                    pipe.hincrby(self.hash_key, key, delta)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to update row counters: {str(e)}")
+
+    def _apply_soon(self, deltas: Counter) -> None:
+        deltas = Counter({key: delta for key, delta in deltas.items() if delta})
+        if not deltas or self.redis is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("No event loop to update row counters")
+            return
+        _spawn(loop, self._apply(deltas))
+
+
+row_counts = RowCounter()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    """Apply the counter deltas of the committed changes"""
+    deltas = session.info.pop(PENDING_DELTAS, None)
+    if deltas:
+        row_counts._apply_soon(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    """The changes were rolled back, leave the counters alone"""
+    session.info.pop(PENDING_DELTAS, None)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Full-text search indexes.
+
+Base.search used to match keywords with OR-chains of
+column ILIKE '%keyword%', which no B-tree index can serve, so every
+search read the whole table. A model now registers its
+searchable_columns with full_text.register(), and an index over those
+columns is built together with the table:
+
+    PostgreSQL  a generated ``search_vector`` tsvector column with a
+                GIN index (see migration 9d4b2e7f1a35)
+    SQLite      an FTS5 external-content table ``<table>_fts``, kept
+                in step with the table by triggers
+
+Keywords are split into words and every word must match the start of
+an indexed word, so "cardio" finds "Cardiology". Matches are ordered
+by relevance: ts_rank on PostgreSQL, bm25 on SQLite.
+
+Dotted searchable_columns such as "user.first_name" follow
+many-to-one relationships: a keyword word may match the related
+column instead of the index. Each word's matching ids are found by a
+UNION of lookups on one table each, so every index still serves its
+part of the search. Columns registered as fuzzy (names, which
+patients misspell) also match on PostgreSQL by pg_trgm similarity,
+served by GIN gin_trgm_ops indexes, and rank by it. Enum columns are
+left out.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Enum, String, event, false, func, inspect, literal, literal_column, or_, select, union
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import column, table
+
+
+SEARCH_VECTOR = "search_vector"
+
+
+def search_terms(keyword: str) -> List[str]:
+    """
+    Words of a keyword. Anything else is dropped, so the terms are
+    safe to place in a tsquery or an FTS5 query.
+    """
+    return re.findall(r"\w+", keyword.lower())
+
+
+def compile_paths(query, model, paths: Sequence[str]) -> Tuple[object, Dict[str, object]]:
+    """
+    Resolve column paths of a model, e.g. "specialization" or
+    "user.first_name". Each relationship on the way is outer joined
+    once however many paths go through it, so the query stays one
+    statement with one row per model instance. Returns the query and
+    path -> column.
+    """
+    joined = {}
+    columns = {}
+    for path in paths:
+        *relationships, name = path.split(".")
+        entity, prefix = model, ""
+        for relationship_name in relationships:
+            prefix = f"{prefix}.{relationship_name}" if prefix else relationship_name
+            relationship = inspect(entity).mapper.relationships.get(relationship_name)
+            if relationship is None or relationship.uselist:
+                raise ValueError(f"Invalid column name: {path}")
+            if prefix not in joined:
+                target = aliased(relationship.mapper.class_)
+                query = query.outerjoin(target, getattr(entity, relationship_name).of_type(target))
+                joined[prefix] = target
+            entity = joined[prefix]
+        if name not in inspect(entity).mapper.columns:
+            raise ValueError(f"Invalid column name: {path}")
+        columns[path] = getattr(entity, name)
+    return query, columns
+
+
+def match_path(model, path: str, match):
+    """
+    Criterion on the model's table that the column at path satisfies
+    match, e.g. doctors.user_id IN (SELECT users.id FROM users WHERE
+    match(users.first_name)). The related table is searched on its
+    own, so its indexes serve the match.
+    """
+    *relationships, name = path.split(".")
+    entities = [model]
+    for relationship_name in relationships:
+        relationship = inspect(entities[-1]).mapper.relationships.get(relationship_name)
+        if relationship is None or relationship.uselist or len(relationship.local_remote_pairs) != 1:
+            raise ValueError(f"Invalid column name: {path}")
+        entities.append(relationship.mapper.class_)
+    if name not in inspect(entities[-1]).mapper.columns:
+        raise ValueError(f"Invalid column name: {path}")
+
+    criterion = match(getattr(entities[-1], name))
+    for entity, relationship_name in reversed(list(zip(entities, relationships))):
+        (local, remote), = inspect(entity).mapper.relationships[relationship_name].local_remote_pairs
+        criterion = local.in_(select(remote).where(criterion))
+    return criterion
+
+
+def _is_text(column) -> bool:
+    return isinstance(column.type, String) and not isinstance(column.type, Enum)
+
+
+class FullTextIndex:
+    """
+    The full-text index of one table's searchable columns
+    """
+    def __init__(self, table_name: str, columns: List[str], config: str = "simple",
+                 paths: Sequence[str] = (), fuzzy: Sequence[str] = ()):
+        self.table = table_name
+        self.columns = list(columns)
+        # PostgreSQL text search configuration, e.g. "english" to stem
+        # free text; "simple" keeps names and codes as they are
+        self.config = config
+        # Dotted columns of related models
+        self.paths = list(paths)
+        # Columns (own or dotted) also matched by trigram similarity
+        self.fuzzy = list(fuzzy)
+
+    def trigram_index_name(self, name: str) -> str:
+        return f"ix_{self.table}_{name}_trgm"
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.table}_fts"
+
+    def vector_expression(self) -> str:
+        """
+        Expression of the generated tsvector column
+        """
+        document = " || ' ' || ".join(f"coalesce({name}, '')" for name in self.columns)
+        return f"to_tsvector('{self.config}'::regconfig, {document})"
+
+    def create_ddl(self, dialect_name: str) -> List[str]:
+        """
+        Statements building the index for a new, empty table
+        """
+        if dialect_name == "postgresql":
+            statements = [
+                f"ALTER TABLE {self.table} ADD COLUMN {SEARCH_VECTOR} tsvector "
+                f"GENERATED ALWAYS AS ({self.vector_expression()}) STORED",
+                f"CREATE INDEX ix_{self.table}_{SEARCH_VECTOR} ON {self.table} USING gin ({SEARCH_VECTOR})",
+            ]
+            trigram_columns = [name for name in self.fuzzy if "." not in name]
+            if trigram_columns:
+                statements.append("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name in trigram_columns:
+                statements.append(f"CREATE INDEX IF NOT EXISTS {self.trigram_index_name(name)} ON {self.table} "
+                                  f"USING gin ({name} gin_trgm_ops)")
+            return statements
+        if dialect_name == "sqlite":
+            names = ", ".join(self.columns)
+            new = ", ".join(f"new.{name}" for name in self.columns)
+            old = ", ".join(f"old.{name}" for name in self.columns)
+            delete_old = (f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {names}) "
+                          f"VALUES ('delete', old.id, {old});")
+            insert_new = f"INSERT INTO {self.fts_table}(rowid, {names}) VALUES (new.id, {new});"
+            return [
+                f"CREATE VIRTUAL TABLE {self.fts_table} USING fts5({names}, "
+                f"content='{self.table}', content_rowid='id')",
+                f"CREATE TRIGGER {self.fts_table}_ai AFTER INSERT ON {self.table} BEGIN {insert_new} END",
+                f"CREATE TRIGGER {self.fts_table}_ad AFTER DELETE ON {self.table} BEGIN {delete_old} END",
+                f"CREATE TRIGGER {self.fts_table}_au AFTER UPDATE ON {self.table} "
+                f"BEGIN {delete_old} {insert_new} END",
+            ]
+        return []
+
+    def drop_ddl(self, dialect_name: str) -> List[str]:
+        """
+        Statements removing what the table's own DROP leaves behind
+        """
+        if dialect_name == "sqlite":
+            return [f"DROP TABLE IF EXISTS {self.fts_table}"]
+        return []
+
+    def supports(self, dialect_name: str) -> bool:
+        return bool(self.columns or self.paths) and dialect_name in ("postgresql", "sqlite")
+
+    def apply(self, query, model, keyword: str, dialect_name: str):
+        """
+        Restrict a select of the model to rows matching every word of
+        the keyword, most relevant first
+        """
+        terms = search_terms(keyword)
+        if not terms:
+            return query.where(false())
+        # Columns matched outside the index: related columns, and on
+        # PostgreSQL the fuzzy ones
+        extra = self.paths + [name for name in self.fuzzy
+                              if dialect_name == "postgresql" and name not in self.paths]
+        if not extra:
+            return self._match_index(query, model, terms, dialect_name)
+
+        # An OR spanning the model and a joined table can use neither
+        # table's index, so each word first resolves the ids it
+        # matches: a UNION of single-table lookups, each served by
+        # one index, with related tables reached through their keys
+        for term in terms:
+            branches = [select(model.id).where(self._matches_term(model, term, dialect_name))] \
+                if self.columns else []
+            for name in extra:
+                if dialect_name == "postgresql" and name in self.fuzzy:
+                    # Both are served by the gin_trgm_ops index
+                    match = lambda c, term=term: or_(c.ilike(f"{term}%"), c.op("%")(term))
+                else:
+                    match = lambda c, term=term: c.ilike(f"%{term}%")
+                branches.append(select(model.id).where(match_path(model, name, match)))
+            query = query.where(model.id.in_(union(*branches) if len(branches) > 1 else branches[0]))
+
+        if dialect_name == "postgresql":
+            # Index rank plus the best name similarity, joining the
+            # related rows of the matches only
+            score = func.ts_rank(self._vector(), self._tsquery(terms, " | ")) if self.columns else literal(0.0)
+            if self.fuzzy:
+                query, columns = compile_paths(query, model, self.fuzzy)
+                score = score + func.greatest(*[func.similarity(columns[name], keyword.lower())
+                                                for name in self.fuzzy])
+            return query.order_by(score.desc(), model.id)
+
+        if not self.columns:
+            return query.order_by(model.id)
+        # Rows matching the index come first, by bm25, then the rest
+        fts = self._fts()
+        ranked = select(fts.c.rowid, fts.c.rank).where(self._fts_match(terms)).subquery()
+        return query.outerjoin(ranked, ranked.c.rowid == model.id).order_by(
+            ranked.c.rank.is_(None), ranked.c.rank, model.id
+        )
+
+    def _vector(self):
+        return literal_column(f"{self.table}.{SEARCH_VECTOR}")
+
+    def _tsquery(self, terms: List[str], operator: str = " & "):
+        return func.to_tsquery(
+            literal_column(f"'{self.config}'::regconfig"), operator.join(f"{term}:*" for term in terms)
+        )
+
+    def _fts(self):
+        return table(self.fts_table, column("rowid"), column("rank"))
+
+    def _fts_match(self, terms: List[str]):
+        return literal_column(self.fts_table).op("MATCH")(" ".join(f'"{term}"*' for term in terms))
+
+    def _matches_term(self, model, term: str, dialect_name: str):
+        if dialect_name == "postgresql":
+            return self._vector().op("@@")(self._tsquery([term]))
+        fts = self._fts()
+        return model.id.in_(select(fts.c.rowid).where(self._fts_match([term])))
+
+    def _match_index(self, query, model, terms: List[str], dialect_name: str):
+        if dialect_name == "postgresql":
+            vector, tsquery = self._vector(), self._tsquery(terms)
+            return query.where(vector.op("@@")(tsquery)).order_by(
+                func.ts_rank(vector, tsquery).desc(), model.id
+            )
+
+        fts = self._fts()
+        return (
+            query.join(fts, fts.c.rowid == model.id)
+            .where(self._fts_match(terms))
+            .order_by(fts.c.rank, model.id)
+        )
+
+    def _after_create(self, target, connection, **kw) -> None:
+        for statement in self.create_ddl(connection.dialect.name):
+            connection.exec_driver_sql(statement)
+
+    def _after_drop(self, target, connection, **kw) -> None:
+        for statement in self.drop_ddl(connection.dialect.name):
+            connection.exec_driver_sql(statement)
+
+
+class FullTextSearch:
+    """
+    Full-text indexes of the searchable models
+    """
+    def __init__(self):
+        self.indexes: Dict[type, FullTextIndex] = {}
+
+    def register(self, model, config: str = "simple", fuzzy: Sequence[str] = ()) -> FullTextIndex:
+        """
+        Index the model's searchable_columns that are its own text
+        columns, and build the index whenever the table is created.
+        Dotted searchable_columns are matched through joins. fuzzy
+        names searchable columns also matched by trigram similarity;
+        a related fuzzy column relies on its own model registering it
+        as fuzzy for the trigram index.
+        """
+        table_columns = model.__table__.c
+        columns = [
+            name for name in model.searchable_columns
+            if "." not in name and name in table_columns and _is_text(table_columns[name])
+        ]
+        paths = [name for name in model.searchable_columns if "." in name]
+        index = FullTextIndex(model.__table__.name, columns, config, paths, fuzzy)
+        event.listen(model.__table__, "after_create", index._after_create)
+        event.listen(model.__table__, "after_drop", index._after_drop)
+        self.indexes[model] = index
+        return index
+
+    def index_for(self, model, dialect_name: str) -> Optional[FullTextIndex]:
+        """
+        The model's index if it can be searched on this database
+        """
+        index = self.indexes.get(model)
+        if index is None or not index.supports(dialect_name):
+            return None
+        return index
+
+
+full_text = FullTextSearch()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Keyset (cursor) pagination.
+
+OFFSET makes the database read and throw away every skipped row, so
+deep pages get slower the deeper they are. A keyset page instead
+starts right after the sort key of the previous page's last row:
+
+    WHERE (created_at, id) < (:created_at, :id)
+    ORDER BY created_at DESC, id DESC LIMIT :n
+
+With an index on the same columns every page costs the same. The
+last column must be unique (normally the id) so that ties on the
+sort column still have a strict order, and none of the columns may
+be NULL.
+
+Cursors are opaque to clients: URL-safe base64 of a small JSON
+document with the boundary row's key values, the sort it belongs to
+and whether it reads forwards or backwards.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that is malformed or belongs to another sort"""
+
+
+def _encode_value(value: Any) -> Any:
+    # JSON has no temporal types; tag them so they decode back
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, time):
+        return {"t": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "t" in value:
+            return time.fromisoformat(value["t"])
+        raise InvalidCursor("Invalid cursor")
+    return value
+
+
+class Keyset:
+    """
+    A sort order that can be paginated by cursor
+    """
+    def __init__(self, name: str, columns: Sequence, descending: bool = False):
+        self.name = f"{name}:{'desc' if descending else 'asc'}"
+        self.columns = list(columns)
+        self.descending = descending
+
+    def encode(self, values: Sequence, backwards: bool = False) -> str:
+        """
+        Cursor pointing just past a row with the given key values
+        """
+        document = {"s": self.name, "v": [_encode_value(value) for value in values], "b": int(backwards)}
+        raw = json.dumps(document, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple[list, bool]:
+        """
+        Key values and direction of a cursor. Raises InvalidCursor if
+        it is malformed or was issued for a different sort.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            document = json.loads(raw)
+            name, values, backwards = document["s"], document["v"], bool(document["b"])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise InvalidCursor("Invalid cursor")
+        if name != self.name:
+            raise InvalidCursor("Cursor does not match the requested sort order")
+        if not isinstance(values, list) or len(values) != len(self.columns):
+            raise InvalidCursor("Invalid cursor")
+        try:
+            return [_decode_value(value) for value in values], backwards
+        except ValueError:
+            raise InvalidCursor("Invalid cursor")
+
+    def apply(self, query, limit: int, cursor: Optional[str] = None):
+        """
+        Order the query by the keyset and restrict it to the page the
+        cursor points at. One extra row is fetched to tell whether
+        there is a further page.
+        """
+        descending = self.descending
+        if cursor:
+            values, backwards = self.decode(cursor)
+            # Reading backwards walks the reverse order from the cursor
+            descending = descending != backwards
+            keys = tuple_(*self.columns)
+            query = query.where(keys < tuple_(*values) if descending else keys > tuple_(*values))
+        return query.order_by(
+            *(column.desc() if descending else column.asc() for column in self.columns)
+        ).limit(limit + 1)
+
+    def page(self, rows: Sequence, limit: int, cursor: Optional[str],
+             key: Callable[[Any], Sequence]) -> Tuple[List, Optional[str], Optional[str]]:
+        """
+        Trim the rows of an applied query to the page and build the
+        cursors of the neighbouring pages. key returns a row's values
+        for the keyset columns. Returns (rows, next_cursor, prev_cursor).
+        """
+        backwards = self.decode(cursor)[1] if cursor else False
+        has_more = len(rows) > limit
+        rows = list(rows[:limit])
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return rows, None, None
+
+        # Forwards, earlier rows exist whenever we arrived by cursor;
+        # backwards, later rows always exist
+        has_next = True if backwards else has_more
+        has_prev = has_more if backwards else cursor is not None
+        next_cursor = self.encode(key(rows[-1])) if has_next else None
+        prev_cursor = self.encode(key(rows[0]), backwards=True) if has_prev else None
+        return rows, next_cursor, prev_cursor
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Connection pool instrumentation.
+
+Each engine gets a QueuePool subclass that times how long every
+checkout waited for a connection and counts checkouts that timed
+out. Gauges (connections in use, overflow) are read from the pool
+when stats() is called, so they are always current.
+"""
+import bisect
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Upper bounds of the checkout wait histogram buckets, in milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class PoolMetrics:
+    """
+    Checkout wait histogram and counters for one engine's pool
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.max_in_use = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Read through the engine: dispose() swaps in a new pool
+        return self.engine.pool if self.engine is not None else None
+
+    def record_wait(self, seconds: float) -> None:
+        waited_ms = seconds * 1000
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += waited_ms
+            self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, waited_ms)] += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the given fraction of
+        checkouts (the longest wait seen for the overflow bucket);
+        None when the pool has not been used
+        """
+        total = sum(self.buckets)
+        if not total:
+            return None
+        threshold = fraction * total
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return round(self.wait_max_ms, 3)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters, gauges and the wait histogram for the metrics endpoint
+        """
+        pool = self.pool
+        labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["le_inf"]
+        return {
+            "pool_size": pool.size() if pool is not None else None,
+            "in_use": pool.checkedout() if pool is not None else 0,
+            "idle": pool.checkedin() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "max_overflow": pool._max_overflow if pool is not None else None,
+            "max_in_use": self.max_in_use,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_p50_ms": self.percentile(0.50),
+            "wait_p99_ms": self.percentile(0.99),
+            "wait_max_ms": round(self.wait_max_ms, 3),
+            "wait_histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class TimedPoolMixin:
+    """
+    Times QueuePool checkouts. _do_get is where a checkout waits
+    for a free connection and raises TimeoutError after pool_timeout.
+    """
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def instrumented_pool_class(metrics: PoolMetrics, asyncio: bool = False):
+    """
+    A QueuePool class reporting to the given metrics
+    """
+    base = AsyncAdaptedQueuePool if asyncio else QueuePool
+    return type(f"Timed{base.__name__}", (TimedPoolMixin, base), {"metrics": metrics})
+
+
+def instrument_engine(engine, metrics: PoolMetrics) -> None:
+    """
+    Attach pool events and point the metrics at the engine. The
+    events carry over when dispose() recreates the pool.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    metrics.engine = sync_engine
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.max_in_use = max(metrics.max_in_use, metrics.pool.checkedout())
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
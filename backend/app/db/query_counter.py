@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Per-request statement counter.
+
+While a block runs under query_counter.track(), every statement any
+engine executes in that context is counted and timed, and grouped by
+its SQL text. The SQL is the compiled statement with placeholders, so
+a relationship lazily loaded in a loop shows up as one statement
+shape repeated once per row: when a shape repeats more than the
+threshold, a possible N+1 is logged with the request it came from.
+
+Tracking state lives in a ContextVar, so concurrent requests are
+counted separately and sync code run in the threadpool is counted
+with the request that started it.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+# Characters of a repeated statement quoted in the N+1 warning
+MAX_SHAPE_LENGTH = 300
+
+
+class QueryStats:
+    """
+    Statements executed within one tracked block
+    """
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.time_ms = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """
+        Statement shapes executed more than threshold times
+        """
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+class QueryCounter:
+    """
+    Counts statements per request and flags repeated statement shapes
+    """
+    def __init__(self, repeat_threshold: int = 10):
+        self.repeat_threshold = repeat_threshold
+        self.enabled = True
+        self.headers = True
+        self.requests = 0
+        self.statements = 0
+        self.n_plus_one_warnings = 0
+        self.max_statements = 0
+        self._installed = False
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, headers: Optional[bool] = None,
+                  repeat_threshold: Optional[int] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if enabled is not None:
+            self.enabled = enabled
+        if headers is not None:
+            self.headers = headers
+        if repeat_threshold is not None:
+            self.repeat_threshold = repeat_threshold
+
+    def install(self) -> None:
+        """
+        Listen to every engine, including ones created later
+        (e.g. the test suite's own engine)
+        """
+        with self._lock:
+            if not self._installed:
+                event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+                event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+                self._installed = True
+
+    @contextmanager
+    def track(self, label: str) -> Iterator[QueryStats]:
+        """
+        Count the statements executed inside the block. Logs a
+        warning for each statement shape repeated more than
+        repeat_threshold times.
+        """
+        self.install()
+        stats = QueryStats(label)
+        token = _current.set(stats)
+        try:
+            yield stats
+        finally:
+            _current.reset(token)
+            self.requests += 1
+            self.statements += stats.count
+            self.max_statements = max(self.max_statements, stats.count)
+            for shape, count in stats.repeated(self.repeat_threshold).items():
+                self.n_plus_one_warnings += 1
+                logger.warning(
+                    f"Possible N+1 in {label}: statement ran {count} times: {' '.join(shape.split())[:MAX_SHAPE_LENGTH]}"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "enabled": self.enabled,
+            "repeat_threshold": self.repeat_threshold,
+            "requests": self.requests,
+            "statements": self.statements,
+            "avg_statements": round(self.statements / self.requests, 2) if self.requests else 0.0,
+            "max_statements": self.max_statements,
+            "n_plus_one_warnings": self.n_plus_one_warnings,
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._counter_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_counter_started", None)
+    if stats is None or started is None:
+        return
+    stats.count += 1
+    stats.time_ms += (time.perf_counter() - started) * 1000
+    stats.shapes[statement] += 1
+
+
+query_counter = QueryCounter()
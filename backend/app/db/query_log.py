@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Slow query log.
+
+Replaces engine echo, which formatted and wrote every statement and
+its parameters on the request path. Statements are timed with cursor
+events; those slower than the threshold are always logged, and a
+sample of the rest can be logged to see the normal query mix. Each
+record is one JSON line on the "sql" logger.
+
+On PostgreSQL a slow SELECT can also have its plan captured with
+EXPLAIN (ANALYZE, BUFFERS). That runs the query a second time, so it
+is off by default, limited to one plan per statement per interval,
+and wrapped in a savepoint so a failing EXPLAIN never aborts the
+caller's transaction.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+
+
+sql_logger = logging.getLogger("sql")
+
+# Longest statement text kept in a record
+MAX_STATEMENT_LENGTH = 2000
+# Statements remembered for the per-statement EXPLAIN interval
+MAX_EXPLAINED_STATEMENTS = 1000
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+
+class SlowQueryLog:
+    """
+    Times statements and logs the slow ones, plus a sample of the rest
+    """
+    def __init__(self, threshold_ms: float = 200, sample_rate: float = 0.0, explain: bool = False,
+                 explain_interval: int = 300, log_parameters: bool = False):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.log_parameters = log_parameters
+        self.statements = 0
+        self.slow = 0
+        self.sampled = 0
+        self.explained = 0
+        self.explain_errors = 0
+        self.slowest_ms = 0.0
+        self._explained_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, threshold_ms: Optional[float] = None, sample_rate: Optional[float] = None,
+                  explain: Optional[bool] = None, explain_interval: Optional[int] = None,
+                  log_parameters: Optional[bool] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if threshold_ms is not None:
+            self.threshold_ms = threshold_ms
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if explain is not None:
+            self.explain = explain
+        if explain_interval is not None:
+            self.explain_interval = explain_interval
+        if log_parameters is not None:
+            self.log_parameters = log_parameters
+        with self._lock:
+            self._explained_at.clear()
+
+    def instrument(self, engine) -> None:
+        """
+        Attach the timing events to an engine (sync or asyncio)
+        """
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "explain": self.explain,
+            "statements": self.statements,
+            "slow": self.slow,
+            "sampled": self.sampled,
+            "explained": self.explained,
+            "explain_errors": self.explain_errors,
+            "slowest_ms": round(self.slowest_ms, 3),
+        }
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, which is discarded with a
+        # statement that fails before after_cursor_execute
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.statements += 1
+
+        if duration_ms >= self.threshold_ms:
+            self.slow += 1
+            self.slowest_ms = max(self.slowest_ms, duration_ms)
+            record = self._record("slow_query", statement, parameters, duration_ms, cursor, executemany)
+            if self.explain and not executemany and self._should_explain(conn, statement):
+                record["plan"] = self._explain(conn, statement, parameters)
+            sql_logger.warning(json.dumps(record, default=str))
+        elif self.sample_rate and random.random() < self.sample_rate:
+            self.sampled += 1
+            record = self._record("sampled_query", statement, parameters, duration_ms, cursor, executemany)
+            sql_logger.info(json.dumps(record, default=str))
+
+    def _record(self, kind: str, statement: str, parameters, duration_ms: float, cursor, executemany) -> dict:
+        record = {
+            "event": kind,
+            "duration_ms": round(duration_ms, 3),
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "rowcount": getattr(cursor, "rowcount", None),
+            "executemany": executemany,
+        }
+        if self.log_parameters:
+            record["parameters"] = parameters
+        return record
+
+    def _should_explain(self, conn, statement: str) -> bool:
+        """
+        Only SELECTs on PostgreSQL, and each statement at most once
+        per explain_interval
+        """
+        if conn.dialect.name != "postgresql" or not statement.lstrip().upper().startswith("SELECT"):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(statement, float("-inf")) < self.explain_interval:
+                return False
+            if len(self._explained_at) >= MAX_EXPLAINED_STATEMENTS:
+                self._explained_at.clear()
+            self._explained_at[statement] = now
+        return True
+
+    def _explain(self, conn, statement: str, parameters) -> Any:
+        """
+        Run EXPLAIN (ANALYZE, BUFFERS) on a fresh cursor of the same
+        connection, so the original result set is left untouched
+        """
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+                plan = cursor.fetchone()[0]
+            except Exception as e:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                self.explain_errors += 1
+                return {"error": str(e)}
+            cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            self.explained += 1
+            return json.loads(plan) if isinstance(plan, str) else plan
+        except Exception as e:
+            self.explain_errors += 1
+            return {"error": str(e)}
+        finally:
+            cursor.close()
+
+
+slow_query_log = SlowQueryLog()
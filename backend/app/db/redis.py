@@ -1,8 +1,26 @@
-import aioredis
-import os
+from functools import lru_cache
+from typing import Any
 
-# Redis configuration
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+import redis.asyncio as aioredis
 
-# Create Redis connection
-redis = aioredis.from_url(REDIS_URL, decode_responses=True)
\ No newline at end of file
+from ..settings import get_settings
+
+
+@lru_cache()
+def get_redis() -> aioredis.Redis:
+    """
+    The application's Redis client, built on first use from
+    Settings.REDIS_URL so a URL set only in the .env file is honoured.
+    Connections are opened lazily by the client itself.
+    """
+    return aioredis.from_url(get_settings().REDIS_URL, decode_responses=True)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `redis` on first access, so `from app.db.redis import
+    redis` keeps working without reading the settings at import time
+    """
+    if name == "redis":
+        return get_redis()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
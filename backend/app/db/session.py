@@ -2,13 +2,14 @@
 """
 Database session management
 """
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 import time
 import logging
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,10 +17,18 @@ logger = logging.getLogger(__name__)
 
 def get_session_maker():
     """
-    Import SessionLocal here to avoid circular imports
+    Import the session maker lazily to avoid circular imports;
+    the engine is created on first use
     """
-    from ..models.base import SessionLocal
-    return SessionLocal
+    from ..models.base import db
+    return db.get_session_local()
+
+def get_async_session_maker():
+    """
+    Import the async session maker lazily to avoid circular imports
+    """
+    from ..models.base import get_async_session_local
+    return get_async_session_local()
 
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
@@ -54,4 +63,67 @@ def get_db_session() -> Generator[Session, None, None]:
             session.rollback()
             raise
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+@contextmanager
+def use_db_session(session: Optional[Session] = None) -> Generator[Session, None, None]:
+    """
+    Reuse the given Session, or open (and commit) a new one
+    when none is passed in. Lets model methods join the
+    caller's unit of work instead of starting their own.
+    """
+    if session is not None:
+        yield session
+        return
+
+    with get_db_session() as new_session:
+        yield new_session
+
+@asynccontextmanager
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async context manager for database sessions. Commits on
+    success and rolls back on any error.
+
+    Usage:
+        async with get_async_db_session() as session:
+            result = await session.execute(select(Model))
+
+    Yields:
+        SQLAlchemy AsyncSession object
+    """
+    AsyncSessionLocal = get_async_session_maker()
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+@asynccontextmanager
+async def use_async_session(session: Optional[AsyncSession] = None) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Reuse the given AsyncSession, or open (and commit) a new one
+    when none is passed in.
+    """
+    if session is not None:
+        yield session
+        return
+
+    async with get_async_db_session() as new_session:
+        yield new_session
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that provides one AsyncSession per request.
+    FastAPI caches it for the request, so the auth dependencies,
+    the route and the model methods it calls share a single
+    transaction that is committed once when the request ends.
+
+    Usage:
+        async def route(session: AsyncSession = Depends(get_async_db)):
+            ...
+    """
+    async with get_async_db_session() as session:
+        yield session
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Prefix typeahead over a few text columns of a table.
+
+Search boxes query on every (debounced) keystroke, so a typeahead
+returns the top few rows starting with the typed prefix: no count,
+no pagination, only the columns the dropdown shows. Each column has
+a B-tree index on lower(column), and a prefix is a range seek
+
+    lower(column) >= 'prefix' AND lower(column) < the next prefix
+
+read in index order, so a scan stops after the rows it returns
+however many rows share the prefix. On PostgreSQL the index and the
+comparisons use the "C" collation: byte order, the order
+text_pattern_ops compares in, which a range of prefixes needs.
+
+Prefixes of one or two characters are the most repeated; their
+results are also cached in process for a few seconds.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import event, func, select, union_all
+
+
+# Prefixes up to this length are cached
+SHORT_PREFIX = 2
+# Cached prefixes remembered at once
+MAX_CACHED_PREFIXES = 1000
+
+
+def next_prefix(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class Typeahead:
+    """
+    Top-k rows whose columns start with a prefix
+    """
+    def __init__(self, model, columns: Sequence[str], fields: Sequence[str], cache_ttl: float = 10.0):
+        self.model = model
+        self.table = model.__table__.name
+        # Columns matched against the prefix
+        self.columns = list(columns)
+        # Columns returned for each row
+        self.fields = list(fields)
+        self.cache_ttl = cache_ttl
+        self.counts = Counter()
+        self._cache: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        event.listen(model.__table__, "after_create", self._after_create)
+
+    def configure(self, cache_ttl: Optional[float] = None) -> None:
+        """
+        Apply settings at application startup
+        """
+        if cache_ttl is not None:
+            self.cache_ttl = cache_ttl
+        with self._lock:
+            self._cache.clear()
+
+    def index_name(self, column: str) -> str:
+        return f"ix_{self.table}_{column}_prefix"
+
+    def create_ddl(self, dialect_name: str) -> List[str]:
+        """
+        Statements building the prefix indexes
+        """
+        if dialect_name == "postgresql":
+            return [
+                f"CREATE INDEX IF NOT EXISTS {self.index_name(column)} "
+                f"ON {self.table} ((lower({column}) COLLATE \"C\"), id)"
+                for column in self.columns
+            ]
+        if dialect_name == "sqlite":
+            return [
+                f"CREATE INDEX IF NOT EXISTS {self.index_name(column)} "
+                f"ON {self.table} (lower({column}))"
+                for column in self.columns
+            ]
+        return []
+
+    def query(self, prefix: str, limit: int, dialect_name: str):
+        """
+        Select of the fields of the first limit rows, alphabetically,
+        with a column starting with prefix. Each column's index yields
+        its own first limit matches in order, so no more than limit
+        rows per column are read however common the prefix.
+        """
+        prefix = prefix.strip().lower()
+        fields = [getattr(self.model, name) for name in self.fields]
+        branches = []
+        for column in self._columns():
+            key = func.lower(column)
+            if dialect_name == "postgresql":
+                key = key.collate("C")
+            branches.append(
+                select(*fields, key.label("score"))
+                .where(key >= prefix, key < next_prefix(prefix))
+                .order_by(key, self.model.id)
+            )
+        # Each branch is wrapped so its LIMIT is valid in a UNION on SQLite
+        matches = union_all(*[select(branch.limit(limit).subquery()) for branch in branches]).subquery()
+        # A row matching several columns is kept once, at its first match
+        return (
+            select(*[matches.c[name] for name in self.fields])
+            .group_by(*[matches.c[name] for name in self.fields])
+            .order_by(func.min(matches.c.score), matches.c.id)
+            .limit(limit)
+        )
+
+    def _columns(self):
+        return [getattr(self.model, name) for name in self.columns]
+
+    async def search(self, session, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Up to limit matches of prefix, as dicts of the fields
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        key = (prefix, limit)
+        cached = len(prefix) <= SHORT_PREFIX and self.cache_ttl > 0
+        now = time.monotonic()
+        if cached:
+            with self._lock:
+                entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.counts["cached"] += 1
+                return entry[1]
+
+        result = await session.execute(self.query(prefix, limit, session.bind.dialect.name))
+        rows = [dict(row) for row in result.mappings()]
+        self.counts["queries"] += 1
+        if cached:
+            with self._lock:
+                if len(self._cache) >= MAX_CACHED_PREFIXES:
+                    self._cache.clear()
+                self._cache[key] = (now + self.cache_ttl, rows)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for the metrics endpoint
+        """
+        return {
+            "cache_ttl": self.cache_ttl,
+            "cached_prefixes": len(self._cache),
+            "queries": self.counts["queries"],
+            "cached": self.counts["cached"],
+        }
+
+    def _after_create(self, target, connection, **kw) -> None:
+        for statement in self.create_ddl(connection.dialect.name):
+            connection.exec_driver_sql(statement)
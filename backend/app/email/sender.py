@@ -2,13 +2,14 @@ import aiosmtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.settings import settings
+from app.settings import get_settings
 
 
 logger = logging.getLogger(__name__)
 
 async def send_password_reset_email(email: str, reset_link: str):
     """Send password reset email"""
+    settings = get_settings()
     sender_email = settings.SMTP_USERNAME
     sender_password = settings.SMTP_PASSWORD
 
@@ -32,13 +32,14 @@ security_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
 security_logger.setLevel(logging.INFO)
 security_logger.addHandler(security_handler)
 
-# Configure SQL logger
-sql_logger = logging.getLogger("sqlalchemy.engine")
+# Configure SQL logger: slow and sampled statements as JSON lines
+# (see app/db/query_log.py)
+sql_logger = logging.getLogger("sql")
 sql_handler = RotatingFileHandler(
     SQL_LOG_FILE, maxBytes=MAX_LOG_FILE_SIZE, backupCount=BACKUP_COUNT
 )
 sql_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
-sql_logger.setLevel(logging.INFO)  # Set to DEBUG if you need detailed SQL logs
+sql_logger.setLevel(logging.INFO)
 sql_logger.addHandler(sql_handler)
 
 # Suppress SQL logs in the root logger
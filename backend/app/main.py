@@ -4,7 +4,7 @@ Entry point of the
 application
 """
 import os
-import redis
+import asyncio
 import logging
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,7 +12,20 @@ from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.exceptions import RequestValidationError
 from .routers import auth, users, admin, homepage, appointments, doctors
 from .auth.dependencies import get_current_user
-from .models.user import User, UserRole
+from .models.user import User, UserRole, user_typeahead
+from .models.base import db, get_async_session_local
+from .auth.identity_cache import identity_cache
+from .auth.token_versions import token_versions
+from .auth.hashing import password_hasher
+from .auth.token_cache import token_cache
+from .auth.revocation import revocation_list
+from .auth.refresh_tokens import refresh_tokens
+from .auth.login_throttle import login_throttle
+from .db.redis import get_redis
+from .db.query_log import slow_query_log
+from .db.query_counter import query_counter
+from .db.counting import row_counts
+from .settings import get_settings
 from fastapi.staticfiles import StaticFiles
 from fastapi_limiter import FastAPILimiter
 
@@ -84,10 +97,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*", "Authorization"],
-    expose_headers=["Authorization"],
+    expose_headers=["Authorization", "X-DB-Queries", "X-DB-Time"],
 )
 
 
+# Count the statements each request runs; outside production the
+# totals are returned in X-DB-Queries / X-DB-Time headers
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    if not query_counter.enabled:
+        return await call_next(request)
+    with query_counter.track(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    if query_counter.headers:
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time"] = f"{stats.time_ms:.1f}"
+    return response
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -99,8 +126,74 @@ app.include_router(doctors.router)
 
 @app.on_event("startup")
 async def startup():
-    redis_client = redis.asyncio.from_url("redis://localhost:6379", decode_responses=True)
-    await FastAPILimiter.init(redis_client)
+    settings = get_settings()
+    slow_query_log.configure(
+        threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+        sample_rate=settings.SQL_LOG_SAMPLE_RATE,
+        explain=settings.SLOW_QUERY_EXPLAIN,
+        explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL,
+        log_parameters=settings.SQL_LOG_PARAMETERS,
+    )
+    query_counter.configure(
+        enabled=settings.QUERY_COUNTER_ENABLED,
+        headers=settings.ENVIRONMENT != "production",
+        repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+    )
+    await asyncio.to_thread(db.check_connection)
+    app_redis = get_redis()
+    await FastAPILimiter.init(app_redis)
+    identity_cache.configure(
+        maxsize=settings.IDENTITY_CACHE_MAXSIZE,
+        ttl=settings.IDENTITY_CACHE_TTL,
+        redis=app_redis if settings.IDENTITY_CACHE_USE_REDIS else None,
+        enabled=settings.IDENTITY_CACHE_ENABLED,
+    )
+    await identity_cache.start(app_redis)
+    token_versions.configure(
+        redis=app_redis,
+        local_ttl=settings.TOKEN_VERSION_CACHE_TTL,
+    )
+    refresh_tokens.configure(
+        redis=app_redis,
+        ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+    )
+    login_throttle.configure(
+        redis=app_redis,
+        max_per_username=settings.LOGIN_MAX_ATTEMPTS_PER_USERNAME,
+        max_per_ip=settings.LOGIN_MAX_ATTEMPTS_PER_IP,
+        window=settings.LOGIN_THROTTLE_WINDOW,
+        enabled=settings.LOGIN_THROTTLE_ENABLED,
+    )
+    password_hasher.configure(
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+        max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+        method=settings.PASSWORD_HASH_METHOD,
+    )
+    token_cache.configure(
+        maxsize=settings.JWT_CACHE_MAXSIZE,
+        enabled=settings.JWT_CACHE_ENABLED,
+    )
+    row_counts.configure(
+        redis=app_redis,
+        exact_ttl=settings.EXACT_COUNT_CACHE_TTL,
+    )
+    row_counts.rebuild_soon(get_async_session_local())
+    user_typeahead.configure(cache_ttl=settings.TYPEAHEAD_CACHE_TTL)
+    await revocation_list.start(
+        app_redis,
+        capacity=settings.REVOCATION_FILTER_CAPACITY,
+        error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+        rebuild_interval=settings.REVOCATION_REBUILD_INTERVAL,
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await revocation_list.stop()
+    await identity_cache.stop()
+    await db.dispose_async()
+    password_hasher.shutdown()
 
 
 # serve the html files
@@ -186,6 +279,7 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(Exception)
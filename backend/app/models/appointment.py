@@ -7,20 +7,31 @@ from datetime import datetime, timedelta
 from typing import Optional
 from .base import Base
 from .doctor import Doctor
-from ..db.session import get_db_session
-from sqlalchemy import Column, String, Integer, DateTime
+from .user import User
+from ..db.session import get_db_session, use_db_session, use_async_session
+from ..db.full_text import full_text
+from sqlalchemy import Column, String, Integer, DateTime, event
 from sqlalchemy.orm import Session, relationship
-from sqlalchemy import Date, Time, ForeignKey, or_, and_
-from .tasks import send_reminder
+from sqlalchemy import Date, Time, ForeignKey, or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pytz import timezone, utc
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy.dialects.postgresql import ENUM, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from enum import Enum as PyEnum
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, literal, text
 from sqlalchemy.exc import SQLAlchemyError
 
 
 logger = logging.getLogger(__name__)
 
+DOCTOR_UNAVAILABLE = "The doctor is not available at this time slot. Please choose another time."
+USER_UNAVAILABLE = "You already have an appointment scheduled at this time slot. Please choose another time."
+SLOT_TAKEN = "This time slot has already been booked. Please choose another time."
+
+# Key in Session.info holding (appointment id, eta) reminders to queue
+# after commit
+PENDING_REMINDERS = "appointment_pending_reminders"
+
 class AppointmentStatus(PyEnum):
     SCHEDULED = "Scheduled"
     COMPLETED = "Completed"
@@ -30,13 +41,17 @@ class AppointmentStatus(PyEnum):
 class Appointment(Base):
     __tablename__ = 'appointments'
 
+    # One live booking per doctor and per user for a slot; a cancelled
+    # slot can be booked again. The enum stores member names.
     __table_args__ = (
-        UniqueConstraint(
-            'doctor_id',
-            'appointment_date',
-            'appointment_time',
-            name='uq_appointment_time'
-        ),
+        Index('uq_appointments_doctor_slot', 'doctor_id', 'appointment_date', 'appointment_time',
+              unique=True, postgresql_where=text("status <> 'CANCELLED'"),
+              sqlite_where=text("status <> 'CANCELLED'")),
+        Index('uq_appointments_user_slot', 'user_id', 'appointment_date', 'appointment_time',
+              unique=True, postgresql_where=text("status <> 'CANCELLED'"),
+              sqlite_where=text("status <> 'CANCELLED'")),
+        # A user's appointments in date order, paginated by keyset
+        Index('ix_appointments_user_date_time_id', 'user_id', 'appointment_date', 'appointment_time', 'id'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -72,11 +87,12 @@ class Appointment(Base):
 
 
     @classmethod
-    def validate_appointment(cls, doctor_id, user_id, appointment_date, appointment_time):
+    def validate_appointment(cls, doctor_id, user_id, appointment_date, appointment_time,
+                             session: Optional[Session] = None):
         """
         Validate that a doctor and user do not have overlapping appointments
         """
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             # Check for conflicting doctor appointments
             doctor_conflict = session.query(cls).filter(
                 cls.doctor_id == doctor_id,
@@ -86,7 +102,7 @@ class Appointment(Base):
             ).first()
 
             if doctor_conflict:
-                raise ValueError("The doctor is not available at this time slot. Please choose another time.")
+                raise ValueError(DOCTOR_UNAVAILABLE)
 
             # Check for conflicting user appointments
             user_conflict = session.query(cls).filter(
@@ -97,91 +113,285 @@ class Appointment(Base):
             ).first()
 
             if user_conflict:
-                raise ValueError("You already have an appointment scheduled at this time slot. Please choose another time.")
+                raise ValueError(USER_UNAVAILABLE)
+
+    @classmethod
+    async def validate_appointment_async(cls, doctor_id, user_id, appointment_date, appointment_time,
+                                         session: Optional[AsyncSession] = None):
+        """
+        Async variant of validate_appointment.
+        """
+        async with use_async_session(session) as session:
+            doctor_conflict = (await session.execute(
+                select(cls.id).where(
+                    cls.doctor_id == doctor_id,
+                    cls.appointment_date == appointment_date,
+                    cls.appointment_time == appointment_time,
+                    cls.status != AppointmentStatus.CANCELLED
+                ).limit(1)
+            )).first()
+
+            if doctor_conflict:
+                raise ValueError(DOCTOR_UNAVAILABLE)
+
+            user_conflict = (await session.execute(
+                select(cls.id).where(
+                    cls.user_id == user_id,
+                    cls.appointment_date == appointment_date,
+                    cls.appointment_time == appointment_time,
+                    cls.status != AppointmentStatus.CANCELLED
+                ).limit(1)
+            )).first()
+
+            if user_conflict:
+                raise ValueError(USER_UNAVAILABLE)
+
+    @staticmethod
+    def _to_utc(appointment_date, appointment_time, user_tz):
+        """
+        Convert a local date and time in the user's timezone to UTC
+        """
+        user_timezone = timezone(user_tz)
+        local_dt = datetime.combine(appointment_date, appointment_time)
+        local_dt_with_tz = user_timezone.localize(local_dt)  # Add timezone info
+        return local_dt_with_tz.astimezone(utc)
+
+    @staticmethod
+    def _to_response(appointment, doctor):
+        """
+        Build the API response dict for an appointment and its doctor
+        """
+        return {
+            "id": appointment.id,
+            "doctor_id": appointment.doctor_id,
+            "user_id": appointment.user_id,
+            "appointment_date": appointment.appointment_date,
+            "appointment_time": appointment.appointment_time,
+            "appointment_note": appointment.appointment_note,
+            "status": appointment.status.value,
+            "created_at": appointment.created_at,
+            "updated_at": appointment.updated_at,
+            "doctor": {
+                "id": doctor.id,
+                "first_name": doctor.user.first_name,
+                "last_name": doctor.user.last_name,
+                "specialization": doctor.specialization
+            }
+        }
+
+    @classmethod
+    def response_query(cls):
+        """
+        Only the columns _to_response uses, with the doctor's names
+        and specialization joined in, as plain rows: one statement
+        per page and no ORM objects to hydrate
+        """
+        return (
+            select(
+                cls.id,
+                cls.doctor_id,
+                cls.user_id,
+                cls.appointment_date,
+                cls.appointment_time,
+                cls.appointment_note,
+                cls.status,
+                cls.created_at,
+                cls.updated_at,
+                Doctor.specialization.label("doctor_specialization"),
+                User.first_name.label("doctor_first_name"),
+                User.last_name.label("doctor_last_name"),
+            )
+            .join(cls.doctor)
+            .join(Doctor.user)
+        )
+
+    @staticmethod
+    def _row_to_response(row):
+        """
+        Build the API response dict from a response_query row
+        """
+        return {
+            "id": row.id,
+            "doctor_id": row.doctor_id,
+            "user_id": row.user_id,
+            "appointment_date": row.appointment_date,
+            "appointment_time": row.appointment_time,
+            "appointment_note": row.appointment_note,
+            "status": row.status.value,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "doctor": {
+                "id": row.doctor_id,
+                "first_name": row.doctor_first_name,
+                "last_name": row.doctor_last_name,
+                "specialization": row.doctor_specialization
+            }
+        }
     
     @classmethod
-    def create_appointment(cls, doctor_id, user_id, appointment_date, appointment_time, appointment_note, user_tz):
+    def _booking_statement(cls, doctor_id, user_id, utc_dt, appointment_note, dialect_name):
+        """
+        Book a slot in one statement: the row is inserted only if the
+        doctor exists and neither the doctor nor the user holds the
+        slot (the partial unique indexes), and comes back in the shape
+        of response_query. No row means the booking failed.
+        """
+        columns = cls.__table__.c
+        doctor = select(
+            Doctor.id,
+            literal(user_id, columns.user_id.type),
+            literal(utc_dt.date(), columns.appointment_date.type),
+            literal(utc_dt.time(), columns.appointment_time.type),
+            literal(appointment_note, columns.appointment_note.type),
+            literal(AppointmentStatus.SCHEDULED, columns.status.type),
+        ).where(Doctor.id == doctor_id)
+        # RETURNING cannot join: the doctor's details are subqueries
+        # on the bound doctor_id, not correlated to the new row
+        doctor_user_id = select(Doctor.user_id).where(Doctor.id == doctor_id).scalar_subquery()
+        insert = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+        return (
+            insert(cls)
+            .from_select(["doctor_id", "user_id", "appointment_date", "appointment_time",
+                          "appointment_note", "status"], doctor)
+            # No conflict target: either slot index stops the insert
+            .on_conflict_do_nothing()
+            .returning(
+                cls.id,
+                cls.doctor_id,
+                cls.user_id,
+                cls.appointment_date,
+                cls.appointment_time,
+                cls.appointment_note,
+                cls.status,
+                cls.created_at,
+                cls.updated_at,
+                select(Doctor.specialization).where(Doctor.id == doctor_id)
+                .scalar_subquery().label("doctor_specialization"),
+                select(User.first_name).where(User.id == doctor_user_id)
+                .scalar_subquery().label("doctor_first_name"),
+                select(User.last_name).where(User.id == doctor_user_id)
+                .scalar_subquery().label("doctor_last_name"),
+            )
+        )
+
+    @classmethod
+    def _booking_failure_query(cls, doctor_id, utc_dt):
+        """
+        Whether the doctor exists and holds the slot, in one statement.
+        An insert that conflicted without either was stopped by the
+        user's own booking of the slot.
+        """
+        doctor_taken = select(cls.id).where(
+            cls.doctor_id == doctor_id,
+            cls.appointment_date == utc_dt.date(),
+            cls.appointment_time == utc_dt.time(),
+            cls.status != AppointmentStatus.CANCELLED
+        ).exists()
+        return select(select(Doctor.id).where(Doctor.id == doctor_id).exists(), doctor_taken)
+
+    @classmethod
+    def slot_taken_query(cls, appointment):
+        """
+        Whether another live booking holds an appointment's slot, by
+        its doctor or its user: reactivating a cancelled appointment
+        would break the slot indexes
+        """
+        return select(select(cls.id).where(
+            or_(cls.doctor_id == appointment.doctor_id, cls.user_id == appointment.user_id),
+            cls.appointment_date == appointment.appointment_date,
+            cls.appointment_time == appointment.appointment_time,
+            cls.status != AppointmentStatus.CANCELLED,
+            cls.id != appointment.id
+        ).exists())
+
+    @staticmethod
+    def _booking_failure(doctor_exists, doctor_taken) -> ValueError:
+        """
+        Why a booking statement inserted nothing
+        """
+        if not doctor_exists:
+            return ValueError("Failed to create appointment: Doctor not found")
+        return ValueError(DOCTOR_UNAVAILABLE if doctor_taken else USER_UNAVAILABLE)
+
+    @staticmethod
+    def remind_on_commit(session: Session, appointment_id: int, utc_dt: datetime) -> None:
+        """
+        Queue the reminder an hour before the appointment once the
+        session commits, so the task never names a booking that was
+        rolled back or is not yet visible to the worker
+        """
+        session.info.setdefault(PENDING_REMINDERS, []).append((appointment_id, utc_dt - timedelta(hours=1)))
+
+    @classmethod
+    def create_appointment(cls, doctor_id, user_id, appointment_date, appointment_time, appointment_note, user_tz,
+                           session: Optional[Session] = None):
         """
         Create and save an appointment after validating,
         storing time in UTC
         """
-        logger = logging.getLogger(__name__)
         logger.debug(f"Creating appointment with params: doctor_id={doctor_id}, user_id={user_id}, "
                      f"date={appointment_date}, time={appointment_time}, tz={user_tz}")
 
-        # Validate the appointment for conflicts
-        cls.validate_appointment(doctor_id, user_id, appointment_date, appointment_time)
-        logger.debug("Appointment validation passed")
+        # Ensuring the appointment is in a future time
+        cls.validate_future_date(appointment_date, appointment_time)
+
+        with use_db_session(session) as session:
+            try:
+                # convert the appointment time to UTC
+                utc_dt = cls._to_utc(appointment_date, appointment_time, user_tz)
+                row = session.execute(cls._booking_statement(
+                    doctor_id, user_id, utc_dt, appointment_note, session.get_bind().dialect.name
+                )).first()
+            except Exception as e:
+                logger.error(f"Failed to create appointment: {str(e)}", exc_info=True)
+                raise ValueError(f"Failed to create appointment: {str(e)}")
+
+            if row is None:
+                failure = session.execute(cls._booking_failure_query(doctor_id, utc_dt))
+                raise cls._booking_failure(*failure.one())
+            logger.debug(f"Created appointment with ID: {row.id}")
+
+            cls.remind_on_commit(session, row.id, utc_dt)
+            return cls._row_to_response(row)
+
+    @classmethod
+    async def create_appointment_async(cls, doctor_id, user_id, appointment_date, appointment_time,
+                                       appointment_note, user_tz, session: Optional[AsyncSession] = None):
+        """
+        Async variant of create_appointment.
+        """
+        logger.debug(f"Creating appointment with params: doctor_id={doctor_id}, user_id={user_id}, "
+                     f"date={appointment_date}, time={appointment_time}, tz={user_tz}")
 
         # Ensuring the appointment is in a future time
         cls.validate_future_date(appointment_date, appointment_time)
-        logger.debug("Future date validation passed")
 
-        try:
-            # convert the appointment time to UTC
-            user_timezone = timezone(user_tz)
-            local_dt = datetime.combine(appointment_date, appointment_time)
-            local_dt_with_tz = user_timezone.localize(local_dt)  # Add timezone info
-            utc_dt = local_dt_with_tz.astimezone(utc)
-            logger.debug(f"Converted time to UTC: {utc_dt}")
-        
-            with get_db_session() as session:
-                # Get doctor information first
-                doctor = session.query(Doctor).join(Doctor.user).filter(Doctor.id == doctor_id).first()
-                if not doctor:
-                    raise ValueError("Doctor not found")
-                logger.debug(f"Found doctor: {doctor.user.first_name} {doctor.user.last_name}")
-
-                appointment = cls(
-                    doctor_id=doctor_id,
-                    user_id=user_id,
-                    appointment_date=utc_dt.date(),
-                    appointment_time=utc_dt.time(),
-                    appointment_note=appointment_note,
-                    status=AppointmentStatus.SCHEDULED
-                )
-                session.add(appointment)
-                session.commit()
-                logger.debug(f"Created appointment with ID: {appointment.id}")
-            
-                # scheduling the reminder task
-                reminder_time = utc_dt - timedelta(hours=1)
-                send_reminder.apply_async(args=[appointment.id], eta=reminder_time)
-                logger.debug("Scheduled reminder task")
-
-                # Prepare response data within the session
-                response_data = {
-                    "id": appointment.id,
-                    "doctor_id": appointment.doctor_id,
-                    "user_id": appointment.user_id,
-                    "appointment_date": appointment.appointment_date,
-                    "appointment_time": appointment.appointment_time,
-                    "appointment_note": appointment.appointment_note,
-                    "status": appointment.status.value,
-                    "created_at": appointment.created_at,
-                    "updated_at": appointment.updated_at,
-                    "doctor": {
-                        "id": doctor.id,
-                        "first_name": doctor.user.first_name,
-                        "last_name": doctor.user.last_name,
-                        "specialization": doctor.specialization
-                    }
-                }
-                logger.debug("Prepared response data")
-                return response_data
-            
-        except Exception as e:
-            logger.error(f"Failed to create appointment: {str(e)}", exc_info=True)
-            raise ValueError(f"Failed to create appointment: {str(e)}")
+        async with use_async_session(session) as session:
+            try:
+                utc_dt = cls._to_utc(appointment_date, appointment_time, user_tz)
+                row = (await session.execute(cls._booking_statement(
+                    doctor_id, user_id, utc_dt, appointment_note, session.get_bind().dialect.name
+                ))).first()
+            except Exception as e:
+                logger.error(f"Failed to create appointment: {str(e)}", exc_info=True)
+                raise ValueError(f"Failed to create appointment: {str(e)}")
+
+            if row is None:
+                failure = await session.execute(cls._booking_failure_query(doctor_id, utc_dt))
+                raise cls._booking_failure(*failure.one())
+            logger.debug(f"Created appointment with ID: {row.id}")
+
+            cls.remind_on_commit(session.sync_session, row.id, utc_dt)
+            return cls._row_to_response(row)
 
     @classmethod
-    def get_appointment(cls, appointment_id, user_tz):
+    def get_appointment(cls, appointment_id, user_tz, session: Optional[Session] = None):
         """
         Retrieve an appointment and convert time to user's local timezone.
         """
         user_timezone = timezone(user_tz)
 
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             appointment = session.query(cls).filter(cls.id == appointment_id).first()
             if not appointment:
                 raise ValueError("Appointment not found.")
@@ -201,6 +411,32 @@ class Appointment(Base):
                 "updated_at": appointment.updated_at
             }
 
+    @classmethod
+    async def get_appointment_async(cls, appointment_id, user_tz, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_appointment.
+        """
+        user_timezone = timezone(user_tz)
+
+        async with use_async_session(session) as session:
+            appointment = await session.get(cls, appointment_id)
+            if not appointment:
+                raise ValueError("Appointment not found.")
+
+            utc_dt = datetime.combine(appointment.appointment_date, appointment.appointment_time).replace(tzinfo=utc)
+            local_dt = utc_dt.astimezone(user_timezone)
+
+            return {
+                "id": appointment.id,
+                "doctor_id": appointment.doctor_id,
+                "user_id": appointment.user_id,
+                "appointment_note": appointment.appointment_note,
+                "appointment_date": local_dt.date(),
+                "appointment_time": local_dt.time(),
+                "created_at": appointment.created_at,
+                "updated_at": appointment.updated_at
+            }
+
     @classmethod
     def validate_future_date(cls, appointment_date, appointment_time):
         """
@@ -213,30 +449,49 @@ class Appointment(Base):
             raise ValueError("Appointment must be scheduled for a future time.")
 
     @classmethod
-    def update_status(cls, appointment_id, status):
+    def update_status(cls, appointment_id, status, session: Optional[Session] = None):
         """
         Update the status of an appointment.
         """
         if status not in AppointmentStatus.__members__:
             raise ValueError("Invalid Appointment status.")
 
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             appointment = session.query(cls).filter(cls.id == appointment_id).first()
             if not appointment:
                 raise ValueError("Appointment not found.")
             appointment.status = AppointmentStatus[status.capitalize()]
-            session.commit()
+            session.flush()
             session.refresh(appointment)
 
         return appointment
 
     @classmethod
-    def get_appointment_by_date(cls, start_date, end_date, doctor_id=None, user_id=None, limit=100, offset=0):
+    async def update_status_async(cls, appointment_id, status, session: Optional[AsyncSession] = None):
+        """
+        Async variant of update_status.
+        """
+        if status not in AppointmentStatus.__members__:
+            raise ValueError("Invalid Appointment status.")
+
+        async with use_async_session(session) as session:
+            appointment = await session.get(cls, appointment_id)
+            if not appointment:
+                raise ValueError("Appointment not found.")
+            appointment.status = AppointmentStatus[status.capitalize()]
+            await session.flush()
+            await session.refresh(appointment)
+
+        return appointment
+
+    @classmethod
+    def get_appointment_by_date(cls, start_date, end_date, doctor_id=None, user_id=None, limit=100, offset=0,
+                                session: Optional[Session] = None):
         """
         Fetch appointments within a date range and optionally
         filter by doctor or user.
         """
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             query = session.query(cls).filter(
                 cls.appointment_date >= start_date,
                 cls.appointment_date <= end_date
@@ -247,24 +502,54 @@ class Appointment(Base):
                 query = query.filter(cls.user_id == user_id)
 
             return query.limit(limit).offset(offset).all()
+
+    @classmethod
+    async def get_appointment_by_date_async(cls, start_date, end_date, doctor_id=None, user_id=None,
+                                            limit=100, offset=0, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_appointment_by_date.
+        """
+        async with use_async_session(session) as session:
+            stmt = select(cls).where(
+                cls.appointment_date >= start_date,
+                cls.appointment_date <= end_date
+            )
+            if doctor_id:
+                stmt = stmt.where(cls.doctor_id == doctor_id)
+            if user_id:
+                stmt = stmt.where(cls.user_id == user_id)
+
+            result = await session.execute(stmt.limit(limit).offset(offset))
+            return result.scalars().all()
     
     @classmethod
-    def search_appointments(cls, user_id: int, keyword: str, session: Optional[Session] = None):
+    def search_appointments(cls, user_id: int, keyword: str, session: Optional[Session] = None,
+                            limit: Optional[int] = None, offset: int = 0):
         """
         Search appointments by keyword for a specific user.
         """
-        session_provided = session is not None
-        if not session_provided:
-            session = SessionLocal()
+        return cls.search(keyword, filters=[cls.user_id == user_id], session=session, limit=limit, offset=offset)
+
+# Full-text index behind search_appointments; english stems the free text
+full_text.register(Appointment, config="english")
+
 
+@event.listens_for(Session, "after_commit")
+def _remind_after_commit(session):
+    """Queue the reminders of the committed bookings"""
+    reminders = session.info.pop(PENDING_REMINDERS, ())
+    if not reminders:
+        return
+    from .tasks import send_reminder
+    for appointment_id, eta in reminders:
         try:
-            results = cls.search(
-                keyword=keyword,
-                *cls.searchable_columns,
-                session=session
-            )
-            return [appointment for appointment in results if appointment.user_id == user_id]
+            send_reminder.apply_async(args=[appointment_id], eta=eta)
+            logger.debug(f"Scheduled reminder task for appointment {appointment_id}")
+        except Exception as e:
+            logger.error(f"Failed to schedule reminder for appointment {appointment_id}: {str(e)}", exc_info=True)
+
 
-        finally:
-            if not session_provided:
-                session.close()
\ No newline at end of file
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    """The bookings were rolled back, nothing to remind"""
+    session.info.pop(PENDING_REMINDERS, None)
@@ -2,33 +2,145 @@
 """
 SQLAlchemy configuration module that provides:
 - Declarative base for models
-- Database engine setup with retry logic
-- Session management
-- Generic search functionality for models
+- Database engine setup, created on first use
+- Session management (sync and asyncio)
+- Generic search functionality for models, backed by full-text indexes
+- Multi-row inserts with RETURNING
 """
-from typing import List, Optional, Type, Any
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Type
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
-from sqlalchemy import create_engine, or_, String, Column
+from sqlalchemy import create_engine, insert, or_, select, String, text
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, DatabaseError
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from ..db.full_text import compile_paths, full_text
+from ..db.pool_metrics import PoolMetrics, instrumented_pool_class, instrument_engine
+from ..db.query_log import slow_query_log
+from ..db.session import use_db_session, use_async_session
+
+
+def get_settings():
+    """
+    Settings, imported on first use: pydantic-settings is a large
+    import that workers and scripts only touching the models skip
+    """
+    from ..settings import get_settings
+    return get_settings()
 
-from config import database_url
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Statements are logged by the slow query log, not the engine
+# logger, which would echo everything at the root INFO level.
+# DB_ECHO turns full echo back on for debugging.
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+# asyncio drivers used when deriving the async URL from DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def to_async_url(db_url: str) -> str:
+    """
+    Swap the driver of a sync database URL for its asyncio
+    counterpart, e.g. postgresql+psycopg2:// -> postgresql+asyncpg://
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for database backend: {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
 class DatabaseConnection:
     """
-    Database connection manager with retry logic
+    Database connection manager. Engines are created on first use,
+    so importing the models never touches the database.
+    URLs default to DATABASE_URL and ASYNC_DATABASE_URL from Settings.
     """
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: Optional[str] = None, async_db_url: Optional[str] = None, pool_role: str = "web"):
         self.db_url = db_url
+        self.async_db_url = async_db_url
+        self.pool_role = pool_role
         self.engine: Optional[Engine] = None
         self.SessionLocal: Optional[sessionmaker] = None
+        self.async_engine: Optional[AsyncEngine] = None
+        self.AsyncSessionLocal: Optional[async_sessionmaker] = None
+        self.pool_metrics = {"sync": PoolMetrics("sync"), "async": PoolMetrics("async")}
+
+    def pool_options(self, asyncio: bool = False) -> dict:
+        """
+        Pool arguments for create_engine. Web processes and Celery
+        workers have separate sizes in Settings: a prefork Celery
+        worker runs one task at a time and needs few connections.
+        """
+        settings = get_settings()
+        if self.pool_role == "celery":
+            size, overflow, timeout = (settings.CELERY_DB_POOL_SIZE, settings.CELERY_DB_MAX_OVERFLOW,
+                                       settings.CELERY_DB_POOL_TIMEOUT)
+        else:
+            size, overflow, timeout = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_TIMEOUT
+        metrics = self.pool_metrics["async" if asyncio else "sync"]
+        return {
+            "poolclass": instrumented_pool_class(metrics, asyncio=asyncio),
+            "pool_pre_ping": True,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_size": size,
+            "max_overflow": overflow,
+            "pool_timeout": timeout,
+        }
+
+    def use_pool_role(self, role: str) -> None:
+        """
+        Rebuild the engines with the pool sizes of another process
+        role. Called in each Celery worker process after fork, so the
+        parent's connections are dropped rather than shared.
+        """
+        self.pool_role = role
+        if self.engine is not None:
+            self.engine.dispose(close=False)
+            self.connect()
+            if self.SessionLocal is not None:
+                self.SessionLocal.configure(bind=self.engine)
+        if self.async_engine is not None:
+            self.async_engine.sync_engine.dispose(close=False)
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+        logger.info(f"Database pools configured for {role} processes")
+
+    def pool_stats(self) -> dict:
+        """
+        Pool gauges, counters and checkout wait histograms
+        """
+        return {
+            "role": self.pool_role,
+            "sync": self.pool_metrics["sync"].stats(),
+            "async": self.pool_metrics["async"].stats(),
+        }
+
+    def connect(self) -> Engine:
+        """
+        Create the engine. No connection is opened until the first query.
+        """
+        if self.db_url is None:
+            self.db_url = get_settings().DATABASE_URL
+        self.engine = create_engine(
+            self.db_url,
+            echo=get_settings().DB_ECHO,
+            **self.pool_options()
+        )
+        instrument_engine(self.engine, self.pool_metrics["sync"])
+        slow_query_log.instrument(self.engine)
+        return self.engine
 
     @retry(
         stop=stop_after_attempt(5),
@@ -38,28 +150,27 @@ class DatabaseConnection:
             f"Database connection attempt {retry_state.attempt_number} failed. Retrying..."
         )
     )
-    def connect(self) -> Engine:
+    def check_connection(self) -> None:
         """
-        Establish database connection with retry logic
+        Open (and return to the pool) one connection, retrying while
+        the database comes up. Called from the application startup hook.
         """
         try:
-            self.engine = create_engine(
-                self.db_url,
-                echo=True,
-                pool_pre_ping=True,
-                pool_recycle=3600,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30,
-            )
-            # Test the connection
-            self.engine.connect()
+            with self.get_engine().connect() as connection:
+                connection.execute(text("SELECT 1"))
             logger.info("Database connection established successfully")
-            return self.engine
         except Exception as e:
             logger.error(f"Failed to connect to database: {str(e)}")
             raise
 
+    def get_engine(self) -> Engine:
+        """
+        Return the engine, creating it on first use
+        """
+        if self.engine is None:
+            self.connect()
+        return self.engine
+
     def init_session(self) -> sessionmaker:
         """
         Initialize session maker with the engine
@@ -74,58 +185,219 @@ class DatabaseConnection:
         )
         return self.SessionLocal
 
-# Initialize database connection
-db = DatabaseConnection(database_url)
-try:
-    engine = db.connect()
-    SessionLocal = db.init_session()
-except Exception as e:
-    logger.error(f"Failed to initialize database: {str(e)}")
-    raise
+    def get_session_local(self) -> sessionmaker:
+        """
+        Return the session maker, creating it on first use
+        """
+        if self.SessionLocal is None:
+            self.init_session()
+        return self.SessionLocal
+
+    def connect_async(self) -> AsyncEngine:
+        """
+        Create the asyncio engine (asyncpg on PostgreSQL).
+        No connection is opened until the first query.
+        """
+        if self.async_db_url is None:
+            settings = get_settings()
+            self.async_db_url = settings.ASYNC_DATABASE_URL or to_async_url(self.db_url or settings.DATABASE_URL)
+        self.async_engine = create_async_engine(
+            self.async_db_url,
+            echo=get_settings().DB_ECHO,
+            **self.pool_options(asyncio=True)
+        )
+        instrument_engine(self.async_engine, self.pool_metrics["async"])
+        slow_query_log.instrument(self.async_engine)
+        logger.info("Async database engine created")
+        return self.async_engine
+
+    def init_async_session(self) -> async_sessionmaker:
+        """
+        Initialize the AsyncSession maker with the async engine
+        """
+        if not self.async_engine:
+            self.connect_async()
+
+        self.AsyncSessionLocal = async_sessionmaker(
+            bind=self.async_engine,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        return self.AsyncSessionLocal
+
+    async def dispose_async(self) -> None:
+        """
+        Close every pooled connection of the async engine
+        """
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+
+# Database connection; engines are created on first use
+db = DatabaseConnection()
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `engine` and `SessionLocal` on first access, so
+    `from app.models.base import SessionLocal` keeps working
+    without creating the engine at import time
+    """
+    if name == "engine":
+        return db.get_engine()
+    if name == "SessionLocal":
+        return db.get_session_local()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_async_session_local() -> async_sessionmaker:
+    """
+    Return the AsyncSession maker, creating the async engine
+    on first use so importing the models never needs asyncpg
+    """
+    if db.AsyncSessionLocal is None:
+        db.init_async_session()
+    return db.AsyncSessionLocal
 
 # Initialize declarative base
 Base = declarative_base()
 
-def search(cls: Type[Base], 
-          keyword: str, 
-          *columns: str, 
-          session: Optional[Session] = None) -> List[Any]:
+def _search_query(cls: Type[Base], keyword: str, columns: tuple, filters: Iterable, dialect_name: str):
+    """
+    Select of the rows matching keyword and every filter criterion.
+    Searching the model's searchable_columns (the default) uses its
+    full-text index, most relevant matches first. Other columns, or
+    a model without an index, fall back to ILIKE '%keyword%' ordered
+    by id.
+    """
+    query = select(cls).where(*filters)
+    index = full_text.index_for(cls, dialect_name)
+    if index is not None and (not columns or list(columns) == list(cls.searchable_columns)):
+        return index.apply(query, cls, keyword, dialect_name)
+
+    if not columns:
+        searchable_columns = [
+            c for c in cls.__table__.columns
+            if isinstance(c.type, String)
+        ]
+    else:
+        # Dotted names join the related model, e.g. "user.first_name"
+        query, resolved = compile_paths(query, cls, columns)
+        searchable_columns = list(resolved.values())
+
+    conditions = [
+        column.ilike(f"%{keyword}%")
+        for column in searchable_columns
+    ]
+    return query.where(or_(*conditions)).order_by(cls.id)
+
+def search(cls: Type[Base],
+          keyword: str,
+          *columns: str,
+          filters: Iterable = (),
+          session: Optional[Session] = None,
+          limit: Optional[int] = None,
+          offset: int = 0) -> List[Any]:
     """
     Generic search method for SQLAlchemy models.
+
+    filters are extra criteria, e.g. [cls.user_id == user_id], and
+    limit and offset page through the matches; all are applied in
+    SQL, so a search scoped to one user reads only that user's rows.
     """
     use_provided_session = session is not None
-    
+
     if not use_provided_session:
-        session = SessionLocal()
-    
+        session = db.get_session_local()()
+
     try:
-        if not columns:
-            searchable_columns = [
-                c for c in cls.__table__.columns 
-                if isinstance(c.type, String)
-            ]
-        else:
-            searchable_columns = []
-            for column_name in columns:
-                column = getattr(cls, column_name, None)
-                if not isinstance(column, Column):
-                    raise ValueError(f"Invalid column name: {column_name}")
-                searchable_columns.append(column)
-
-        conditions = [
-            column.ilike(f"%{keyword}%") 
-            for column in searchable_columns
-        ]
-        
-        return session.query(cls).filter(or_(*conditions)).all()
+        query = _search_query(cls, keyword, columns, filters, session.get_bind().dialect.name)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        return list(session.scalars(query))
 
     except SQLAlchemyError as e:
         session.rollback()
         raise RuntimeError(f"Database error during search: {str(e)}") from e
-    
+
     finally:
         if not use_provided_session:
             session.close()
 
-# Attach search method to Base
-Base.search = classmethod(search)
\ No newline at end of file
+def search_iter(cls: Type[Base],
+               keyword: str,
+               *columns: str,
+               filters: Iterable = (),
+               session: Optional[Session] = None,
+               batch_size: int = 100) -> Iterator[Any]:
+    """
+    Streaming variant of search: yields every match in order,
+    fetching batch_size rows at a time from a server-side cursor
+    where the driver has one. The session stays in use until the
+    iterator is exhausted or closed.
+    """
+    with use_db_session(session) as session:
+        try:
+            query = _search_query(cls, keyword, columns, filters, session.get_bind().dialect.name)
+            yield from session.scalars(query.execution_options(yield_per=batch_size))
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise RuntimeError(f"Database error during search: {str(e)}") from e
+
+# Attach search methods to Base
+Base.search = classmethod(search)
+Base.search_iter = classmethod(search_iter)
+Base._search_query = classmethod(_search_query)
+
+def validate_rows(items: Iterable[dict], build: Callable[..., dict]) -> List[dict]:
+    """
+    Build the insert rows of a batch in one pass. Every invalid item
+    is reported in a single ValueError, so nothing is written unless
+    the whole batch is valid.
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append(build(**item))
+        except (TypeError, ValueError) as e:
+            errors.append(f"Item {index}: {e}")
+    if errors:
+        raise ValueError("; ".join(errors))
+    return rows
+
+def _insert_returning(cls: Type[Base]):
+    # New rows come back in the order of the parameter sets. None is
+    # sent as NULL; otherwise rows with and without a None value
+    # would be split into separate statements.
+    return (
+        insert(cls)
+        .returning(cls, sort_by_parameter_order=True)
+        .execution_options(render_nulls=True)
+    )
+
+def insert_many(cls: Type[Base], rows: List[dict], session: Optional[Session] = None) -> List[Any]:
+    """
+    Insert rows in one INSERT ... RETURNING and return the new
+    instances. Rows should share the same keys; column defaults
+    fill in the columns none of them set.
+    """
+    if not rows:
+        return []
+    with use_db_session(session) as session:
+        return list(session.scalars(_insert_returning(cls), rows))
+
+async def insert_many_async(cls: Type[Base], rows: List[dict],
+                            session: Optional[AsyncSession] = None) -> List[Any]:
+    """
+    Async variant of insert_many.
+    """
+    if not rows:
+        return []
+    async with use_async_session(session) as session:
+        return list(await session.scalars(_insert_returning(cls), rows))
+
+Base.insert_many = classmethod(insert_many)
+Base.insert_many_async = classmethod(insert_many_async)
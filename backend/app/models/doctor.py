@@ -3,11 +3,15 @@
 Doctor model
 """
 from datetime import datetime
+from typing import Optional
 from .base import Base
-from ..db.session import get_db_session
+from .user import User
+from ..db.session import get_db_session, use_db_session, use_async_session
+from ..db.full_text import full_text
 from sqlalchemy import Column, String, Integer, DateTime
 from sqlalchemy.orm import Session, relationship
-from sqlalchemy import ForeignKey, or_, and_
+from sqlalchemy import ForeignKey, or_, and_, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from enum import Enum
 from sqlalchemy.types import Enum as SQLAlchemyEnum
@@ -47,32 +51,59 @@ class Doctor(Base):
         return f'<Doctor {self.id}>'
     
     @classmethod
-    def get_doctor_by_id(cls, doctor_id):
+    def info_query(cls):
+        """
+        Doctor id, names and specialization (the DoctorInfo shape)
+        as plain rows from one join, without hydrating Doctor and
+        User objects
+        """
+        return select(cls.id, User.first_name, User.last_name, cls.specialization).join(cls.user)
+
+    @classmethod
+    def get_doctor_by_id(cls, doctor_id, session: Optional[Session] = None):
         """
         Getting a doctor from the database based on the
         doctor id.
         """
-        with get_db_session() as session:
-            return session.query(cls).filter(cls.id == doctor_id).first()
+        with use_db_session(session) as session:
+            return session.execute(DOCTOR_BY_ID, {"id": doctor_id}).scalars().first()
+
+    @classmethod
+    async def get_doctor_by_id_async(cls, doctor_id, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_doctor_by_id.
+        """
+        async with use_async_session(session) as session:
+            return await session.get(cls, doctor_id)
 
     @classmethod
-    def get_doctor_by_specialization(cls, specialization):
+    def get_doctor_by_specialization(cls, specialization, session: Optional[Session] = None):
         """
         Getting a doctor from the database based on the
         doctor's specialization.
         """
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             return session.query(cls).filter(cls.specialization == specialization).all()
+
+    @classmethod
+    async def get_doctor_by_specialization_async(cls, specialization, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_doctor_by_specialization.
+        """
+        async with use_async_session(session) as session:
+            result = await session.execute(select(cls).where(cls.specialization == specialization))
+            return result.scalars().all()
     
     @classmethod
     def search_doctors(cls, keyword, session=None, limit=100, offset=0):
         """
         Search doctors using the Base search method.
         """
-        return cls.search(
-            keyword=keyword,
-            *cls.searchable_columns,
-            session=session,
-            limit=limit,
-            offset=offset
-        )
\ No newline at end of file
+        return cls.search(keyword, session=session, limit=limit, offset=offset)
+
+# Built once; see USER_BY_USERNAME in user.py
+DOCTOR_BY_ID = select(Doctor).where(Doctor.id == bindparam("id")).limit(1)
+
+# Full-text index behind search_doctors; doctors are also found by
+# their (possibly misspelt) name, through the trigram indexes of users
+full_text.register(Doctor, fuzzy=["user.first_name", "user.last_name"])
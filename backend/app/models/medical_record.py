@@ -3,9 +3,11 @@
 MedicalRecord model
 """
 from datetime import datetime
-from .base import Base
+from typing import List, Optional
+from .base import Base, validate_rows
 from ..db.session import get_db_session
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from ..db.full_text import full_text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy import and_, or_
 from sqlalchemy.exc import SQLAlchemyError
@@ -14,6 +16,11 @@ from sqlalchemy.exc import SQLAlchemyError
 class MedicalRecord(Base):
     __tablename__ = 'medical_records'
 
+    # A user's records in date order
+    __table_args__ = (
+        Index('ix_medical_records_user_record_date', 'user_id', 'record_date'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     doctor_id = Column(Integer, ForeignKey('doctors.id', ondelete='CASCADE'), index=True, nullable=False)
@@ -38,27 +45,52 @@ class MedicalRecord(Base):
         return (f'<MedicalRecord: User: {self.user_id}, Doctor: {self.doctor_id}, '
                 f'Diagnosis: {self.diagnosis}, Record Date: {self.record_date.date()}>')
 
+    @staticmethod
+    def _record_row(user_id, doctor_id, description, diagnosis=None, treatment_plan=None):
+        """
+        Validate a medical record and return its column values
+        """
+        if not description:
+            raise ValueError("Description is required for a medical record.")
+        return {
+            "user_id": user_id,
+            "doctor_id": doctor_id,
+            "description": description,
+            "diagnosis": diagnosis,
+            "treatment_plan": treatment_plan,
+        }
+
     @classmethod
     def create_medical_record(cls, user_id, doctor_id, description, diagnosis=None, treatment_plan=None):
         """
         Create a new medical record.
         """
-        if not description:
-            raise ValueError("Description is required for a medical record.")
+        row = cls._record_row(user_id, doctor_id, description, diagnosis, treatment_plan)
 
         with get_db_session() as session:
-            record = cls(
-                user_id=user_id,
-                doctor_id=doctor_id,
-                description=description,
-                diagnosis=diagnosis,
-                treatment_plan=treatment_plan
-            )
+            record = cls(**row)
             session.add(record)
             session.commit()
             session.refresh(record)
             return record
 
+    @classmethod
+    def create_medical_records(cls, user_id, doctor_id, items: List[dict], session=None):
+        """
+        Create several medical records of a patient in a single
+        INSERT ... RETURNING, validating all of them first.
+        """
+        rows = validate_rows(items, lambda **item: cls._record_row(user_id, doctor_id, **item))
+        return cls.insert_many(rows, session=session)
+
+    @classmethod
+    async def create_medical_records_async(cls, user_id, doctor_id, items: List[dict], session=None):
+        """
+        Async variant of create_medical_records.
+        """
+        rows = validate_rows(items, lambda **item: cls._record_row(user_id, doctor_id, **item))
+        return await cls.insert_many_async(rows, session=session)
+
     @classmethod
     def get_records_by_user(cls, user_id):
         """
@@ -78,8 +110,11 @@ class MedicalRecord(Base):
             return records
 
     @classmethod
-    def search_records(cls, keyword, session=None):
+    def search_records(cls, keyword, session=None, limit: Optional[int] = None, offset: int = 0):
         """
         Search medical records using the Base search method.
         """
-        return cls.search(keyword=keyword, *cls.searchable_columns, session=session)
\ No newline at end of file
+        return cls.search(keyword, session=session, limit=limit, offset=offset)
+
+# Full-text index behind search_records; english stems the free text
+full_text.register(MedicalRecord, config="english")
@@ -4,10 +4,11 @@ Enhanced Prescription model
 """
 import logging
 from datetime import datetime, timedelta
-from typing import Optional
-from .base import Base
+from typing import List, Optional
+from .base import Base, validate_rows
 from ..db.session import get_db_session
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from ..db.full_text import full_text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.sql import func
@@ -28,6 +29,11 @@ class PrescriptionStatus(PyEnum):
 class Prescription(Base):
     __tablename__ = 'prescriptions'
 
+    # check_expired_prescriptions: active prescriptions past expiry
+    __table_args__ = (
+        Index('ix_prescriptions_status_expiry_date', 'status', 'expiry_date'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     doctor_id = Column(Integer, ForeignKey('doctors.id', ondelete='CASCADE'), index=True, nullable=False)
     appointment_id = Column(Integer, ForeignKey('appointments.id', ondelete='CASCADE'), index=True, nullable=False)
@@ -47,7 +53,7 @@ class Prescription(Base):
     doctor = relationship("Doctor", back_populates='prescriptions')
     appointment = relationship("Appointment", back_populates='prescriptions')
 
-    searchable_columns = ["prescription_name", "dosage"]
+    searchable_columns = ["medication_name", "dosage"]
 
     def __repr__(self):
         """
@@ -66,28 +72,54 @@ class Prescription(Base):
             raise ValueError(f"Invalid status: {value}. Must be one of {list(PrescriptionStatus.__members__.values())}.")
         return value
 
+    @staticmethod
+    def _prescription_row(doctor_id, appointment_id, medication_name, dosage, instructions, duration_days=30):
+        """
+        Validate a prescription and return its column values
+        """
+        if not medication_name or not dosage:
+            raise ValueError("Medication name and dosage are required.")
+        return {
+            "doctor_id": doctor_id,
+            "appointment_id": appointment_id,
+            "medication_name": medication_name,
+            "dosage": dosage,
+            "instructions": instructions,
+            "expiry_date": datetime.utcnow() + timedelta(days=duration_days),
+        }
+
     @classmethod
     def create_prescription(cls, doctor_id, appointment_id, medication_name, dosage, instructions, duration_days=30):
         """
         Create and save a prescription.
         """
-        if not medication_name or not dosage:
-            raise ValueError("Medication name and dosage are required.")
+        row = cls._prescription_row(doctor_id, appointment_id, medication_name, dosage, instructions, duration_days)
 
         with get_db_session() as session:
-            prescription = cls(
-                doctor_id=doctor_id,
-                appointment_id=appointment_id,
-                medication_name=medication_name,
-                dosage=dosage,
-                instructions=instructions,
-                expiry_date=datetime.utcnow() + timedelta(days=duration_days)
-            )
+            prescription = cls(**row)
             session.add(prescription)
             session.commit()
             session.refresh(prescription)
 
         return prescription
+
+    @classmethod
+    def create_prescriptions(cls, doctor_id, appointment_id, items: List[dict], session=None):
+        """
+        Create the prescriptions of one appointment in a single
+        INSERT ... RETURNING. Each item holds create_prescription's
+        medication arguments; all are validated before any is written.
+        """
+        rows = validate_rows(items, lambda **item: cls._prescription_row(doctor_id, appointment_id, **item))
+        return cls.insert_many(rows, session=session)
+
+    @classmethod
+    async def create_prescriptions_async(cls, doctor_id, appointment_id, items: List[dict], session=None):
+        """
+        Async variant of create_prescriptions.
+        """
+        rows = validate_rows(items, lambda **item: cls._prescription_row(doctor_id, appointment_id, **item))
+        return await cls.insert_many_async(rows, session=session)
     
     @classmethod
     def get_prescription_by_medication_name(cls, medicine, doctor_id):
@@ -153,20 +185,15 @@ class Prescription(Base):
             internal_session = True
 
         try:
-            # Current time
-            now = datetime.now(db_timezone).replace(microsecond=0)
-
-            # Check if the database is SQLite
-            if session.bind.dialect.name == "sqlite":
-                expired_prescriptions = session.query(cls).filter(
-                    cls.expiry_date < now,
-                    cls.status == PrescriptionStatus.ACTIVE
-                ).all()
-            else:
-                expired_prescriptions = session.query(cls).filter(
-                    func.timezone("Africa/Lagos", cls.expiry_date) < now,
-                    cls.status == PrescriptionStatus.ACTIVE
-                ).all()
+            # Expiry dates are compared as naive Lagos times. Comparing
+            # with the current Lagos time, rather than converting the
+            # column, lets ix_prescriptions_status_expiry_date serve it
+            now = datetime.now(db_timezone).replace(microsecond=0, tzinfo=None)
+
+            expired_prescriptions = session.query(cls).filter(
+                cls.status == PrescriptionStatus.ACTIVE,
+                cls.expiry_date < now
+            ).all()
 
             for prescription in expired_prescriptions:
                 prescription.status = PrescriptionStatus.EXPIRED
@@ -183,22 +210,19 @@ class Prescription(Base):
                 session.close()
     
     @classmethod
-    def search_prescriptions(cls, user_id: int, keyword: str, session=None):
+    def search_prescriptions(cls, user_id: int, keyword: str, session=None,
+                             limit: Optional[int] = None, offset: int = 0):
         """
-        Search prescriptions by keyword for a specific user.
+        Search prescriptions by keyword for a specific user, i.e. the
+        prescriptions of the user's appointments.
         """
-        session_provided = session is not None
-        if not session_provided:
-            session = SessionLocal()
-
-        try:
-            results = cls.search(
-                keyword=keyword,
-                *cls.searchable_columns,
-                session=session
-            )
-            return [prescription for prescription in results if prescription.user_id == user_id]
-
-        finally:
-            if not session_provided:
-                session.close()
+        return cls.search(
+            keyword,
+            filters=[cls.appointment.has(user_id=user_id)],
+            session=session,
+            limit=limit,
+            offset=offset
+        )
+
+# Full-text index behind search_prescriptions
+full_text.register(Prescription)
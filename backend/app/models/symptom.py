@@ -3,9 +3,11 @@
 Enhanced Symptom model
 """
 from datetime import datetime
-from .base import Base
-from ..db.session import get_db_session
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum
+from typing import List, Optional
+from .base import Base, validate_rows
+from ..db.session import get_db_session, use_db_session, use_async_session
+from ..db.full_text import full_text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Index, select
 from sqlalchemy.orm import relationship
 from sqlalchemy import and_, or_
 from sqlalchemy.exc import SQLAlchemyError
@@ -14,6 +16,11 @@ from sqlalchemy.exc import SQLAlchemyError
 class Symptom(Base):
     __tablename__ = 'symptoms'
 
+    # A user's symptoms, and the symptoms recorded on an appointment
+    __table_args__ = (
+        Index('ix_symptoms_user_appointment_name', 'user_id', 'appointment_id', 'symptom_name'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     appointment_id = Column(Integer, ForeignKey('appointments.id', ondelete='CASCADE'), index=True, nullable=False)
@@ -90,6 +97,90 @@ class Symptom(Base):
             if internal_session:
                 session.close()
 
+    @staticmethod
+    def _symptom_row(user_id, appointment_id, symptom_name, severity_level, description=None):
+        """
+        Validate a symptom and return its column values
+        """
+        if not symptom_name:
+            raise ValueError("Symptom name must be specified.")
+        if severity_level not in ["mild", "moderate", "severe"]:
+            raise ValueError("Invalid severity level. Choose from 'mild', 'moderate', or 'severe'.")
+        return {
+            "user_id": user_id,
+            "appointment_id": appointment_id,
+            "symptom_name": symptom_name,
+            "severity_level": severity_level,
+            "description": description,
+        }
+
+    @classmethod
+    def _symptom_rows(cls, user_id, appointment_id, items):
+        rows = validate_rows(items, lambda **item: cls._symptom_row(user_id, appointment_id, **item))
+        names = [row["symptom_name"] for row in rows]
+        if len(set(names)) != len(names):
+            raise ValueError("Each symptom can only be listed once.")
+        return rows
+
+    @classmethod
+    def _recorded_query(cls, user_id, appointment_id, rows):
+        """Symptoms of the batch already recorded on the appointment"""
+        return select(cls).where(
+            cls.user_id == user_id,
+            cls.appointment_id == appointment_id,
+            cls.symptom_name.in_([row["symptom_name"] for row in rows])
+        )
+
+    @staticmethod
+    def _update_recorded(recorded, rows):
+        """
+        Update the recorded symptoms from their rows, like
+        create_symptom does, and return the rows left to insert
+        """
+        by_name = {symptom.symptom_name: symptom for symptom in recorded}
+        for row in rows:
+            symptom = by_name.get(row["symptom_name"])
+            if symptom is not None:
+                symptom.severity_level = row["severity_level"]
+                symptom.description = row["description"]
+                symptom.updated_at = datetime.utcnow()
+        return [row for row in rows if row["symptom_name"] not in by_name]
+
+    @staticmethod
+    def _in_row_order(rows, symptoms):
+        by_name = {symptom.symptom_name: symptom for symptom in symptoms}
+        return [by_name[row["symptom_name"]] for row in rows]
+
+    @classmethod
+    def create_symptoms(cls, user_id, appointment_id, items: List[dict], session=None):
+        """
+        Record several symptoms of an appointment at once. Symptoms
+        already recorded are updated, the rest are created in a
+        single INSERT ... RETURNING. All items are validated first.
+        """
+        rows = cls._symptom_rows(user_id, appointment_id, items)
+        if not rows:
+            return []
+        with use_db_session(session) as session:
+            recorded = session.scalars(cls._recorded_query(user_id, appointment_id, rows)).all()
+            created = cls.insert_many(cls._update_recorded(recorded, rows), session=session)
+            session.flush()
+            return cls._in_row_order(rows, list(recorded) + created)
+
+    @classmethod
+    async def create_symptoms_async(cls, user_id, appointment_id, items: List[dict], session=None):
+        """
+        Async variant of create_symptoms.
+        """
+        rows = cls._symptom_rows(user_id, appointment_id, items)
+        if not rows:
+            return []
+        async with use_async_session(session) as session:
+            recorded = (await session.scalars(cls._recorded_query(user_id, appointment_id, rows))).all()
+            created = await cls.insert_many_async(cls._update_recorded(recorded, rows), session=session)
+            await session.flush()
+            return cls._in_row_order(rows, list(recorded) + created)
+
     @classmethod
     def get_symptom_by_name(cls, symptom_name):
         """
@@ -153,24 +244,12 @@ class Symptom(Base):
                 session.close()
     
     @classmethod
-    def search_symptoms(cls, user_id: int, keyword: str, session=None):
+    def search_symptoms(cls, user_id: int, keyword: str, session=None,
+                        limit: Optional[int] = None, offset: int = 0):
         """
         Search symptoms by keyword for a specific user.
         """
-        session_provided = session is not None
-        if not session_provided:
-            session = SessionLocal()
-
-        try:
-            # Use the Base.search method
-            results = cls.search(
-                keyword=keyword,
-                *cls.searchable_columns,
-                session=session
-            )
-            # Filter by user_id
-            return [symptom for symptom in results if symptom.user_id == user_id]
+        return cls.search(keyword, filters=[cls.user_id == user_id], session=session, limit=limit, offset=offset)
 
-        finally:
-            if not session_provided:
-                session.close()
+# Full-text index behind search_symptoms; english stems the free text
+full_text.register(Symptom, config="english")
@@ -2,13 +2,22 @@
 """
 User model
 """
-from datetime import datetime
+from datetime import datetime, date
+from typing import Optional
 from .base import Base
-from ..db.session import get_db_session
+from ..db.session import get_db_session, use_db_session, use_async_session
+from ..auth.identity_cache import identity_cache
+from ..auth.token_versions import token_versions, TOKEN_CLAIM_FIELDS
+from ..auth.hashing import password_hasher
+from ..db.counting import row_counts
+from ..db.full_text import full_text
+from ..db.typeahead import Typeahead
 from sqlalchemy import Column, String, Integer, DateTime, Date
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Session, relationship
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import ForeignKey, Index, bindparam, select, update, inspect
+from sqlalchemy.orm import Session, relationship, make_transient_to_detached
+from sqlalchemy.orm.strategies import LoadDeferredColumns
+from sqlalchemy.ext.asyncio import AsyncSession
+from werkzeug.security import check_password_hash
 from email_validator import validate_email, EmailNotValidError
 from enum import Enum
 from sqlalchemy.types import Enum as SQLAlchemyEnum
@@ -29,6 +38,12 @@ class UserStatus(str, Enum):
 class User(Base):
     __tablename__ = 'users'
 
+    # Keyset pagination of the admin user and doctor request lists
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+        Index('ix_users_role_created_at_id', 'role', 'created_at', 'id'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(40), nullable=False, index=True)
     last_name = Column(String(40), nullable=False, index=True)
@@ -36,13 +51,13 @@ class User(Base):
     username = Column(String(40), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)
     email = Column(String(40), unique=True, nullable=False)
-    city = Column(String(80), nullable=False, index=True)
-    state = Column(String(40), nullable=False, index=True)
-    country = Column(String(40), nullable=False, index=True)
+    city = Column(String(80), nullable=False)
+    state = Column(String(40), nullable=False)
+    country = Column(String(40), nullable=False)
     profile_picture = Column(String, nullable=True)  # Stores the filename or URL
     status = Column(SQLAlchemyEnum(UserStatus), default=UserStatus.ACTIVE, nullable=False)
     role = Column(SQLAlchemyEnum(UserRole), default=UserRole.USER, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Defining relationship between User and Doctor, Symptom, MedicalRecord
@@ -51,6 +66,7 @@ class User(Base):
     symptoms = relationship("Symptom", back_populates='user')
     medical_records = relationship("MedicalRecord", back_populates='user')
 
+    searchable_columns = ["first_name", "last_name", "username", "email"]
 
     def __repr__(self):
         """
@@ -58,6 +74,60 @@ class User(Base):
         """
         return f'<User {self.first_name} {self.last_name}>'
 
+    def to_identity(self):
+        """
+        JSON-safe snapshot of the user's columns for the identity cache.
+        The password hash is left out (see merge_identity_async).
+        """
+        identity = {}
+        for attr in inspect(type(self)).column_attrs:
+            if attr.key == "password_hash":
+                continue
+            value = getattr(self, attr.key)
+            if isinstance(value, Enum):
+                value = value.value
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            identity[attr.key] = value
+        return identity
+
+    @classmethod
+    def from_identity(cls, identity):
+        """
+        Rebuild a detached User from a to_identity() snapshot. Attach
+        it with merge_identity_async to use it without a query.
+        """
+        values = dict(identity)
+        for key, parse in (("dob", date.fromisoformat),
+                           ("created_at", datetime.fromisoformat),
+                           ("updated_at", datetime.fromisoformat)):
+            if values.get(key):
+                values[key] = parse(values[key])
+        values["status"] = UserStatus(values["status"])
+        values["role"] = UserRole(values["role"])
+        user = cls(**values)
+        make_transient_to_detached(user)
+        return user
+
+    @classmethod
+    async def merge_identity_async(cls, identity, session: AsyncSession):
+        """
+        Attach a User rebuilt from a to_identity() snapshot to the
+        session without a query. The snapshot has no password hash and
+        an AsyncSession cannot lazy load one, so reading it raises
+        InvalidRequestError, as raiseload would, instead of
+        MissingGreenlet. Load the user from the database to check or
+        rehash a password; assigning a new hash works either way.
+        """
+        user = await session.merge(cls.from_identity(identity), load=False)
+        state = inspect(user)
+        if "password_hash" not in state.dict:
+            # Unloaded, like a deferred column with raiseload=True
+            state.expired_attributes.discard("password_hash")
+            state.callables = dict(state.callables,
+                                   password_hash=LoadDeferredColumns("password_hash", raiseload=True))
+        return user
+
     @staticmethod
     def set_password(password):
         """
@@ -66,7 +136,17 @@ class User(Base):
         # Password validation
         if len(password) < 8:
             raise ValueError("Password must be at least 8 characters long")
-        return generate_password_hash(password)
+        return password_hasher.hash_sync(password)
+
+    @staticmethod
+    async def set_password_async(password):
+        """
+        Async variant of set_password. Hashing runs on the
+        password hashing pool instead of the event loop.
+        """
+        if len(password) < 8:
+            raise ValueError("Password must be at least 8 characters long")
+        return await password_hasher.hash(password)
 
     def check_password(self, password):
         """
@@ -74,38 +154,103 @@ class User(Base):
         """
         return check_password_hash(self.password_hash, password)
 
+    async def check_password_async(self, password):
+        """
+        Async variant of check_password.
+        """
+        return await password_hasher.verify(self.password_hash, password)
+
+    @classmethod
+    async def rehash_password_async(cls, user_id, old_hash, password,
+                                    session: Optional[AsyncSession] = None):
+        """
+        Re-hash a verified password with the configured method.
+        The write only lands while the stored hash is still
+        old_hash, so a password changed meanwhile is kept.
+        """
+        new_hash = await password_hasher.hash(password)
+        async with use_async_session(session) as session:
+            result = await session.execute(
+                update(cls)
+                .where(cls.id == user_id, cls.password_hash == old_hash)
+                .values(password_hash=new_hash)
+                .execution_options(synchronize_session=False)
+            )
+        if result.rowcount:
+            password_hasher.rehashed += 1
+        return bool(result.rowcount)
+
     @classmethod
-    def get_user_by_username(cls, username):
+    def get_user_by_username(cls, username, session: Optional[Session] = None):
         """
         Fetch a user from the database based on the username.
         It returns the user object if found, else None.
         """
-        with get_db_session() as session:
-            return session.query(cls).filter(cls.username == username).first()
+        with use_db_session(session) as session:
+            return session.execute(USER_BY_USERNAME, {"username": username}).scalars().first()
 
     @classmethod
-    def get_user_by_id(cls, user_id):
+    async def get_user_by_username_async(cls, username, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_user_by_username.
+        """
+        async with use_async_session(session) as session:
+            result = await session.execute(USER_BY_USERNAME, {"username": username})
+            return result.scalars().first()
+
+    @classmethod
+    def get_user_by_id(cls, user_id, session: Optional[Session] = None):
         """
         Getting a user from the database based on the
         user id.
         """
-        with get_db_session() as session:
-            return session.query(cls).filter(cls.id == user_id).first()
+        with use_db_session(session) as session:
+            return session.execute(USER_BY_ID, {"id": user_id}).scalars().first()
 
     @classmethod
-    def get_user_by_email(cls, user_email):
+    async def get_user_by_id_async(cls, user_id, session: Optional[AsyncSession] = None):
+        """
+        Async variant of get_user_by_id.
+        """
+        async with use_async_session(session) as session:
+            return await session.get(cls, user_id)
+
+    @classmethod
+    def get_user_by_email(cls, user_email, session: Optional[Session] = None):
         """
         Getting a user from the database based on the
         user email.
         """
-        with get_db_session() as session:
-            return session.query(cls).filter(cls.email == user_email).first()
-    
+        with use_db_session(session) as session:
+            return session.execute(USER_BY_EMAIL, {"email": user_email}).scalars().first()
+
     @classmethod
-    def create_user(cls, email, password, **kwargs):
+    async def get_user_by_email_async(cls, user_email, session: Optional[AsyncSession] = None):
         """
-        Creating a user and storing it in the
-        database
+        Async variant of get_user_by_email.
+        """
+        async with use_async_session(session) as session:
+            result = await session.execute(USER_BY_EMAIL, {"email": user_email})
+            return result.scalars().first()
+
+    @classmethod
+    def _build_user(cls, email, password, **kwargs):
+        """
+        Validate the credentials and build an unsaved user
+        with a hashed password
+        """
+        cls._validate_credentials(email, password)
+
+        # calling set_password to hash the password
+        hashed_password = cls.set_password(password)
+
+        # Create a user instance
+        return cls(email=email, password_hash=hashed_password, **kwargs)
+
+    @staticmethod
+    def _validate_credentials(email, password):
+        """
+        Check the email and password before hashing
         """
         if not email or not password:
             raise ValueError("email and password are required")
@@ -117,19 +262,38 @@ class User(Base):
         except EmailNotValidError as e:
             raise ValueError(f"Invalid email address: {str(e)}")
 
-        # calling set_password to hash the password
-        hashed_password = cls.set_password(password)
-
-        # Create a user instance
-        user = cls(email=email, password_hash=hashed_password, **kwargs)
+    @classmethod
+    def create_user(cls, email, password, session: Optional[Session] = None, **kwargs):
+        """
+        Creating a user and storing it in the
+        database
+        """
+        user = cls._build_user(email, password, **kwargs)
 
         # saving the user instance to the database
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             session.add(user)
-            session.commit()
+            session.flush()
             session.refresh(user)
 
         return user
+
+    @classmethod
+    async def create_user_async(cls, email, password, session: Optional[AsyncSession] = None, **kwargs):
+        """
+        Async variant of create_user. The row is flushed so the
+        id is available; the owning session commits it.
+        """
+        cls._validate_credentials(email, password)
+        hashed_password = await cls.set_password_async(password)
+        user = cls(email=email, password_hash=hashed_password, **kwargs)
+
+        async with use_async_session(session) as session:
+            session.add(user)
+            await session.flush()
+            await session.refresh(user)
+
+        return user
     
     @property
     def age(self):
@@ -145,7 +309,7 @@ class User(Base):
         except Exception as e:
             raise ValueError(f"Error calculating age: {e}")
 
-    def update_user(self, **kwargs):
+    def update_user(self, session: Optional[Session] = None, **kwargs):
         """
         Updating a user details using keyword
         arguments for the field to update
@@ -153,11 +317,49 @@ class User(Base):
         if not kwargs:
             return {"message": "Please pass in a keyword argument"}
 
+        old_username = self.username
+        if self._apply_updates(**kwargs):
+            with use_db_session(session) as session:
+                session.add(self)
+                session.flush()
+                identity_cache.invalidate_on_commit(session, old_username)
+                if TOKEN_CLAIM_FIELDS & kwargs.keys():
+                    token_versions.bump_on_commit(session, self.id)
+            return {"message": "user updated successfully"}
+        return {"message": "no valid fields to update"}
+
+    async def update_user_async(self, session: Optional[AsyncSession] = None, **kwargs):
+        """
+        Async variant of update_user.
+        """
+        if not kwargs:
+            return {"message": "Please pass in a keyword argument"}
+
+        if "password_hash" in kwargs:
+            kwargs["password_hash"] = await self.set_password_async(kwargs["password_hash"])
+
+        old_username = self.username
+        if self._apply_updates(hash_password=False, **kwargs):
+            async with use_async_session(session) as session:
+                session.add(self)
+                await session.flush()
+                identity_cache.invalidate_on_commit(session, old_username)
+                if TOKEN_CLAIM_FIELDS & kwargs.keys():
+                    token_versions.bump_on_commit(session, self.id)
+            return {"message": "user updated successfully"}
+        return {"message": "no valid fields to update"}
+
+    def _apply_updates(self, hash_password=True, **kwargs):
+        """
+        Set the given attributes on the instance, hashing a new
+        password unless the caller already did. Returns True if
+        anything was changed.
+        """
         updated = False
         for key, value in kwargs.items():
             if hasattr(self, key):
                 # Check if the password is being updated
-                if key == "password_hash":
+                if key == "password_hash" and hash_password:
                     # Hash the new password before updating
                     value = self.set_password(value)
                 setattr(self, key, value)
@@ -166,19 +368,28 @@ class User(Base):
         if updated:
             # Update the updated_at column
             self.updated_at = datetime.utcnow()
-            with get_db_session() as session:
-                session.add(self)
-                session.commit()
-            return {"message": "user updated successfully"}
-        return {"message": "no valid fields to update"}
+        return updated
 
-    def delete(self):
+    def delete(self, session: Optional[Session] = None):
         """
         Delete a user instance from the database
         """
-        with get_db_session() as session:
+        with use_db_session(session) as session:
             session.delete(self)
-            session.commit()
+            session.flush()
+            identity_cache.invalidate_on_commit(session, self.username)
+            token_versions.bump_on_commit(session, self.id)
+            return {"message": f"User {self.id} deleted successfully"}
+
+    async def delete_async(self, session: Optional[AsyncSession] = None):
+        """
+        Async variant of delete.
+        """
+        async with use_async_session(session) as session:
+            await session.delete(self)
+            await session.flush()
+            identity_cache.invalidate_on_commit(session, self.username)
+            token_versions.bump_on_commit(session, self.id)
             return {"message": f"User {self.id} deleted successfully"}
     
     @classmethod
@@ -194,11 +405,26 @@ class User(Base):
             List[User]: List of matching user instances
         """
         with get_db_session() as session:
-            return cls.search(
-                keyword,
-                "first_name",
-                "last_name",
-                "username",
-                "email",
-                session=session
-            )
\ No newline at end of file
+            return cls.search(keyword, session=session)
+
+
+# Lookups run several times per request. Built once with bound
+# parameters, their cache key is memoized on the statement and the
+# compiled form is reused, so a call only binds the value.
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username")).limit(1)
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+USER_BY_ID = select(User).where(User.id == bindparam("id")).limit(1)
+
+# Redis counters behind count=estimate on the admin user lists
+row_counts.track(User, "users", [(), ("role",)])
+
+# Full-text index behind search_users; names also match misspelt
+full_text.register(User, fuzzy=["first_name", "last_name"])
+
+# Admin user typeahead: prefix matches of the columns, the fields the
+# dropdown shows
+user_typeahead = Typeahead(
+    User,
+    columns=["username", "email", "first_name", "last_name"],
+    fields=["id", "username", "email", "first_name", "last_name", "role"],
+)
@@ -5,17 +5,30 @@ Admin routes
 import traceback
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from math import ceil
 from datetime import datetime
 
-from ..auth.dependencies import get_admin_user
-from ..models.user import User, UserRole, UserStatus
+from ..auth.dependencies import get_admin_user, Principal
+from ..auth.identity_cache import identity_cache
+from ..auth.token_versions import token_versions
+from ..auth.hashing import password_hasher
+from ..auth.token_cache import token_cache
+from ..auth.revocation import revocation_list
+from ..auth.refresh_tokens import refresh_tokens
+from ..auth.login_throttle import login_throttle
+from ..models.base import db
+from ..models.user import User, UserRole, UserStatus, user_typeahead
 from ..models.doctor import Doctor, DoctorStatus
-from ..db.session import get_db_session
+from ..db.session import get_async_db
+from ..db.query_log import slow_query_log
+from ..db.query_counter import query_counter
+from ..db.pagination import Keyset, InvalidCursor
+from ..db.counting import CountMode, counter_key, row_counts
 from ..logging import security_logger
 
 class UserOut(BaseModel):
@@ -26,19 +39,29 @@ class UserOut(BaseModel):
     first_name: str
     last_name: str
     created_at: datetime
-    last_login: Optional[datetime]
+    last_login: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
+class UserSuggestion(BaseModel):
+    id: int
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+    role: str
+
 class PaginatedResponse(BaseModel):
-    total: int
-    total_pages: int
-    page: int
+    # Totals are counted on the first page only; count_kind says
+    # whether they are exact, estimated or not counted ("none")
+    total: Optional[int]
+    total_pages: Optional[int]
+    count_kind: str
     per_page: int
     users: List[UserOut]
-    next_page: Optional[int]
-    prev_page: Optional[int]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
 
 class DoctorRequestDetails(BaseModel):
     id: int
@@ -54,13 +77,13 @@ class DoctorRequestDetails(BaseModel):
         orm_mode = True
 
 class DoctorRequestResponse(BaseModel):
-    total: int
-    total_pages: int
-    page: int
+    total: Optional[int]
+    total_pages: Optional[int]
+    count_kind: str
     per_page: int
     requests: List[DoctorRequestDetails]
-    next_page: Optional[int]
-    prev_page: Optional[int]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
 
 class DashboardStats(BaseModel):
     total_users: int
@@ -72,83 +95,144 @@ class DashboardStats(BaseModel):
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/verify", response_model=dict)
-async def verify_admin_access(admin_user: User = Depends(get_admin_user)):
+async def verify_admin_access(admin_user: Principal = Depends(get_admin_user)):
     """Verify admin access"""
     return {"status": "ok", "role": str(admin_user.role)}
 
-async def validate_user_exists(user_id: int, session) -> User:
+@router.get("/metrics", response_model=dict)
+async def get_metrics(admin_user: Principal = Depends(get_admin_user)):
+    """Runtime counters for caches and pools"""
+    return {
+        "identity_cache": identity_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "revocation": revocation_list.stats(),
+        "refresh_tokens": refresh_tokens.stats(),
+        "login_throttle": login_throttle.stats(),
+        "db_pool": db.pool_stats(),
+        "slow_queries": slow_query_log.stats(),
+        "queries": query_counter.stats(),
+        "row_counts": row_counts.stats(),
+        "user_typeahead": user_typeahead.stats(),
+    }
+
+# Sort columns the user lists can be paginated by; each is indexed
+# and NOT NULL (users.created_at since migration f2b7d4e9a1c5), as a
+# keyset cursor cannot encode a NULL, and the id breaks ties
+USER_SORT_COLUMNS = {
+    "created_at": User.created_at,
+    "username": User.username,
+    "first_name": User.first_name,
+    "last_name": User.last_name,
+    "id": User.id,
+}
+
+def user_keyset(name: str, sort_by: str, sort_order: str) -> Keyset:
+    """Keyset for a whitelisted user sort column"""
+    if sort_by not in USER_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field: {sort_by}. Valid fields: {list(USER_SORT_COLUMNS)}"
+        )
+    columns = [USER_SORT_COLUMNS[sort_by]] if sort_by == "id" else [USER_SORT_COLUMNS[sort_by], User.id]
+    return Keyset(f"{name}:{sort_by}", columns, descending=sort_order.lower() == "desc")
+
+def user_sort_key(sort_by: str):
+    """Key values of a User for the keyset built by user_keyset"""
+    if sort_by == "id":
+        return lambda user: (user.id,)
+    return lambda user: (getattr(user, sort_by), user.id)
+
+async def validate_user_exists(user_id: int, session: AsyncSession) -> User:
     """Helper function to validate user existence"""
-    user = session.query(User).filter(User.id == user_id).first()
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @router.get("/users", response_model=PaginatedResponse, summary="Fetch Users")
 async def get_all_users(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     limit: int = Query(10, ge=1, le=100, description="Maximum number of records to return"),
     search: Optional[str] = Query(None, min_length=2, description="Search by username, email, or name"),
     role: Optional[str] = Query(None, description="Filter by user role"),
     sort_by: str = Query("created_at", description="Sort field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
-    admin_user: User = Depends(get_admin_user),
+    count: CountMode = Query(CountMode.EXACT, description="Total to include: exact, estimate or none"),
+    admin_user: Principal = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """
-    Fetch all users with advanced filtering, sorting, and pagination
+    Fetch all users with advanced filtering, sorting, and cursor pagination
     """
+    keyset = user_keyset("users", sort_by, sort_order)
     try:
-        with get_db_session() as session:
-            query = session.query(User)
-
-            # Apply filters
-            if search:
-                search = f"%{search}%"
-                query = query.filter(
-                    (User.username.ilike(search)) |
-                    (User.email.ilike(search)) |
-                    (User.first_name.ilike(search)) |
-                    (User.last_name.ilike(search))
-                )
-            
-            if role and role in [r.value for r in UserRole]:
-                query = query.filter(User.role == role)
-
-            # Apply sorting
-            sort_column = getattr(User, sort_by, User.created_at)
-            if sort_order.lower() == "desc":
-                sort_column = sort_column.desc()
-            query = query.order_by(sort_column)
-
-            # Get total count for pagination
-            total_users = query.count()
-            total_pages = ceil(total_users / limit)
-            current_page = (skip // limit) + 1
-
-            # Get paginated results
-            users = query.offset(skip).limit(limit).all()
-
-            # Calculate next and previous pages
-            next_page = current_page + 1 if current_page < total_pages else None
-            prev_page = current_page - 1 if current_page > 1 else None
-
-            return {
-                "total": total_users,
-                "total_pages": total_pages,
-                "page": current_page,
-                "per_page": limit,
-                "users": users,
-                "next_page": next_page,
-                "prev_page": prev_page,
-            }
+        query = select(User)
+
+        # Apply filters
+        if search:
+            search = f"%{search}%"
+            query = query.filter(
+                (User.username.ilike(search)) |
+                (User.email.ilike(search)) |
+                (User.first_name.ilike(search)) |
+                (User.last_name.ilike(search))
+            )
+
+        # Redis counter matching the filters, for estimates
+        counter = counter_key("users")
+        if role and role in [r.value for r in UserRole]:
+            query = query.filter(User.role == role)
+            counter = counter_key("users", role=role)
+        if search:
+            counter = None
+
+        # Count on the first page only; later pages are a keyset seek
+        total_users, count_kind = await row_counts.count(
+            session, query, CountMode.NONE if cursor else count, counter
+        )
+
+        rows = (await session.execute(keyset.apply(query, limit, cursor))).scalars().all()
+        users, next_cursor, prev_cursor = keyset.page(rows, limit, cursor, user_sort_key(sort_by))
+
+        return {
+            "total": total_users,
+            "total_pages": ceil(total_users / limit) if total_users is not None else None,
+            "count_kind": count_kind,
+            "per_page": limit,
+            "users": users,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         security_logger.error(f"Error fetching users: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch users")
 
+@router.get("/users/typeahead", response_model=List[UserSuggestion], summary="Suggest Users")
+async def suggest_users(
+    q: str = Query(..., min_length=1, max_length=40, description="Prefix of a username, email, or name"),
+    limit: int = Query(8, ge=1, le=20, description="Maximum number of suggestions"),
+    admin_user: Principal = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Users with a username, email, first or last name starting with q,
+    for search-as-you-type. Top matches only: no count, no pages.
+    """
+    try:
+        return await user_typeahead.search(session, q, limit)
+    except Exception as e:
+        security_logger.error(f"Error suggesting users: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to suggest users")
+
 @router.put("/users/{user_id}/role")
 async def update_user_role(
     user_id: int,
     new_role: str,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: Principal = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """Update a user's role with additional validation and logging"""
     valid_roles = [role.value for role in UserRole]
@@ -159,34 +243,35 @@ async def update_user_role(
         )
 
     try:
-        with get_db_session() as session:
-            user = await validate_user_exists(user_id, session)
-            
-            # Prevent admin from modifying their own role
-            if user.id == admin_user.id:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cannot modify your own role"
-                )
-
-            old_role = user.role
-            user.role = new_role
-            user.updated_at = datetime.utcnow()
-            session.commit()
-
-            security_logger.info(
-                f"User role updated | User: {user.username} | "
-                f"Old role: {old_role} | New role: {new_role} | "
-                f"Updated by: {admin_user.username}"
-            )
+        user = await validate_user_exists(user_id, session)
 
-            return JSONResponse(
-                content={
-                    "message": f"Role updated to {new_role} for user {user.username}",
-                    "old_role": old_role,
-                    "new_role": new_role
-                }
+        # Prevent admin from modifying their own role
+        if user.id == admin_user.id:
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot modify your own role"
             )
+
+        old_role = user.role
+        user.role = new_role
+        user.updated_at = datetime.utcnow()
+        await session.flush()
+        identity_cache.invalidate_on_commit(session, user.username)
+        token_versions.bump_on_commit(session, user.id)
+
+        security_logger.info(
+            f"User role updated | User: {user.username} | "
+            f"Old role: {old_role} | New role: {new_role} | "
+            f"Updated by: {admin_user.username}"
+        )
+
+        return JSONResponse(
+            content={
+                "message": f"Role updated to {new_role} for user {user.username}",
+                "old_role": old_role,
+                "new_role": new_role
+            }
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -196,57 +281,60 @@ async def update_user_role(
 
 @router.get("/doctor-requests", response_model=DoctorRequestResponse)
 async def get_doctor_requests(
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100),
     status: str = Query(None),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
-    admin_user: User = Depends(get_admin_user),
+    count: CountMode = Query(CountMode.EXACT),
+    admin_user: Principal = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_async_db),
 ):
+    keyset = user_keyset("doctor-requests", sort_by, sort_order)
     try:
-        with get_db_session() as session:
-            query = session.query(User, Doctor).join(Doctor, User.id == Doctor.user_id)
-
-            # Apply status filter using correct enum values
-            if status == "pending":
-                query = query.filter(User.role == UserRole.DOCTOR_PENDING)
-            elif status == "approved":
-                query = query.filter(User.role == UserRole.DOCTOR)
-            else:
-                # Default to showing pending requests
-                query = query.filter(User.role == UserRole.DOCTOR_PENDING)
-
-            # Apply sorting
-            sort_column = getattr(User, sort_by, User.created_at)
-            if sort_order.lower() == "desc":
-                sort_column = sort_column.desc()
-            query = query.order_by(sort_column)
-
-            total_requests = query.count()
-            total_pages = ceil(total_requests / limit)
-            current_page = (skip // limit) + 1
-
-            users = query.offset(skip).limit(limit).all()
-
-            return {
-                "total": total_requests,
-                "total_pages": total_pages,
-                "page": current_page,
-                "per_page": limit,
-                "requests": [{
-                    "id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "created_at": user.created_at,
-                    "specialization": doctor.specialization,
-                    "license_number": doctor.license_number,
-                    "role": user.role.value
-                } for user, doctor in users],
-                "next_page": current_page + 1 if current_page < total_pages else None,
-                "prev_page": current_page - 1 if current_page > 1 else None
-            }
+        query = select(User, Doctor).join(Doctor, User.id == Doctor.user_id)
+
+        # Apply status filter using correct enum values
+        if status == "pending":
+            role = UserRole.DOCTOR_PENDING
+        elif status == "approved":
+            role = UserRole.DOCTOR
+        else:
+            # Default to showing pending requests
+            role = UserRole.DOCTOR_PENDING
+        query = query.filter(User.role == role)
+
+        # Every doctor and pending doctor has a doctor profile, so the
+        # per-role user counter stands in for the joined count
+        total_requests, count_kind = await row_counts.count(
+            session, query, CountMode.NONE if cursor else count, counter_key("users", role=role)
+        )
+
+        rows = (await session.execute(keyset.apply(query, limit, cursor))).all()
+        sort_key = user_sort_key(sort_by)
+        users, next_cursor, prev_cursor = keyset.page(rows, limit, cursor, lambda row: sort_key(row[0]))
+
+        return {
+            "total": total_requests,
+            "total_pages": ceil(total_requests / limit) if total_requests is not None else None,
+            "count_kind": count_kind,
+            "per_page": limit,
+            "requests": [{
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "created_at": user.created_at,
+                "specialization": doctor.specialization,
+                "license_number": doctor.license_number,
+                "role": user.role.value
+            } for user, doctor in users],
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         security_logger.error(f"Error fetching doctor requests: {str(e)}")
         security_logger.error(f"Error type: {type(e)}")
@@ -256,46 +344,50 @@ async def get_doctor_requests(
 @router.put("/doctor-requests/{user_id}/approve")
 async def approve_doctor_request(
     user_id: int,
-    admin_user: User = Depends(get_admin_user),
-    approval_notes: Optional[str] = None
+    admin_user: Principal = Depends(get_admin_user),
+    approval_notes: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_db),
 ):
     """Approve a doctor request with optional approval notes"""
     try:
-        with get_db_session() as session:
-            # Get the user and their doctor record
-            user = await validate_user_exists(user_id, session)
-            doctor = session.query(Doctor).filter(Doctor.user_id == user.id).first()
-
-            if not doctor or user.role != UserRole.DOCTOR_PENDING:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Can only approve pending doctor requests"
-                )
-
-            # Update both user role and doctor status
-            user.role = UserRole.DOCTOR
-            doctor.status = DoctorStatus.APPROVED
-            doctor.approved_by = admin_user.id
-            doctor.approved_at = datetime.utcnow()
-
-            if approval_notes:
-                doctor.approval_notes = approval_notes
-
-            session.commit()
-
-            # Log the approval
-            security_logger.info(
-                f"Doctor request approved | User: {user.username} | "
-                f"Approved by: {admin_user.username}"
+        # Get the user and their doctor record
+        user = await validate_user_exists(user_id, session)
+        doctor = (await session.execute(
+            select(Doctor).filter(Doctor.user_id == user.id)
+        )).scalars().first()
+
+        if not doctor or user.role != UserRole.DOCTOR_PENDING:
+            raise HTTPException(
+                status_code=400,
+                detail="Can only approve pending doctor requests"
             )
 
-            return JSONResponse(
-                content={
-                    "message": f"Doctor request approved for user {user.username}",
-                    "approval_date": doctor.approved_at.isoformat(),
-                    "approved_by": admin_user.username
-                }
-            )
+        # Update both user role and doctor status
+        user.role = UserRole.DOCTOR
+        doctor.status = DoctorStatus.APPROVED
+        doctor.approved_by = admin_user.id
+        doctor.approved_at = datetime.utcnow()
+
+        if approval_notes:
+            doctor.approval_notes = approval_notes
+
+        await session.flush()
+        identity_cache.invalidate_on_commit(session, user.username)
+        token_versions.bump_on_commit(session, user.id)
+
+        # Log the approval
+        security_logger.info(
+            f"Doctor request approved | User: {user.username} | "
+            f"Approved by: {admin_user.username}"
+        )
+
+        return JSONResponse(
+            content={
+                "message": f"Doctor request approved for user {user.username}",
+                "approval_date": doctor.approved_at.isoformat(),
+                "approved_by": admin_user.username
+            }
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -305,45 +397,47 @@ async def approve_doctor_request(
 @router.put("/doctor-requests/{user_id}/reject")
 async def reject_doctor_request(
     user_id: int,
-    admin_user: User = Depends(get_admin_user),
-    rejection_reason: str = Query(..., min_length=10, description="Reason for rejection")
+    admin_user: Principal = Depends(get_admin_user),
+    rejection_reason: str = Query(..., min_length=10, description="Reason for rejection"),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """
     Reject a doctor request with a mandatory rejection reason
     """
     try:
-        with get_db_session() as session:
-            user = await validate_user_exists(user_id, session)
-            
-            if user.role != UserRole.DOCTOR_PENDING:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Can only reject pending doctor requests"
-                )
-
-            user.role = UserRole.USER
-            user.previous_role = UserRole.DOCTOR_PENDING
-            user.rejection_date = datetime.utcnow()
-            user.rejected_by = admin_user.id
-            user.rejection_reason = rejection_reason
-
-            session.commit()
-
-            # Log the rejection
-            security_logger.info(
-                f"Doctor request rejected | User: {user.username} | "
-                f"Rejected by: {admin_user.username} | "
-                f"Reason: {rejection_reason}"
-            )
+        user = await validate_user_exists(user_id, session)
 
-            return JSONResponse(
-                content={
-                    "message": f"Doctor request rejected for user {user.username}",
-                    "rejection_date": user.rejection_date.isoformat(),
-                    "rejected_by": admin_user.username,
-                    "reason": rejection_reason
-                }
+        if user.role != UserRole.DOCTOR_PENDING:
+            raise HTTPException(
+                status_code=400,
+                detail="Can only reject pending doctor requests"
             )
+
+        user.role = UserRole.USER
+        user.previous_role = UserRole.DOCTOR_PENDING
+        user.rejection_date = datetime.utcnow()
+        user.rejected_by = admin_user.id
+        user.rejection_reason = rejection_reason
+
+        await session.flush()
+        identity_cache.invalidate_on_commit(session, user.username)
+        token_versions.bump_on_commit(session, user.id)
+
+        # Log the rejection
+        security_logger.info(
+            f"Doctor request rejected | User: {user.username} | "
+            f"Rejected by: {admin_user.username} | "
+            f"Reason: {rejection_reason}"
+        )
+
+        return JSONResponse(
+            content={
+                "message": f"Doctor request rejected for user {user.username}",
+                "rejection_date": user.rejection_date.isoformat(),
+                "rejected_by": admin_user.username,
+                "reason": rejection_reason
+            }
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -352,63 +446,53 @@ async def reject_doctor_request(
 
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_admin_dashboard(
-    admin_user: User = Depends(get_admin_user),
-    days: int = Query(30, ge=1, le=365)
+    admin_user: Principal = Depends(get_admin_user),
+    days: int = Query(30, ge=1, le=365),
+    session: AsyncSession = Depends(get_async_db),
 ):
     try:
-        with get_db_session() as session:
-            # Basic stats
-            total_users = session.query(User).count()
-
-            # Role distribution
-            role_counts = (
-                session.query(User.role, func.count(User.role))
-                .group_by(User.role)
-                .all()
-            )
-            role_summary = {role.value: count for role, count in role_counts}
-
-            # Get approved doctors count
-            total_doctors = (
-                session.query(User)
-                .filter(User.role == UserRole.DOCTOR)
-                .count()
-            )
-
-            # Pending doctor requests
-            pending_count = (
-                session.query(User)
-                .filter(User.role == UserRole.DOCTOR_PENDING)
-                .count()
-            )
-
-            # Recent pending requests
-            recent_pending = (
-                session.query(User)
-                .filter(User.role == UserRole.DOCTOR_PENDING)
-                .order_by(User.created_at.desc())
-                .limit(5)
-                .all()
-            )
-
-            return {
-                "total_users": total_users,
-                "role_summary": role_summary,
-                "pending_doctor_requests": pending_count,
-                "total_doctors": total_doctors,
-                "top_pending_requests": [
-                    {
-                        "id": user.id,
-                        "username": user.username,
-                        "email": user.email,
-                        "created_at": user.created_at,
-                        "first_name": user.first_name,
-                        "last_name": user.last_name
-                    }
-                    for user in recent_pending
-                ],
-                "recent_activities": []
-            }
+        # Role distribution; the totals below are derived from it
+        role_counts = (await session.execute(
+            select(User.role, func.count(User.role))
+            .group_by(User.role)
+        )).all()
+        role_summary = {role.value: count for role, count in role_counts}
+
+        # Basic stats
+        total_users = sum(role_summary.values())
+
+        # Get approved doctors count
+        total_doctors = role_summary.get(UserRole.DOCTOR.value, 0)
+
+        # Pending doctor requests
+        pending_count = role_summary.get(UserRole.DOCTOR_PENDING.value, 0)
+
+        # Recent pending requests
+        recent_pending = (await session.execute(
+            select(User)
+            .filter(User.role == UserRole.DOCTOR_PENDING)
+            .order_by(User.created_at.desc())
+            .limit(5)
+        )).scalars().all()
+
+        return {
+            "total_users": total_users,
+            "role_summary": role_summary,
+            "pending_doctor_requests": pending_count,
+            "total_doctors": total_doctors,
+            "top_pending_requests": [
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "email": user.email,
+                    "created_at": user.created_at,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name
+                }
+                for user in recent_pending
+            ],
+            "recent_activities": []
+        }
     except Exception as e:
         security_logger.error(f"Error fetching dashboard data: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch dashboard data")
\ No newline at end of file
@@ -57,9 +57,11 @@ class AppointmentUpdate(BaseModel):
 
 class AppointmentList(BaseModel):
     items: List[AppointmentResponse]
-    total: int
-    page: int
+    total: Optional[int]  # first page only
+    count_kind: str  # exact, estimate or none
     size: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
 
     class Config:
         form_attributes = True
\ No newline at end of file
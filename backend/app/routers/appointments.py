@@ -4,11 +4,16 @@ import json
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from datetime import date, time, datetime, timedelta
 from typing import List, Optional
-from ..auth.dependencies import get_current_active_user
-from ..models.appointment import Appointment, AppointmentStatus
-from ..models.user import User
+from sqlalchemy import select, func
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..auth.dependencies import get_active_principal, Principal
+from ..models.appointment import Appointment, AppointmentStatus, SLOT_TAKEN
 from ..models.doctor import Doctor, DoctorStatus
-from ..db.session import get_db_session
+from ..db.session import get_async_db
+from ..db.pagination import Keyset, InvalidCursor
+from ..db.counting import CountMode, row_counts
 from ..logging import security_logger
 from .appointment_schemas import (
     AppointmentCreate, 
@@ -20,30 +25,25 @@ from .appointment_schemas import (
 
 router = APIRouter(prefix="/api/v1/appointments", tags=["appointments"])
 
+# A user's appointments in date order (ix_appointments_user_date_time_id)
+APPOINTMENT_KEYSET = Keyset(
+    "appointments",
+    [Appointment.appointment_date, Appointment.appointment_time, Appointment.id]
+)
+
 # List doctors endpoint - needs to be before the /{appointment_id} route
 # List doctors endpoint
 @router.get("/doctors", tags=["doctors"])
 async def list_doctors(
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """List all approved doctors"""
     try:
-        with get_db_session() as session:
-            doctors = (
-                session.query(Doctor)
-                .join(Doctor.user)
-                .filter(Doctor.status == DoctorStatus.APPROVED)
-                .all()
-            )
-            
-            return [
-                {
-                    "id": doctor.id,
-                    "first_name": doctor.user.first_name,
-                    "last_name": doctor.user.last_name,
-                    "specialization": doctor.specialization
-                } for doctor in doctors
-            ]
+        result = await session.execute(
+            Doctor.info_query().filter(Doctor.status == DoctorStatus.APPROVED)
+        )
+        return [dict(row) for row in result.mappings()]
     except Exception as e:
         security_logger.error(f"Failed to fetch doctors: {str(e)}")
         raise HTTPException(
@@ -54,12 +54,14 @@ async def list_doctors(
 # List appointments endpoint
 @router.get("/list")
 async def list_appointments(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_active_principal),
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    count: CountMode = Query(CountMode.EXACT, description="Total to include: exact, estimate or none"),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """List user's appointments within a date range"""
     try:
@@ -68,55 +70,44 @@ async def list_appointments(
         if not end_date:
             end_date = start_date + timedelta(days=30)
 
-        with get_db_session() as session:
-            # Base query with joins
-            query = (
-                session.query(Appointment)
-                .join(Appointment.doctor)
-                .join(Doctor.user)
-                .filter(
-                    Appointment.user_id == current_user.id,
-                    Appointment.appointment_date >= start_date,
-                    Appointment.appointment_date <= end_date
-                )
-            )
-            
-            if status:
-                query = query.filter(Appointment.status == AppointmentStatus[status.upper()])
-            
-            # Get total count
-            total = query.count()
-            
-            # Get paginated results
-            appointments = query.order_by(
-                Appointment.appointment_date.asc(),
-                Appointment.appointment_time.asc()
-            ).offset(offset).limit(limit).all()
+        # Projected columns, joined for the doctor's details
+        query = Appointment.response_query().filter(
+            Appointment.user_id == current_user.id,
+            Appointment.appointment_date >= start_date,
+            Appointment.appointment_date <= end_date
+        )
+
+        if status:
+            query = query.filter(Appointment.status == AppointmentStatus[status.upper()])
 
-            return {
-                "items": [
-                    {
-                        "id": appt.id,
-                        "doctor_id": appt.doctor_id,
-                        "user_id": appt.user_id,
-                        "appointment_date": appt.appointment_date,
-                        "appointment_time": appt.appointment_time,
-                        "appointment_note": appt.appointment_note,
-                        "status": appt.status.value,
-                        "created_at": appt.created_at,
-                        "updated_at": appt.updated_at,
-                        "doctor": {
-                            "id": appt.doctor.id,
-                            "first_name": appt.doctor.user.first_name,
-                            "last_name": appt.doctor.user.last_name,
-                            "specialization": appt.doctor.specialization
-                        }
-                    } for appt in appointments
-                ],
-                "total": total,
-                "page": (offset // limit) + 1,
-                "size": limit
-            }
+        # An exact total on the first page is a window count in the
+        # same statement; an estimate comes from the planner. Later
+        # pages are a keyset seek without a total.
+        mode = CountMode.NONE if cursor else count
+        total, count_kind = None, CountMode.NONE.value
+        if mode == CountMode.ESTIMATE:
+            total, count_kind = await row_counts.count(session, query, mode)
+        elif mode == CountMode.EXACT:
+            query = query.add_columns(func.count().over().label("total"))
+        rows = (await session.execute(APPOINTMENT_KEYSET.apply(query, limit, cursor))).all()
+
+        if mode == CountMode.EXACT:
+            total, count_kind = (rows[0].total if rows else 0), CountMode.EXACT.value
+
+        rows, next_cursor, prev_cursor = APPOINTMENT_KEYSET.page(
+            rows, limit, cursor, lambda row: (row.appointment_date, row.appointment_time, row.id)
+        )
+
+        return {
+            "items": [Appointment._row_to_response(row) for row in rows],
+            "total": total,
+            "count_kind": count_kind,
+            "size": limit,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         security_logger.error(f"Failed to fetch appointments: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch appointments")
@@ -126,18 +117,20 @@ async def list_appointments(
 @router.post("/", response_model=AppointmentResponse)
 async def create_appointment(
     appointment_data: AppointmentCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Create a new appointment"""
     try:
         # Create appointment - this now returns a dictionary with all needed data
-        appointment_data = Appointment.create_appointment(
+        appointment_data = await Appointment.create_appointment_async(
             doctor_id=appointment_data.doctor_id,
             user_id=current_user.id,
             appointment_date=appointment_data.appointment_date,
             appointment_time=appointment_data.appointment_time,
             appointment_note=appointment_data.appointment_note,
-            user_tz=appointment_data.user_timezone
+            user_tz=appointment_data.user_timezone,
+            session=session
         )
             
         security_logger.info(
@@ -156,47 +149,27 @@ async def create_appointment(
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Get appointment details"""
     try:
-        with get_db_session() as session:
-            # Query appointment with doctor info in a single query
-            appointment = (
-                session.query(Appointment)
-                .join(Appointment.doctor)
-                .join(Doctor.user)
-                .filter(Appointment.id == appointment_id)
-                .first()
+        # Appointment and doctor info as one projected row
+        appointment = (await session.execute(
+            Appointment.response_query().filter(Appointment.id == appointment_id)
+        )).first()
+
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+
+        if appointment.user_id != current_user.id:
+            security_logger.warning(
+                f"Unauthorized appointment access attempt: User {current_user.id} tried to access appointment {appointment_id}"
             )
-            
-            if not appointment:
-                raise HTTPException(status_code=404, detail="Appointment not found")
-            
-            if appointment.user_id != current_user.id:
-                security_logger.warning(
-                    f"Unauthorized appointment access attempt: User {current_user.id} tried to access appointment {appointment_id}"
-                )
-                raise HTTPException(status_code=403, detail="Not authorized to view this appointment")
-            
-            # Return data in the same format as create_appointment
-            return {
-                "id": appointment.id,
-                "doctor_id": appointment.doctor_id,
-                "user_id": appointment.user_id,
-                "appointment_date": appointment.appointment_date,
-                "appointment_time": appointment.appointment_time,
-                "appointment_note": appointment.appointment_note,
-                "status": appointment.status.value,
-                "created_at": appointment.created_at,
-                "updated_at": appointment.updated_at,
-                "doctor": {
-                    "id": appointment.doctor.id,
-                    "first_name": appointment.doctor.user.first_name,
-                    "last_name": appointment.doctor.user.last_name,
-                    "specialization": appointment.doctor.specialization
-                }
-            }
+            raise HTTPException(status_code=403, detail="Not authorized to view this appointment")
+
+        # Return data in the same format as create_appointment
+        return Appointment._row_to_response(appointment)
     except HTTPException:
         raise
     except Exception as e:
@@ -208,33 +181,48 @@ async def get_appointment(
 async def update_appointment_status(
     appointment_id: int,
     update_data: AppointmentUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Update appointment status"""
     try:
-        with get_db_session() as session:
-            appointment = session.query(Appointment).filter(
-                Appointment.id == appointment_id
-            ).first()
-            
-            if not appointment:
-                raise HTTPException(status_code=404, detail="Appointment not found")
-            
-            if appointment.user_id != current_user.id:
-                security_logger.warning(
-                    f"Unauthorized appointment update attempt: User {current_user.id} tried to update appointment {appointment_id}"
-                )
-                raise HTTPException(status_code=403, detail="Not authorized to update this appointment")
+        appointment = (await session.execute(
+            select(Appointment)
+            .join(Appointment.doctor)
+            .join(Doctor.user)
+            .options(contains_eager(Appointment.doctor).contains_eager(Doctor.user))
+            .filter(Appointment.id == appointment_id)
+        )).scalars().first()
 
-            appointment.status = AppointmentStatus[update_data.status.upper()]
-            session.commit()
-            session.refresh(appointment)
-            
-            security_logger.info(
-                f"Appointment {appointment_id} status updated to {update_data.status} by user {current_user.id}"
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+
+        if appointment.user_id != current_user.id:
+            security_logger.warning(
+                f"Unauthorized appointment update attempt: User {current_user.id} tried to update appointment {appointment_id}"
             )
-            
-            return AppointmentResponse.from_orm(appointment)
+            raise HTTPException(status_code=403, detail="Not authorized to update this appointment")
+
+        status = AppointmentStatus[update_data.status.upper()]
+        # A cancelled slot may have been booked again since
+        if appointment.status == AppointmentStatus.CANCELLED and status != AppointmentStatus.CANCELLED:
+            if (await session.execute(Appointment.slot_taken_query(appointment))).scalar():
+                raise HTTPException(status_code=409, detail=SLOT_TAKEN)
+        appointment.status = status
+        try:
+            await session.flush()
+        except IntegrityError:
+            # Booked between the check and the update
+            await session.rollback()
+            raise HTTPException(status_code=409, detail=SLOT_TAKEN)
+
+        security_logger.info(
+            f"Appointment {appointment_id} status updated to {update_data.status} by user {current_user.id}"
+        )
+
+        return Appointment._to_response(appointment, appointment.doctor)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -245,34 +233,37 @@ async def update_appointment_status(
 @router.delete("/{appointment_id}", response_model=AppointmentResponse)
 async def cancel_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Cancel an appointment"""
     try:
-        with get_db_session() as session:
-            appointment = session.query(Appointment).filter(
-                Appointment.id == appointment_id
-            ).first()
-            
-            if not appointment:
-                raise HTTPException(status_code=404, detail="Appointment not found")
-                
-            if appointment.user_id != current_user.id:
-                security_logger.warning(
-                    f"Unauthorized appointment cancellation attempt: User {current_user.id} tried to cancel appointment {appointment_id}"
-                )
-                raise HTTPException(status_code=403, detail="Not authorized to cancel this appointment")
-                
-            if appointment.status != AppointmentStatus.SCHEDULED:
-                raise HTTPException(status_code=400, detail="Can only cancel scheduled appointments")
+        appointment = (await session.execute(
+            select(Appointment)
+            .join(Appointment.doctor)
+            .join(Doctor.user)
+            .options(contains_eager(Appointment.doctor).contains_eager(Doctor.user))
+            .filter(Appointment.id == appointment_id)
+        )).scalars().first()
 
-            appointment.status = AppointmentStatus.CANCELLED
-            session.commit()
-            session.refresh(appointment)
-            
-            security_logger.info(f"Appointment {appointment_id} cancelled by user {current_user.id}")
-            
-            return AppointmentResponse.from_orm(appointment)
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+
+        if appointment.user_id != current_user.id:
+            security_logger.warning(
+                f"Unauthorized appointment cancellation attempt: User {current_user.id} tried to cancel appointment {appointment_id}"
+            )
+            raise HTTPException(status_code=403, detail="Not authorized to cancel this appointment")
+
+        if appointment.status != AppointmentStatus.SCHEDULED:
+            raise HTTPException(status_code=400, detail="Can only cancel scheduled appointments")
+
+        appointment.status = AppointmentStatus.CANCELLED
+        await session.flush()
+
+        security_logger.info(f"Appointment {appointment_id} cancelled by user {current_user.id}")
+
+        return Appointment._to_response(appointment, appointment.doctor)
     except HTTPException:
         raise
     except Exception as e:
@@ -3,19 +3,27 @@
 Authentication routes
 """
 import secrets
-import aioredis
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi import BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi_limiter.depends import RateLimiter
 from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..auth.jwt import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, verify_token
+from ..auth.jwt import user_claims, is_stateless_payload
+from ..auth.token_versions import token_versions
+from ..auth.hashing import HasherBusy, password_hasher
+from ..auth.revocation import revocation_list
+from ..auth.token_cache import token_cache
+from ..auth.refresh_tokens import refresh_tokens, RefreshTokenReused
+from ..auth.login_throttle import login_throttle
 from ..auth.dependencies import get_current_active_user
 from ..models.user import User
-from ..db.session import get_db_session
-from ..db.redis import redis
+from ..db.session import get_async_db
+from ..db.redis import get_redis
 from ..logging import security_logger
+from ..settings import get_settings
 from pydantic import BaseModel, EmailStr
 from ..email.sender import send_password_reset_email
 
@@ -30,6 +38,12 @@ class PasswordReset(BaseModel):
     token: str
     new_password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class UserCreate(BaseModel):
     username: str
     email: EmailStr
@@ -42,118 +56,200 @@ class UserCreate(BaseModel):
     country: str
 
 
+def access_claims(claims: dict) -> dict:
+    """
+    The claims to sign into an access token. Token version claims
+    are only included when stateless auth is enabled.
+    """
+    if get_settings().STATELESS_AUTH and is_stateless_payload(claims):
+        return {key: claims[key] for key in ("sub", "uid", "role", "status", "tv")}
+    return {"sub": claims["sub"], "role": claims["role"]}
+
+async def rehash_password(user_id: int, old_hash: str, password: str):
+    """
+    Upgrade a password hash to the configured cost. Runs after the
+    login response; on failure the next login tries again.
+    """
+    try:
+        if await User.rehash_password_async(user_id, old_hash, password):
+            security_logger.info(f"Password hash upgraded for user {user_id}")
+    except Exception as e:
+        security_logger.warning(f"Password rehash failed for user {user_id}: {str(e)}")
+
+
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Login endpoint"""
-    with get_db_session() as session:
-        user = User.get_user_by_username(form_data.username)
-        if not user or not user.check_password(form_data.password):
-            security_logger.warning(f"Failed login attempt for username: {form_data.username}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        security_logger.info(f"User {form_data.username} logged in successfully")
-        if user.status != "active":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Inactive user"
-            )
+    # Throttle before any database or hashing work
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await login_throttle.check(form_data.username, client_ip)
+    if retry_after:
+        security_logger.warning(f"Login throttled for username: {form_data.username} from {client_ip}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    user = await User.get_user_by_username_async(form_data.username, session=session)
+    try:
+        password_ok = user is not None and await user.check_password_async(form_data.password)
+    except HasherBusy:
+        security_logger.warning(f"Login shed, password hashing queue full: {form_data.username}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not password_ok:
+        security_logger.warning(f"Failed login attempt for username: {form_data.username}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    security_logger.info(f"User {form_data.username} logged in successfully")
+    await login_throttle.record_success(form_data.username, client_ip)
+    if user.status != "active":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
     
+    if password_hasher.needs_rehash(user.password_hash):
+        background_tasks.add_task(rehash_password, user.id, user.password_hash, form_data.password)
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    # Extract just the role name, not the full enum value
-    role_value = user.role.value if hasattr(user.role, 'value') else str(user.role)
-    access_token = create_access_token(
-        data={"sub": user.username, "role": role_value},
+    # Refresh tokens and stateless access tokens carry the user's token version
+    response = {"token_type": "bearer"}
+    claims = user_claims(user)
+    try:
+        claims = user_claims(user, await token_versions.get(user.id))
+        response["refresh_token"] = await refresh_tokens.issue(claims)
+    except Exception as e:
+        security_logger.warning(f"Refresh token unavailable, issuing an access token only: {str(e)}")
+    response["access_token"] = create_access_token(
+        data=access_claims(claims),
         expires_delta=access_token_expires
     )
-    print(f"Token data: {access_token}")
-    return {"access_token": access_token, "token_type": "bearer"}
+    return response
 
 @router.post("/register")
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, session: AsyncSession = Depends(get_async_db)):
     """Register new user with validated data"""
-    with get_db_session() as session:
-        try:
-            # Add password strength validation
-            if len(user_data.password) < 8:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Password must be at least 8 characters long"
-                )
-
-            if User.get_user_by_username(user_data.username):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Username already exists"
-                )
-            if User.get_user_by_email(user_data.email):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already exists"
-                )
-
-            user = User.create_user(**user_data.dict())
-            security_logger.info(f"New user registered: {user.username}")
-            return {"message": "User created successfully", "user_id": user.id}
-
-        except HTTPException as he:
-            raise he
-        except Exception as e:
-            security_logger.error(f"Error during user registration: {str(e)}")
+    try:
+        # Add password strength validation
+        if len(user_data.password) < 8:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Internal server error"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Password must be at least 8 characters long"
+            )
+
+        if await User.get_user_by_username_async(user_data.username, session=session):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already exists"
             )
+        if await User.get_user_by_email_async(user_data.email, session=session):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already exists"
+            )
+
+        user = await User.create_user_async(session=session, **user_data.dict())
+        security_logger.info(f"New user registered: {user.username}")
+        return {"message": "User created successfully", "user_id": user.id}
+
+    except HTTPException as he:
+        raise he
+    except HasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except Exception as e:
+        security_logger.error(f"Error during user registration: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
 
 @router.post("/logout")
-async def logout():
-    """Logout endpoint - We'll just return a success message since the actual token 
-    invalidation will be handled on the frontend"""
+async def logout(request: Optional[LogoutRequest] = None, token: str = Depends(oauth2_scheme)):
+    """
+    Logout endpoint. Revokes the presented access token for the
+    rest of its lifetime, and the session's refresh token if given.
+    """
+    if request is not None and request.refresh_token:
+        try:
+            await refresh_tokens.revoke(request.refresh_token)
+        except Exception as e:
+            security_logger.error(f"Error revoking refresh token: {str(e)}")
+
+    payload = verify_token(token)
+    if payload is None or not payload.get("jti"):
+        # Invalid, expired or issued before tokens carried an id
+        return {"message": "Successfully logged out"}
+
+    try:
+        await revocation_list.revoke(payload["jti"], payload["exp"])
+    except Exception as e:
+        security_logger.error(f"Error revoking token for user {payload.get('sub')}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Logout could not be completed, please retry"
+        )
+    token_cache.discard(token)
+    security_logger.info(f"User {payload.get('sub')} logged out")
     return {"message": "Successfully logged out"}
 
 @router.post("/request-password-reset")
 async def request_password_reset(
     request: PasswordResetRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Request a password reset"""
     try:
-        with get_db_session() as session:
-            user = User.get_user_by_email(request.email)
-            if not user:
-                security_logger.info(f"Password reset requested for non-existent email: {request.email}")
-                return {"message": "If the email exists, a password reset link will be sent"}
+        user = await User.get_user_by_email_async(request.email, session=session)
+        if not user:
+            security_logger.info(f"Password reset requested for non-existent email: {request.email}")
+            return {"message": "If the email exists, a password reset link will be sent"}
+
+        token = secrets.token_urlsafe(32)
+
+        try:
+            await get_redis().setex(f"password_reset_token:{token}", 3600, request.email)
+        except Exception as redis_error:
+            security_logger.error(f"Redis error during password reset: {str(redis_error)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error processing request"
+            )
 
-            token = secrets.token_urlsafe(32)
+        reset_link = f"http://localhost:8000/reset-password.html?token={token}"
 
+        # Simplified background task function
+        async def send_email_background():
             try:
-                await redis.setex(f"password_reset_token:{token}", 3600, request.email)
-            except Exception as redis_error:
-                security_logger.error(f"Redis error during password reset: {str(redis_error)}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Error processing request"
-                )
-
-            reset_link = f"http://localhost:8000/reset-password.html?token={token}"
-
-            # Simplified background task function
-            async def send_email_background():
-                try:
-                    await send_password_reset_email(request.email, reset_link)
-                except Exception as email_error:
-                    security_logger.error(f"Failed to send password reset email to {request.email}: {str(email_error)}")
-                    await redis.delete(f"password_reset_token:{token}")
-                    # Don't raise here, as it's in a background task
-                    return
-
-            background_tasks.add_task(send_email_background)
-
-            security_logger.info(f"Password reset process initiated for user: {user.username}")
-            return {"message": "If the email exists, a password reset link will be sent"}
+                await send_password_reset_email(request.email, reset_link)
+            except Exception as email_error:
+                security_logger.error(f"Failed to send password reset email to {request.email}: {str(email_error)}")
+                await get_redis().delete(f"password_reset_token:{token}")
+                # Don't raise here, as it's in a background task
+                return
+
+        background_tasks.add_task(send_email_background)
+
+        security_logger.info(f"Password reset process initiated for user: {user.username}")
+        return {"message": "If the email exists, a password reset link will be sent"}
 
     except Exception as e:
         security_logger.error(f"Error in password reset request: {str(e)}")
@@ -166,7 +262,7 @@ async def request_password_reset(
 async def verify_reset_token(token: str):
     """Verify if the reset token is valid"""
     try:
-        email = await redis.get(f"password_reset_token:{token}")
+        email = await get_redis().get(f"password_reset_token:{token}")
         if not email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -181,78 +277,77 @@ async def verify_reset_token(token: str):
         )
 
 @router.post("/reset-password")
-async def reset_password(reset_data: PasswordReset):
+async def reset_password(reset_data: PasswordReset, session: AsyncSession = Depends(get_async_db)):
     """Reset password using token"""
     # Fetch token from Redis
-    email = await redis.get(f"password_reset_token:{reset_data.token}")
+    email = await get_redis().get(f"password_reset_token:{reset_data.token}")
     if not email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired reset token"
         )
 
-    with get_db_session() as session:
-        user = User.get_user_by_email(email)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User not found"
-            )
+    user = await User.get_user_by_email_async(email, session=session)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User not found"
+        )
 
-        # Update user password
-        user.update_user(password_hash=reset_data.new_password)
-        session.commit()
+    # Update user password
+    await user.update_user_async(session=session, password_hash=reset_data.new_password)
 
-        # Remove the token from Redis
-        await redis.delete(f"password_reset_token:{reset_data.token}")
+    # Remove the token from Redis
+    await get_redis().delete(f"password_reset_token:{reset_data.token}")
 
     return {"message": "Password successfully reset"}
 
 
 @router.post("/refresh-token", dependencies=[Depends(RateLimiter(times=5, seconds=60))])
-async def refresh_token(token: str = Depends(oauth2_scheme)):
+async def refresh_token(request: RefreshRequest):
     """
     Refresh access token endpoint
-    Validates the provided token and refreshes it if it's about to expire.
-    Limited to 5 requests per minute per user.
+    Exchanges a refresh token for a new access token and a new
+    refresh token, without a password check or database query.
+    A refresh token can be used once; reusing one revokes the
+    session. Limited to 5 requests per minute.
     """
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+    )
     try:
-        # Verify the provided token
-        payload = verify_token(token)
-        if not payload:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-            )
-
-        # Check token expiration
-        exp = datetime.fromtimestamp(payload.get("exp"))
-        time_until_expire = exp - datetime.utcnow()
-
-        # If the token is valid and has more than 5 minutes remaining
-        if time_until_expire > timedelta(minutes=5):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Token is still valid",
-                headers={"X-Token-Expire-Time": str(exp)}
-            )
+        try:
+            rotated = await refresh_tokens.rotate(request.refresh_token)
+        except RefreshTokenReused as e:
+            security_logger.warning(f"{str(e)}; session revoked")
+            raise invalid_token
+        if rotated is None:
+            raise invalid_token
+        claims, new_refresh_token = rotated
+
+        # Password, role or status changes since login end the session
+        if not await token_versions.is_current(int(claims["uid"]), int(claims["tv"])):
+            await refresh_tokens.revoke(new_refresh_token)
+            raise invalid_token
 
         # Create a new access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         new_access_token = create_access_token(
-            data={"sub": payload.get("sub")},
+            data=access_claims(claims),
             expires_delta=access_token_expires
         )
         new_expiry = datetime.utcnow() + access_token_expires
 
         # Log the token refresh
-        security_logger.info(f"Token refreshed for user: {payload.get('sub')}")
+        security_logger.info(f"Token refreshed for user: {claims.get('sub')}")
 
         return {
             "access_token": new_access_token,
             "token_type": "bearer",
             "expires_in": int(access_token_expires.total_seconds()),
-            "expires_at": new_expiry.isoformat()
+            "expires_at": new_expiry.isoformat(),
+            "refresh_token": new_refresh_token
         }
 
     except HTTPException as he:
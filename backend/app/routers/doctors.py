@@ -4,20 +4,31 @@ Doctor-specifc route
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, time, datetime, timedelta
 from typing import List, Optional, Dict
 from pydantic import BaseModel, Field, validator
-from ..auth.dependencies import get_current_active_user
+from ..auth.dependencies import get_active_principal, Principal
+from ..auth.identity_cache import identity_cache
+from ..auth.token_versions import token_versions
 from ..models.appointment import Appointment, AppointmentStatus
 from ..models.user import User, UserRole
 from ..models.doctor import Doctor, DoctorStatus
-from ..db.session import get_db_session
+from ..models.prescription import Prescription, PrescriptionStatus
+from ..models.symptom import Symptom
+from ..models.medical_record import MedicalRecord
+from ..db.session import get_async_db
+from ..logging import security_logger
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
 logger = logging.getLogger(__name__)
 
+# Items accepted per list in one batch request
+MAX_BATCH_ITEMS = 50
+
 class DoctorCreate(BaseModel):
     phone_number: str
     specialization: str
@@ -49,49 +60,178 @@ class DoctorResponse(BaseModel):
     status: DoctorStatus
     created_at: datetime
 
+class PrescriptionIn(BaseModel):
+    medication_name: str
+    dosage: str
+    instructions: str
+    duration_days: int = Field(30, ge=1, le=365)
+
+
+class PrescriptionOut(BaseModel):
+    id: int
+    doctor_id: int
+    appointment_id: int
+    medication_name: str
+    dosage: str
+    instructions: str
+    status: PrescriptionStatus
+    expiry_date: datetime
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class SymptomIn(BaseModel):
+    symptom_name: str
+    severity_level: str
+    description: Optional[str] = None
+
+
+class SymptomOut(BaseModel):
+    id: int
+    user_id: int
+    appointment_id: int
+    symptom_name: str
+    severity_level: str
+    description: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class MedicalRecordIn(BaseModel):
+    description: str
+    diagnosis: Optional[str] = None
+    treatment_plan: Optional[str] = None
+
+
+class MedicalRecordOut(BaseModel):
+    id: int
+    user_id: int
+    doctor_id: int
+    record_date: datetime
+    description: str
+    diagnosis: Optional[str]
+    treatment_plan: Optional[str]
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ConsultationIn(BaseModel):
+    prescriptions: List[PrescriptionIn] = []
+    symptoms: List[SymptomIn] = []
+    medical_records: List[MedicalRecordIn] = []
+
+
+class ConsultationOut(BaseModel):
+    prescriptions: List[PrescriptionOut]
+    symptoms: List[SymptomOut]
+    medical_records: List[MedicalRecordOut]
+
+
+async def get_consulted_appointment(
+    appointment_id: int,
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
+) -> Appointment:
+    """The appointment, if the current user is its approved doctor"""
+    if current_user.role != UserRole.DOCTOR:
+        raise HTTPException(status_code=403, detail="Doctor access required")
+    appointment = (await session.execute(
+        select(Appointment)
+        .join(Doctor, Appointment.doctor_id == Doctor.id)
+        .where(
+            Appointment.id == appointment_id,
+            Doctor.user_id == current_user.id,
+            Doctor.status == DoctorStatus.APPROVED
+        )
+    )).scalars().first()
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return appointment
+
+
+def check_batch_size(*batches: list):
+    for batch in batches:
+        if len(batch) > MAX_BATCH_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_BATCH_ITEMS} items can be saved per list"
+            )
+
+
+async def save_consultation(appointment: Appointment, data: ConsultationIn, session: AsyncSession) -> dict:
+    """
+    Save the notes of a consultation: one statement per kind of
+    item, all in the request's transaction
+    """
+    check_batch_size(data.prescriptions, data.symptoms, data.medical_records)
+    # An invalid item raises before its kind is written; the
+    # request's transaction then rolls back anything already saved
+    return {
+        "prescriptions": await Prescription.create_prescriptions_async(
+            appointment.doctor_id, appointment.id,
+            [item.dict() for item in data.prescriptions], session=session
+        ),
+        "symptoms": await Symptom.create_symptoms_async(
+            appointment.user_id, appointment.id,
+            [item.dict() for item in data.symptoms], session=session
+        ),
+        "medical_records": await MedicalRecord.create_medical_records_async(
+            appointment.user_id, appointment.doctor_id,
+            [item.dict() for item in data.medical_records], session=session
+        ),
+    }
+
+
 @router.post("/register", response_model=DoctorResponse)
 async def register_doctor(
     doctor_data: DoctorCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Register an existing user as a doctor"""
     try:
-        with get_db_session() as session:
-            # Check if user already has a doctor registration
-            existing_doctor = session.query(Doctor).filter(
-                Doctor.user_id == current_user.id
-            ).first()
-
-            if existing_doctor:
-                logger.warning(f"User {current_user.username} attempted duplicate doctor registration")
-                raise HTTPException(
-                    status_code=400,
-                    detail="Doctor registration already exists"
-                )
-
-            # Create doctor entry
-            doctor = Doctor(
-                user_id=current_user.id,
-                phone_number=doctor_data.phone_number,
-                specialization=doctor_data.specialization,
-                license_number=doctor_data.license_number,
-                status=DoctorStatus.PENDING
+        # Check if user already has a doctor registration
+        existing_doctor = (await session.execute(
+            select(Doctor).filter(Doctor.user_id == current_user.id)
+        )).scalars().first()
+
+        if existing_doctor:
+            logger.warning(f"User {current_user.username} attempted duplicate doctor registration")
+            raise HTTPException(
+                status_code=400,
+                detail="Doctor registration already exists"
             )
 
-            # Get the user from the current session
-            user = session.query(User).filter(User.id == current_user.id).first()
-            # Update user role to DOCTOR_PENDING
-            user.role = UserRole.DOCTOR_PENDING
+        # Create doctor entry
+        doctor = Doctor(
+            user_id=current_user.id,
+            phone_number=doctor_data.phone_number,
+            specialization=doctor_data.specialization,
+            license_number=doctor_data.license_number,
+            status=DoctorStatus.PENDING
+        )
+
+        # Get the user from the current session
+        user = await session.get(User, current_user.id)
+        # Update user role to DOCTOR_PENDING
+        user.role = UserRole.DOCTOR_PENDING
 
-            session.add(doctor)
-            session.add(user)  # Adding the updated user to the session
-            session.commit()
-            session.refresh(doctor)
+        session.add(doctor)
+        await session.flush()
+        await session.refresh(doctor)
+        identity_cache.invalidate_on_commit(session, user.username)
+        token_versions.bump_on_commit(session, user.id)
 
-            logger.info(f"New doctor registration | User: {current_user.username}")
-            return doctor
+        logger.info(f"New doctor registration | User: {current_user.username}")
+        return doctor
     except SQLAlchemyError as e:
-        session.rollback()
         logger.error(f"Failed to register doctor: {str(e)}")
         raise HTTPException(
             status_code=500, 
@@ -99,21 +239,25 @@ async def register_doctor(
         )
 
 @router.get("/me", response_model=DoctorResponse)
-async def get_doctor_profile(current_user: User = Depends(get_current_active_user)):
+async def get_doctor_profile(
+    current_user: Principal = Depends(get_active_principal),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Get current doctor's profile"""
     try:
-        with get_db_session() as session:
-            doctor = session.query(Doctor).filter(
-                Doctor.user_id == current_user.id
-            ).first()
-            
-            if not doctor:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Doctor profile not found"
-                )
-            
-            return doctor
+        doctor = (await session.execute(
+            select(Doctor).filter(Doctor.user_id == current_user.id)
+        )).scalars().first()
+
+        if not doctor:
+            raise HTTPException(
+                status_code=404,
+                detail="Doctor profile not found"
+            )
+
+        return doctor
+    except HTTPException:
+        raise
     except Exception as e:
         security_logger.error(f"Error fetching doctor profile: {str(e)}")
         raise HTTPException(
@@ -138,4 +282,52 @@ async def get_specializations():
         "Dentistry",
         "Sexology"
     ]
-    return {"specializations": specializations}
\ No newline at end of file
+    return {"specializations": specializations}
+
+@router.post("/appointments/{appointment_id}/consultation", response_model=ConsultationOut)
+async def save_consultation_notes(
+    data: ConsultationIn,
+    appointment: Appointment = Depends(get_consulted_appointment),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Save a consultation's prescriptions, symptoms and medical records at once"""
+    try:
+        return await save_consultation(appointment, data, session)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/appointments/{appointment_id}/prescriptions", response_model=List[PrescriptionOut])
+async def create_prescriptions(
+    items: List[PrescriptionIn],
+    appointment: Appointment = Depends(get_consulted_appointment),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Prescribe several medications for an appointment"""
+    try:
+        return (await save_consultation(appointment, ConsultationIn(prescriptions=items), session))["prescriptions"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/appointments/{appointment_id}/symptoms", response_model=List[SymptomOut])
+async def record_symptoms(
+    items: List[SymptomIn],
+    appointment: Appointment = Depends(get_consulted_appointment),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Record several of the patient's symptoms for an appointment"""
+    try:
+        return (await save_consultation(appointment, ConsultationIn(symptoms=items), session))["symptoms"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/appointments/{appointment_id}/medical-records", response_model=List[MedicalRecordOut])
+async def create_medical_records(
+    items: List[MedicalRecordIn],
+    appointment: Appointment = Depends(get_consulted_appointment),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Add several medical records for the patient of an appointment"""
+    try:
+        return (await save_consultation(appointment, ConsultationIn(medical_records=items), session))["medical_records"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
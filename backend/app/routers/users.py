@@ -9,9 +9,10 @@ from PIL import Image
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..auth.dependencies import get_current_active_user
 from ..models.user import User
-from ..db.session import get_db_session
+from ..db.session import get_async_db
 from ..logging import security_logger
 from typing import Optional
 from pydantic import BaseModel, EmailStr, Field, validator
@@ -46,42 +47,42 @@ MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 async def get_current_user_profile(current_user: User = Depends(get_current_active_user)):
     """Get current user profile"""
     security_logger.info(f"User profile accessed: {current_user.username}")
-    with get_db_session() as session:
-        profile_picture_url = f"{current_user.profile_picture}" if current_user.profile_picture else "/static/default_picture.jpeg"
-        return {
-            "id": current_user.id,
-            "username": current_user.username,
-            "email": current_user.email,
-            "first_name": current_user.first_name,
-            "last_name": current_user.last_name,
-            "city": current_user.city,
-            "state": current_user.state,
-            "country": current_user.country,
-            "profile_picture": profile_picture_url
-        }
+    profile_picture_url = f"{current_user.profile_picture}" if current_user.profile_picture else "/static/default_picture.jpeg"
+    return {
+        "id": current_user.id,
+        "username": current_user.username,
+        "email": current_user.email,
+        "first_name": current_user.first_name,
+        "last_name": current_user.last_name,
+        "city": current_user.city,
+        "state": current_user.state,
+        "country": current_user.country,
+        "profile_picture": profile_picture_url
+    }
 
 @router.put("/me")
 async def update_user_profile(
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Update current user profile"""
-    with get_db_session() as session:
-        try:
-            result = current_user.update_user(**user_data.dict(exclude_unset=True))
-            security_logger.info(f"User profile updated: {current_user.username} - {user_data.dict(exclude_unset=True)}")
-            return {"message": "Profile updated successfully", "updated_profile": result}
-        except KeyError as e:
-            security_logger.warning(f"Invalid field update attempt by user: {current_user.username} - {e}")
-            raise HTTPException(status_code=400, detail=f"Invalid field: {e}")
-        except SQLAlchemyError:
-            security_logger.error(f"Database update failed for user: {current_user.username} - {e}")
-            raise HTTPException(status_code=500, detail="Database update failed")
+    try:
+        result = await current_user.update_user_async(session=session, **user_data.dict(exclude_unset=True))
+        security_logger.info(f"User profile updated: {current_user.username} - {user_data.dict(exclude_unset=True)}")
+        return {"message": "Profile updated successfully", "updated_profile": result}
+    except KeyError as e:
+        security_logger.warning(f"Invalid field update attempt by user: {current_user.username} - {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid field: {e}")
+    except SQLAlchemyError as e:
+        security_logger.error(f"Database update failed for user: {current_user.username} - {e}")
+        raise HTTPException(status_code=500, detail="Database update failed")
 
 @router.post("/me/profile-picture")
 async def upload_profile_picture(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """Upload user profile picture"""
     try:
@@ -110,22 +111,18 @@ async def upload_profile_picture(
             # Save optimized image
             img.save(file_location, optimize=True, quality=85)
 
-        # Update database
-        with get_db_session() as session:
-            # Delete old profile picture if exists
-            if current_user.profile_picture:
-                old_file = Path(current_user.profile_picture.replace('/static/', 'static/'))
-                if old_file.exists():
-                    old_file.unlink()
-
-            # Update user profile with new picture URL
-            relative_path = f"/uploads/{unique_filename}"
-            current_user.update_user(profile_picture=relative_path)
-            session.add(current_user)
-            session.commit()
-
-            security_logger.info(f"Profile picture updated for user: {current_user.username}")
-            return {"message": "Profile picture updated successfully", "file_path": relative_path}
+        # Delete old profile picture if exists
+        if current_user.profile_picture:
+            old_file = Path(current_user.profile_picture.replace('/static/', 'static/'))
+            if old_file.exists():
+                old_file.unlink()
+
+        # Update database with the new picture URL
+        relative_path = f"/uploads/{unique_filename}"
+        await current_user.update_user_async(session=session, profile_picture=relative_path)
+
+        security_logger.info(f"Profile picture updated for user: {current_user.username}")
+        return {"message": "Profile picture updated successfully", "file_path": relative_path}
 
     except Exception as e:
         security_logger.error(f"Profile picture upload failed for user {current_user.username}: {str(e)}")
@@ -1,11 +1,19 @@
+import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
+# The one .env file, read by Settings wherever the process starts
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "env", ".env")
+
 class Settings(BaseSettings):
     """Application settings configuration"""
     
 
+    ENVIRONMENT: str = "development"  # "production" hides debug headers
+
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
     JWT_SECRET_KEY: str
 
     # SMTP settings
@@ -18,16 +26,92 @@ class Settings(BaseSettings):
     # Email Template Settings
     EMAIL_SENDER_NAME: str = "Health Haven"
     PASSWORD_RESET_TIMEOUT: int = 3600  # 1 hour in seconds
+
+    # Identity cache used by get_current_user
+    IDENTITY_CACHE_ENABLED: bool = True
+    IDENTITY_CACHE_TTL: int = 60  # seconds
+    IDENTITY_CACHE_MAXSIZE: int = 10_000
+    IDENTITY_CACHE_USE_REDIS: bool = False  # share entries across workers
+
+    # Stateless auth: authorize from versioned JWT claims, no user lookup
+    STATELESS_AUTH: bool = False
+    TOKEN_VERSION_CACHE_TTL: int = 5  # seconds a revocation may go unseen
+
+    # Password hashing pool; 0 workers means one per CPU and a 0
+    # concurrency cap means one hash in flight per worker
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 0
+    PASSWORD_HASH_MAX_QUEUE: int = 0  # waiting callers before 503; 0 = unbounded
+    # werkzeug method with cost, e.g. scrypt:32768:8:1; set by
+    # `python -m backend.app.auth.calibrate`. Empty keeps the default
+    PASSWORD_HASH_METHOD: str = ""
+
+    # Cache of verified JWT payloads, kept until each token's exp
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_MAXSIZE: int = 10_000
+
+    # Revoked token ids: Bloom filter sizing and rebuild period (seconds)
+    REVOCATION_FILTER_CAPACITY: int = 100_000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_REBUILD_INTERVAL: int = 300
+
+    # Opaque refresh tokens, rotated on every use
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+
+    # Login attempts allowed per sliding window (seconds)
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_MAX_ATTEMPTS_PER_USERNAME: int = 5
+    LOGIN_MAX_ATTEMPTS_PER_IP: int = 50
+    LOGIN_THROTTLE_WINDOW: int = 300
+
+    # Database connection pools, per process: web (API) processes and
+    # Celery workers (see DatabaseConnection.use_pool_role)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a connection
+    DB_POOL_RECYCLE: int = 3600
+    CELERY_DB_POOL_SIZE: int = 2
+    CELERY_DB_MAX_OVERFLOW: int = 0
+    CELERY_DB_POOL_TIMEOUT: int = 10
+
+    # SQL logging: statements slower than the threshold are logged,
+    # with their EXPLAIN (ANALYZE, BUFFERS) plan on PostgreSQL when
+    # enabled, plus a sample of the faster ones. DB_ECHO logs all.
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    SQL_LOG_SAMPLE_RATE: float = 0.0
+    SLOW_QUERY_EXPLAIN: bool = False
+    SLOW_QUERY_EXPLAIN_INTERVAL: int = 300  # seconds between plans of one statement
+    SQL_LOG_PARAMETERS: bool = False
+    DB_ECHO: bool = False
+
+    # Statements per request; a statement repeated more than the
+    # threshold within one request is logged as a possible N+1
+    QUERY_COUNTER_ENABLED: bool = True
+    QUERY_REPEAT_THRESHOLD: int = 10
+
+    # Seconds an exact count of a paginated list is reused
+    EXACT_COUNT_CACHE_TTL: int = 10
+
+    # Seconds typeahead results of one or two character prefixes are reused
+    TYPEAHEAD_CACHE_TTL: int = 10
     
     class Config:
-        env_file = "backend/env/.env"
+        env_file = ENV_FILE
         env_file_encoding = "utf-8"
         case_sensitive = True
+        extra = "ignore"
 
 @lru_cache()
 def get_settings() -> Settings:
     """Create cached settings instance"""
     return Settings()
 
-# Export settings instance
-settings = get_settings()
\ No newline at end of file
+def __getattr__(name: str):
+    """
+    Build the exported `settings` instance on first access rather
+    than at import, so importing a module that reads Settings later
+    does not require the environment to be complete
+    """
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
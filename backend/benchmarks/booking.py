@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark booking under contention: many clients race for one slot.
+
+Each round, every client (a different patient) tries to book the same
+doctor at the same time, in its own session and transaction, through
+Appointment.create_appointment_async and through the check-then-insert
+it replaced: two conflict SELECTs, a doctor lookup, then the INSERT.
+Exactly one booking may succeed; every other client should get the
+doctor's "not available" message. The check-then-insert lets several
+clients pass the checks together, and all but one then fail on the
+unique index with a database error instead.
+
+Reminders are not scheduled: the benchmark times the database only.
+
+Usage, from the repository root:
+    python -m backend.benchmarks.booking --clients 200
+    python -m backend.benchmarks.booking --url postgresql+asyncpg://localhost/healthhaven_bench
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import date, time as time_of_day, timedelta
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from ..app.models.appointment import Appointment, AppointmentStatus, DOCTOR_UNAVAILABLE
+from ..app.models.base import Base
+from ..app.models.doctor import Doctor, DoctorStatus
+from ..app.models.tasks import send_reminder
+from ..app.models.user import User, UserRole
+
+
+DOCTOR_ID = 1
+
+
+async def seed(engine, clients: int) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{
+            "username": f"user{n}",
+            "email": f"user{n}@example.com",
+            "first_name": f"First{n}",
+            "last_name": f"Last{n}",
+            "dob": date(1990, 1, 1),
+            "password_hash": "x",
+            "city": "Lagos",
+            "state": "Lagos",
+            "country": "Nigeria",
+            "role": UserRole.DOCTOR if n == 0 else UserRole.USER,
+        } for n in range(clients + 1)])
+        await connection.execute(insert(Doctor), [{
+            "id": DOCTOR_ID,
+            "user_id": 1,
+            "phone_number": "0123456789",
+            "specialization": "General Practice",
+            "license_number": "LIC0",
+            "status": DoctorStatus.APPROVED,
+        }])
+
+
+async def check_then_insert(session: AsyncSession, user_id: int, day: date, slot: time_of_day) -> None:
+    """Booking as it was before the single statement"""
+    await Appointment.validate_appointment_async(DOCTOR_ID, user_id, day, slot, session=session)
+    try:
+        doctor = await session.get(Doctor, DOCTOR_ID)
+        if doctor is None:
+            raise ValueError("Doctor not found")
+        session.add(Appointment(doctor_id=DOCTOR_ID, user_id=user_id, appointment_date=day,
+                                appointment_time=slot, appointment_note="Benchmark",
+                                status=AppointmentStatus.SCHEDULED))
+        await session.flush()
+    except Exception as e:
+        raise ValueError(f"Failed to create appointment: {str(e)}")
+
+
+async def single_statement(session: AsyncSession, user_id: int, day: date, slot: time_of_day) -> None:
+    await Appointment.create_appointment_async(DOCTOR_ID, user_id, day, slot, "Benchmark", "UTC",
+                                               session=session)
+
+
+async def client(engine, book, user_id: int, day: date, slot: time_of_day, start: asyncio.Event):
+    """(outcome, milliseconds) of one booking attempt"""
+    await start.wait()
+    started = time.perf_counter()
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await book(session, user_id, day, slot)
+            await session.commit()
+        outcome = "booked"
+    except ValueError as e:
+        outcome = "conflict" if str(e) == DOCTOR_UNAVAILABLE else "error"
+    return outcome, (time.perf_counter() - started) * 1e3
+
+
+async def race(engine, book, clients: int, day: date) -> tuple:
+    """Outcome counts, latencies and wall time of one round"""
+    start = asyncio.Event()
+    slot = time_of_day(9, 0)
+    attempts = [
+        asyncio.create_task(client(engine, book, user_id, day, slot, start))
+        for user_id in range(2, clients + 2)
+    ]
+    started = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*attempts)
+    wall = (time.perf_counter() - started) * 1e3
+    return Counter(outcome for outcome, _ in results), [ms for _, ms in results], wall
+
+
+async def run(url: str, clients: int, rounds: int) -> None:
+    engine = create_async_engine(url, pool_size=clients, max_overflow=0,
+                                 connect_args={"timeout": 30} if url.startswith("sqlite") else {})
+    await seed(engine, clients)
+    print(f"{'booking':<18} {'booked':>6} {'conflict':>8} {'error':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'wall ms':>8}")
+    for name, book in [("check-then-insert", check_then_insert), ("single statement", single_statement)]:
+        outcomes, latencies = Counter(), []
+        walls = []
+        for n in range(rounds):
+            day = date.today() + timedelta(days=30 + n)
+            counts, round_latencies, wall = await race(engine, book, clients, day)
+            outcomes.update(counts)
+            latencies.extend(round_latencies)
+            walls.append(wall)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{name:<18} {outcomes['booked'] / rounds:>6.1f} {outcomes['conflict'] / rounds:>8.1f} "
+              f"{outcomes['error'] / rounds:>6.1f} {statistics.median(latencies):>8.1f} {p95:>8.1f} "
+              f"{statistics.mean(walls):>8.1f}")
+        async with engine.begin() as connection:
+            await connection.execute(delete(Appointment))
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200, help="clients racing for each slot")
+    parser.add_argument("--rounds", type=int, default=5, help="slots raced for, averaged per round")
+    parser.add_argument("--url", help="async database URL; a scratch SQLite file by default")
+    args = parser.parse_args()
+
+    # Only the booking itself is measured
+    send_reminder.apply_async = lambda args, eta: None
+    if args.url:
+        asyncio.run(run(args.url, args.clients, args.rounds))
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(f"sqlite+aiosqlite:///{os.path.join(directory, 'booking.db')}",
+                        args.clients, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark password verification throughput.
+
+Runs a burst of concurrent password checks through PasswordHasher
+for each pool size and reports logins/sec overall and per core,
+next to the inline (event loop) baseline.
+
+Usage, from the repository root:
+    python -m backend.benchmarks.login_hashing --logins 200 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+from ..app.auth.hashing import PasswordHasher
+
+
+PASSWORD = "correct horse battery staple"
+
+
+async def run_inline(password_hash: str, logins: int) -> float:
+    """Verify on the event loop, as login did before the pool"""
+    started = time.perf_counter()
+    for _ in range(logins):
+        check_password_hash(password_hash, PASSWORD)
+    return time.perf_counter() - started
+
+async def run_pool(password_hash: str, logins: int, workers: int) -> tuple:
+    """Verify a concurrent burst through the hashing pool"""
+    hasher = PasswordHasher(workers=workers)
+    # Start the worker processes outside the timed section
+    await asyncio.gather(*(hasher.verify(password_hash, PASSWORD) for _ in range(workers)))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(hasher.verify(password_hash, PASSWORD) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stats = hasher.stats()
+    hasher.shutdown()
+    assert all(results)
+    return elapsed, stats
+
+def report(label: str, logins: int, elapsed: float, cores: int, extra: str = ""):
+    rate = logins / elapsed
+    print(f"{label:<12} {logins:>7} {elapsed:>9.2f} {rate:>11.1f} {rate / cores:>13.1f}  {extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=100, help="password checks per run")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="pool sizes to try")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    pool_sizes = args.workers or sorted({1, max(1, cpus // 2), cpus})
+    password_hash = generate_password_hash(PASSWORD)
+    print(f"hash: {password_hash.split('$')[0]}  cpus: {cpus}")
+    print(f"{'mode':<12} {'logins':>7} {'seconds':>9} {'logins/sec':>11} {'per core/sec':>13}")
+
+    elapsed = asyncio.run(run_inline(password_hash, args.logins))
+    report("inline", args.logins, elapsed, 1)
+
+    for workers in pool_sizes:
+        elapsed, stats = asyncio.run(run_pool(password_hash, args.logins, workers))
+        report(f"pool x{workers}", args.logins, elapsed, min(workers, cpus),
+               f"max queue depth {stats['max_queue_depth']}, avg wait {stats['avg_wait_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-call overhead of the hot model lookups.
+
+Times get_user_by_username, get_user_by_email, get_user_by_id and
+Doctor.get_doctor_by_id against the session.query(...) they used to
+build on every call, on an in-memory SQLite database so that Python
+side statement construction dominates. The session is emptied before
+each call so every lookup runs its statement.
+
+Usage, from the repository root:
+    python -m backend.benchmarks.model_lookups --calls 5000
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from ..app.models.base import Base
+from ..app.models.user import User
+from ..app.models.doctor import Doctor
+
+
+def seed(session: Session) -> tuple:
+    user = User(
+        username="benchmark",
+        email="benchmark@example.com",
+        password_hash="x",
+        first_name="Bench",
+        last_name="Mark",
+        dob=date(1990, 1, 1),
+        city="City",
+        state="State",
+        country="Country",
+    )
+    session.add(user)
+    session.flush()
+    doctor = Doctor(user_id=user.id, phone_number="0123456789",
+                    specialization="Cardiology", license_number="LIC12345")
+    session.add(doctor)
+    session.commit()
+    return user.username, user.email, user.id, doctor.id
+
+def lookups(username: str, email: str, user_id: int, doctor_id: int) -> dict:
+    """(before, after) callables per lookup"""
+    return {
+        "user by username": (
+            lambda s: s.query(User).filter(User.username == username).first(),
+            lambda s: User.get_user_by_username(username, session=s),
+        ),
+        "user by email": (
+            lambda s: s.query(User).filter(User.email == email).first(),
+            lambda s: User.get_user_by_email(email, session=s),
+        ),
+        "user by id": (
+            lambda s: s.query(User).filter(User.id == user_id).first(),
+            lambda s: User.get_user_by_id(user_id, session=s),
+        ),
+        "doctor by id": (
+            lambda s: s.query(Doctor).filter(Doctor.id == doctor_id).first(),
+            lambda s: Doctor.get_doctor_by_id(doctor_id, session=s),
+        ),
+    }
+
+def time_calls(session: Session, lookup, calls: int) -> float:
+    """Microseconds per call"""
+    # Warm the compiled cache outside the timed section
+    session.expunge_all()
+    assert lookup(session) is not None
+    started = time.perf_counter()
+    for _ in range(calls):
+        session.expunge_all()
+        lookup(session)
+    return (time.perf_counter() - started) / calls * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000, help="lookups per measurement")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        keys = seed(session)
+        print(f"{'lookup':<18} {'before us':>10} {'after us':>10} {'speedup':>8}")
+        for name, (before, after) in lookups(*keys).items():
+            before_us = time_calls(session, before, args.calls)
+            after_us = time_calls(session, after, args.calls)
+            print(f"{name:<18} {before_us:>10.1f} {after_us:>10.1f} {before_us / after_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
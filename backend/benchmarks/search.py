@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark Base.search against the ILIKE scan it replaced.
+
+Fills medical_records of a scratch SQLite database with synthetic
+notes, then times one page of results per keyword through the FTS5
+index (MedicalRecord.search) and through the OR-chain of
+column ILIKE '%keyword%' it used to run. Rare words show the scan's
+cost best: it reads every row to find a handful.
+
+Usage, from the repository root:
+    python -m backend.benchmarks.search --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, or_, select
+from sqlalchemy.orm import Session
+from ..app.models.base import Base
+from ..app.models.medical_record import MedicalRecord
+
+
+BATCH = 10_000
+PAGE = 20
+
+COMMON = ["patient", "reports", "pain", "review", "follow", "up", "blood", "pressure",
+          "dose", "daily", "rest", "fluids", "stable", "improving", "mild", "severe"]
+# 120 clinical terms, e.g. "cardiitis", "neuralgia", "gastrectomy"
+CLINICAL = [prefix + suffix
+            for prefix in ["cardi", "neur", "gastr", "derm", "hepat", "nephr", "oste", "pulmon",
+                           "arthr", "my", "encephal", "rhin", "col", "cyst", "laryng"]
+            for suffix in ["itis", "algia", "osis", "ectomy", "ology", "opathy", "emia", "oma"]]
+VOCABULARY = COMMON + CLINICAL
+RARE = ["sarcoidosis", "amyloidosis", "pheochromocytoma", "kawasaki"]
+# From words in about one row in eight to words in almost none
+KEYWORDS = ["blood", "neuralgia", "blood pressure", "sarcoidosis", "kawasaki rest", "nothingmatches"]
+
+
+def note(rng: random.Random, words: int) -> str:
+    chosen = rng.choices(VOCABULARY, k=words)
+    if rng.random() < 0.0005:
+        chosen[rng.randrange(words)] = rng.choice(RARE)
+    return " ".join(chosen).capitalize()
+
+
+def seed(engine, rows: int) -> None:
+    rng = random.Random(42)
+    started = datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        for start in range(0, rows, BATCH):
+            connection.execute(insert(MedicalRecord), [{
+                "user_id": n % 50_000 + 1,
+                "doctor_id": n % 500 + 1,
+                "record_date": started + timedelta(minutes=n),
+                "description": note(rng, 8),
+                "diagnosis": note(rng, 3),
+                "treatment_plan": note(rng, 6),
+            } for n in range(start, min(start + BATCH, rows))])
+
+
+def ilike_page(session: Session, keyword: str) -> list:
+    """The search as it was before the full-text index"""
+    columns = [getattr(MedicalRecord, name) for name in MedicalRecord.searchable_columns]
+    return list(session.scalars(
+        select(MedicalRecord).where(or_(*[column.ilike(f"%{keyword}%") for column in columns]))
+        .order_by(MedicalRecord.id).limit(PAGE)
+    ))
+
+
+def full_text_page(session: Session, keyword: str) -> list:
+    return MedicalRecord.search(keyword, session=session, limit=PAGE)
+
+
+def time_search(session: Session, search, keyword: str, repeat: int) -> float:
+    """Milliseconds per search"""
+    search(session, keyword)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        session.expunge_all()
+        search(session, keyword)
+    return (time.perf_counter() - started) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic medical records")
+    parser.add_argument("--repeat", type=int, default=5, help="searches per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'search.db')}")
+        Base.metadata.create_all(engine)
+        started = time.perf_counter()
+        seed(engine, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        with Session(engine) as session:
+            print(f"{'keyword':<16} {'hits':>5} {'ilike ms':>10} {'fts ms':>10} {'speedup':>8}")
+            for keyword in KEYWORDS:
+                hits = len(full_text_page(session, keyword))
+                ilike_ms = time_search(session, ilike_page, keyword, args.repeat)
+                fts_ms = time_search(session, full_text_page, keyword, args.repeat)
+                print(f"{keyword:<16} {hits:>5} {ilike_ms:>10.2f} {fts_ms:>10.2f} {ilike_ms / fts_ms:>7.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
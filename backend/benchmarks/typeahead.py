@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the admin user typeahead on a large users table.
+
+Fills a scratch SQLite database with synthetic users, then times
+suggestions for random prefixes of one to six characters, as typed
+into the search box, through the typeahead and through what
+GET /admin/users?search= ran on each keystroke: four
+ILIKE '%prefix%' predicates and a count. Short prefixes are timed
+with and without the typeahead cache.
+
+Usage, from the repository root:
+    python -m backend.benchmarks.typeahead --users 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from ..app.models.base import Base
+from ..app.models.user import User, UserRole, user_typeahead
+
+
+BATCH = 10_000
+LIMIT = 8
+SYLLABLES = ["a", "ba", "de", "ko", "la", "mi", "na", "o", "ri", "se", "tu", "wa", "ye", "chi", "fe", "ji"]
+
+
+def name(rng: random.Random) -> str:
+    return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+
+
+async def seed(engine, users: int) -> None:
+    rng = random.Random(42)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        for start in range(0, users, BATCH):
+            rows = []
+            for n in range(start, min(start + BATCH, users)):
+                first_name, last_name = name(rng), name(rng)
+                username = f"{first_name.lower()}{n}"
+                rows.append({
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "dob": date(1950, 1, 1) + timedelta(days=n % 18_000),
+                    "password_hash": "x",
+                    "city": "City",
+                    "state": "State",
+                    "country": "Country",
+                    "role": UserRole.USER,
+                    "created_at": datetime(2024, 1, 1) + timedelta(seconds=n),
+                })
+            await connection.execute(insert(User), rows)
+
+
+async def ilike_search(session: AsyncSession, prefix: str) -> None:
+    """The search box query before the typeahead"""
+    pattern = f"%{prefix}%"
+    query = select(User).filter(
+        User.username.ilike(pattern) | User.email.ilike(pattern) |
+        User.first_name.ilike(pattern) | User.last_name.ilike(pattern)
+    )
+    await session.scalar(select(func.count()).select_from(query.subquery()))
+    (await session.execute(query.order_by(User.created_at.desc(), User.id.desc()).limit(10))).scalars().all()
+
+
+async def typeahead_search(session: AsyncSession, prefix: str) -> None:
+    await user_typeahead.search(session, prefix, LIMIT)
+
+
+async def time_prefixes(session: AsyncSession, search, prefixes) -> list:
+    """Milliseconds per search"""
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        await search(session, prefix)
+        timings.append((time.perf_counter() - started) * 1e3)
+    return timings
+
+
+def summary(label: str, timings: list) -> str:
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return f"{label:<28} {statistics.median(timings):>8.2f} {p95:>8.2f}"
+
+
+async def run(users: int, searches: int, baseline: int) -> None:
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'typeahead.db')}")
+        started = time.perf_counter()
+        await seed(engine, users)
+        print(f"seeded {users} users in {time.perf_counter() - started:.1f}s")
+
+        typed = [name(rng).lower()[:rng.randint(1, 6)] for _ in range(searches)]
+        short = [prefix for prefix in typed if len(prefix) <= 2]
+        longer = [prefix for prefix in typed if len(prefix) > 2]
+        async with AsyncSession(engine) as session:
+            print(f"{'search':<28} {'p50 ms':>8} {'p95 ms':>8}")
+            print(summary("ilike + count", await time_prefixes(session, ilike_search, typed[:baseline])))
+            user_typeahead.configure(cache_ttl=0)
+            print(summary("typeahead, 1-2 chars", await time_prefixes(session, typeahead_search, short)))
+            print(summary("typeahead, 3-6 chars", await time_prefixes(session, typeahead_search, longer)))
+            user_typeahead.configure(cache_ttl=60)
+            await time_prefixes(session, typeahead_search, short)
+            print(summary("typeahead, 1-2 chars cached", await time_prefixes(session, typeahead_search, short)))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1_000_000, help="synthetic users")
+    parser.add_argument("--searches", type=int, default=500, help="prefixes typed")
+    parser.add_argument("--baseline", type=int, default=20, help="prefixes timed through ilike + count")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.searches, args.baseline))
+
+
+if __name__ == "__main__":
+    main()
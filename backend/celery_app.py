@@ -4,6 +4,7 @@ Configuring Celery to manage app
 notifications
 """
 from celery import Celery
+from celery.signals import worker_process_init
 
 
 # Configure the Celery app
@@ -17,4 +18,13 @@ celery_app = Celery(
 celery_app.conf.update(
     timezone="UTC",
     enable_utc=True
-)
\ No newline at end of file
+)
+
+@worker_process_init.connect
+def configure_database_pool(**kwargs):
+    """
+    Give each worker process its own connection pool,
+    sized for Celery rather than the web app
+    """
+    from app.models.base import db
+    db.use_pool_role("celery")
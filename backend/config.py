@@ -2,17 +2,17 @@
 """
 Setting up the database engine
 for postgresql
-"""
-
-import os
-from dotenv import load_dotenv
 
+The URLs come from Settings, which reads backend/env/.env once;
+they are resolved on first access rather than at import.
+"""
 
-# Explicit path to the .env file
-dotenv_path = os.path.join(os.path.dirname(__file__), "env", ".env")
-load_dotenv(dotenv_path)
 
-database_url = os.getenv("DATABASE_URL")
+def __getattr__(name: str):
+    from app.settings import get_settings
 
-if not database_url:
-    raise ValueError("DATABASE_url is not set in the .env file")
\ No newline at end of file
+    if name == "database_url":
+        return get_settings().DATABASE_URL
+    if name == "async_database_url":
+        return get_settings().ASYNC_DATABASE_URL
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
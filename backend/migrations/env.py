@@ -26,6 +26,22 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Leave the full-text search objects to their migrations: the
+    search_vector columns, trigram and prefix indexes and FTS5 tables
+    are built outside the models (see app/db/full_text.py and
+    app/db/typeahead.py), so autogenerate must not drop them
+    """
+    if type_ == "column" and name == "search_vector":
+        return False
+    if type_ == "index" and name is not None and name.endswith(("_search_vector", "_trgm", "_prefix")):
+        return False
+    if type_ == "table" and name is not None and "_fts" in name:
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +66,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -68,7 +85,8 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=Base.metadata)
+        context.configure(connection=connection, target_metadata=Base.metadata,
+                          include_object=include_object)
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,41 @@
+"""keyset pagination indexes
+
+Revision ID: 4f2a9c1d7e63
+Revises: b1314292f5a5
+Create Date: 2026-10-17 09:12:40.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c1d7e63'
+down_revision: Union[str, None] = 'b1314292f5a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build;
+    # it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_users_role_created_at_id', 'users', ['role', 'created_at', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_appointments_user_date_time_id', 'appointments',
+                        ['user_id', 'appointment_date', 'appointment_time', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_appointments_user_date_time_id', table_name='appointments',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_role_created_at_id', table_name='users',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_created_at_id', table_name='users',
+                      postgresql_concurrently=True, if_exists=True)
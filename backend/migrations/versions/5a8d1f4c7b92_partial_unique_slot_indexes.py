@@ -0,0 +1,49 @@
+"""partial unique slot indexes
+
+Revision ID: 5a8d1f4c7b92
+Revises: e3a7c2b9f4d6
+Create Date: 2026-10-17 21:04:37.512806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8d1f4c7b92'
+down_revision: Union[str, None] = 'e3a7c2b9f4d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Booking is a single INSERT ... ON CONFLICT DO NOTHING: these indexes
+# are what rejects a second live booking of a slot, by the doctor or
+# by the user. uq_appointment_time also counted cancelled bookings, so
+# a cancelled slot could never be booked again. The enum stores member
+# names, hence 'CANCELLED'.
+#
+# Building a unique index fails on existing duplicates: resolve any
+# user holding two live bookings of one slot before upgrading.
+ACTIVE = sa.text("status <> 'CANCELLED'")
+SLOT_INDEXES = [
+    ('uq_appointments_doctor_slot', ['doctor_id', 'appointment_date', 'appointment_time']),
+    ('uq_appointments_user_slot', ['user_id', 'appointment_date', 'appointment_time']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in SLOT_INDEXES:
+            op.create_index(name, 'appointments', columns, unique=True,
+                            postgresql_where=ACTIVE, sqlite_where=ACTIVE,
+                            postgresql_concurrently=True, if_not_exists=True)
+    op.drop_constraint('uq_appointment_time', 'appointments', type_='unique')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('uq_appointment_time', 'appointments',
+                                ['doctor_id', 'appointment_date', 'appointment_time'])
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(SLOT_INDEXES):
+            op.drop_index(name, table_name='appointments', postgresql_concurrently=True, if_exists=True)
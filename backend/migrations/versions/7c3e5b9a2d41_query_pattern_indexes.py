@@ -0,0 +1,59 @@
+"""query pattern indexes
+
+Revision ID: 7c3e5b9a2d41
+Revises: 4f2a9c1d7e63
+Create Date: 2026-10-17 14:02:11.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5b9a2d41'
+down_revision: Union[str, None] = '4f2a9c1d7e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# appointments.user_id needs no index of its own: the appointment
+# list and the user conflict check are served by the leading column
+# of ix_appointments_user_date_time_id (4f2a9c1d7e63), and the doctor
+# conflict check by the uq_appointment_time constraint.
+NEW_INDEXES = [
+    # Symptoms of a user, and create_symptoms' lookup of the symptoms
+    # already recorded on an appointment
+    ('ix_symptoms_user_appointment_name', 'symptoms', ['user_id', 'appointment_id', 'symptom_name']),
+    # Records of a user, in date order
+    ('ix_medical_records_user_record_date', 'medical_records', ['user_id', 'record_date']),
+    # check_expired_prescriptions: active prescriptions past expiry
+    ('ix_prescriptions_status_expiry_date', 'prescriptions', ['status', 'expiry_date']),
+]
+
+# Never filtered on; the admin search matches them with a leading
+# wildcard, which a btree index cannot serve
+DROPPED_INDEXES = [
+    ('ix_users_city', 'users', ['city']),
+    ('ix_users_state', 'users', ['state']),
+    ('ix_users_country', 'users', ['country']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build.
+    # A build that fails part way leaves an INVALID index which
+    # IF NOT EXISTS then skips: drop it and run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns in NEW_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in DROPPED_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in DROPPED_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in reversed(NEW_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
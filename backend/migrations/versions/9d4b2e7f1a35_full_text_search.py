@@ -0,0 +1,58 @@
+"""full text search
+
+Revision ID: 9d4b2e7f1a35
+Revises: 7c3e5b9a2d41
+Create Date: 2026-10-17 16:40:27.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4b2e7f1a35'
+down_revision: Union[str, None] = '7c3e5b9a2d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, text search configuration, searchable columns), as
+# registered with app.db.full_text by each model
+SEARCH_VECTORS = [
+    ('users', 'simple', ['first_name', 'last_name', 'username', 'email']),
+    ('doctors', 'simple', ['specialization', 'license_number']),
+    ('prescriptions', 'simple', ['medication_name', 'dosage']),
+    ('symptoms', 'english', ['symptom_name', 'description']),
+    ('appointments', 'english', ['appointment_note']),
+    ('medical_records', 'english', ['description', 'diagnosis', 'treatment_plan']),
+]
+
+
+def vector_expression(config: str, columns: list) -> str:
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return f"to_tsvector('{config}'::regconfig, {document})"
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites the table under an
+    # ACCESS EXCLUSIVE lock; run this in a maintenance window on
+    # large tables. The GIN indexes are then built CONCURRENTLY.
+    for table, config, columns in SEARCH_VECTORS:
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector_expression(config, columns)}) STORED"
+        )
+    with op.get_context().autocommit_block():
+        for table, _, _ in SEARCH_VECTORS:
+            op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin',
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, _, _ in reversed(SEARCH_VECTORS):
+            op.drop_index(f'ix_{table}_search_vector', table_name=table,
+                          postgresql_concurrently=True, if_exists=True)
+    for table, _, _ in reversed(SEARCH_VECTORS):
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,37 @@
+"""user typeahead indexes
+
+Revision ID: e3a7c2b9f4d6
+Revises: b6e1f3c8d0a7
+Create Date: 2026-10-17 19:26:08.443917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c2b9f4d6'
+down_revision: Union[str, None] = 'b6e1f3c8d0a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The admin user typeahead reads each column's first matches in order
+# from a B-tree range seek on lower(column) in the "C" collation, with
+# id to break ties. A GIN trigram index cannot return rows in order.
+COLUMNS = ['username', 'email', 'first_name', 'last_name']
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_prefix '
+                       f'ON users ((lower({column}) COLLATE "C"), id)')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in reversed(COLUMNS):
+            op.drop_index(f'ix_users_{column}_prefix', table_name='users',
+                          postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,31 @@
+"""users created_at not null
+
+Revision ID: f2b7d4e9a1c5
+Revises: 5a8d1f4c7b92
+Create Date: 2026-10-17 23:02:51.730148
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d4e9a1c5'
+down_revision: Union[str, None] = '5a8d1f4c7b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The admin user lists are paginated by keyset on created_at, and a
+# keyset comparison skips rows whose sort column is NULL. Rows created
+# without one are given their last update time, or failing that now.
+
+
+def upgrade() -> None:
+    op.execute("UPDATE users SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL")
+    op.alter_column('users', 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('users', 'created_at', existing_type=sa.DateTime(), nullable=True)
@@ -5,11 +5,14 @@ definition of fixtures that are accessible
 across multiple test files
 """
 import pytest
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..app.models.base import Base
 from ..app.models.base import SessionLocal
 from ..app.models import user, doctor, appointment, prescription, symptom, medical_record
+from datetime import date, time
+from ..app.db.query_counter import query_counter
 
 
 # Using an in-memory SQLite database for testing
@@ -49,4 +52,64 @@ def test_client():
     from app.main import app
 
     client = TestClient(app)
-    return client
\ No newline at end of file
+    return client
+
+
+@contextmanager
+def assert_max_queries(budget: int):
+    """
+    Fail if the block runs more than budget statements.
+
+    Usage:
+        with assert_max_queries(2):
+            Doctor.get_doctor_by_specialization("Cardiology", session=db_session)
+    """
+    with query_counter.track("assert_max_queries") as stats:
+        yield stats
+    shapes = "\n".join(f"{count} x {shape}" for shape, count in stats.shapes.most_common())
+    assert stats.count <= budget, f"{stats.count} statements, budget {budget}:\n{shapes}"
+
+
+def make_consultation(db_session, name: str):
+    """
+    Flush a patient, an approved doctor and an appointment between
+    them, and return the appointment
+    """
+    patient, doctor_user = [
+        user.User(
+            first_name=name.title(),
+            last_name=role.title(),
+            username=f"{name}{role}",
+            dob=date(1990, 1, 1),
+            password_hash=user.User.set_password("consultation"),
+            email=f"{name}.{role}@example.com",
+            city="Leeds",
+            state="Yorkshire",
+            country="UK"
+        )
+        for role in ("patient", "doctor")
+    ]
+    db_session.add_all([patient, doctor_user])
+    db_session.flush()
+
+    profile = doctor.Doctor(
+        user_id=doctor_user.id,
+        phone_number="0123456789",
+        specialization="General Practice",
+        license_number=f"LIC{name.upper()}1",
+        status=doctor.DoctorStatus.APPROVED
+    )
+    db_session.add(profile)
+    db_session.flush()
+
+    consultation = appointment.Appointment(
+        doctor_id=profile.id,
+        user_id=patient.id,
+        appointment_date=date.today(),
+        appointment_time=time(9, 0),
+        appointment_note="Consultation",
+        status=appointment.AppointmentStatus.SCHEDULED
+    )
+    db_session.add(consultation)
+    db_session.flush()
+    return consultation
@@ -3,12 +3,14 @@
 Testing the Appointment model
 """
 import pytest
-from .conftest import db_session
+from sqlalchemy import func
+from .conftest import db_session, assert_max_queries, make_consultation, test_client
 from ..app.models.user import User
-from ..app.models.doctor import Doctor
+from ..app.models.doctor import Doctor, DoctorStatus
 from ..app.models.appointment import Appointment, AppointmentStatus
 from sqlalchemy.exc import IntegrityError
-from datetime import date, time
+from datetime import date, time, timedelta
+from ..app.models.tasks import send_reminder
 
 
 def test_create_appointment(db_session):
@@ -209,3 +211,136 @@ def test_appointment_relationships(db_session):
     db_session.commit()
     assert db_session.query(Appointment).filter(Appointment.user_id == user.id).count() == 0
     db_session.rollback()
+
+
+def test_appointment_list_is_one_statement(db_session):
+    patient = User(first_name="Ada", last_name="Byron", username="adabyron", dob=date(1990, 12, 10),
+                   password_hash="not-a-real-hash", email="ada@example.com", city="London", state="LDN",
+                   country="UK")
+    doctor_user = User(first_name="John", last_name="Snow", username="johnsnow", dob=date(1980, 3, 15),
+                       password_hash="not-a-real-hash", email="john.snow@example.com", city="London",
+                       state="LDN", country="UK")
+    db_session.add_all([patient, doctor_user])
+    db_session.flush()
+    doctor = Doctor(user_id=doctor_user.id, phone_number="02070000000", specialization="Epidemiology",
+                    license_number="LIC181300", status=DoctorStatus.APPROVED)
+    db_session.add(doctor)
+    db_session.flush()
+    db_session.add_all([
+        Appointment(doctor_id=doctor.id, user_id=patient.id, appointment_date=date(2030, 1, day),
+                    appointment_time=time(9, 0), appointment_note=f"Visit {day}")
+        for day in range(1, 21)
+    ])
+    db_session.commit()
+    patient_id, doctor_id = patient.id, doctor.id
+    db_session.expunge_all()
+
+    with assert_max_queries(1):
+        rows = db_session.execute(
+            Appointment.response_query()
+            .filter(Appointment.user_id == patient_id)
+            .add_columns(func.count().over().label("total"))
+            .order_by(Appointment.appointment_date)
+            .limit(5)
+        ).all()
+        items = [Appointment._row_to_response(row) for row in rows]
+
+    assert len(items) == 5
+    assert rows[0].total == 20
+    assert items[0]["appointment_note"] == "Visit 1"
+    assert items[0]["status"] == "Scheduled"
+    assert items[0]["doctor"] == {"id": doctor_id, "first_name": "John", "last_name": "Snow",
+                                  "specialization": "Epidemiology"}
+
+    with assert_max_queries(1):
+        doctors = [dict(row) for row in db_session.execute(Doctor.info_query()).mappings()]
+    assert doctors == [{"id": doctor_id, "first_name": "John", "last_name": "Snow",
+                        "specialization": "Epidemiology"}]
+
+
+def test_booking_is_one_statement_per_slot(db_session, monkeypatch):
+    reminders = []
+    monkeypatch.setattr(send_reminder, "apply_async", lambda args, eta: reminders.append(args))
+    taken = make_consultation(db_session, "booked")
+    other = make_consultation(db_session, "other")
+    slot = date.today() + timedelta(days=30), time(9, 0)
+
+    with assert_max_queries(1):
+        booked = Appointment.create_appointment(taken.doctor_id, taken.user_id, *slot, "Check-up", "UTC",
+                                                session=db_session)
+    assert booked["status"] == "Scheduled"
+    assert booked["doctor"] == {"id": taken.doctor_id, "first_name": "Booked", "last_name": "Doctor",
+                                "specialization": "General Practice"}
+    # The reminder waits for the booking to commit
+    assert reminders == []
+    db_session.commit()
+    assert reminders == [[booked["id"]]]
+
+    # Conflicts keep their messages, whichever index caught them
+    with pytest.raises(ValueError, match="The doctor is not available"):
+        Appointment.create_appointment(taken.doctor_id, other.user_id, *slot, "Second", "UTC", session=db_session)
+    with pytest.raises(ValueError, match="You already have an appointment"):
+        Appointment.create_appointment(other.doctor_id, taken.user_id, *slot, "Elsewhere", "UTC",
+                                       session=db_session)
+    with pytest.raises(ValueError, match="Doctor not found"):
+        Appointment.create_appointment(-1, other.user_id, *slot, "Nobody", "UTC", session=db_session)
+
+    # A cancelled slot can be booked again
+    db_session.get(Appointment, booked["id"]).status = AppointmentStatus.CANCELLED
+    db_session.flush()
+    rebooked = Appointment.create_appointment(taken.doctor_id, other.user_id, *slot, "Second", "UTC",
+                                              session=db_session)
+    assert rebooked["user_id"] == other.user_id
+    db_session.commit()
+    assert len(reminders) == 2
+
+    # A booking rolled back is never reminded of
+    later = date.today() + timedelta(days=31), time(9, 0)
+    Appointment.create_appointment(taken.doctor_id, taken.user_id, *later, "Undone", "UTC", session=db_session)
+    db_session.rollback()
+    db_session.commit()
+    assert len(reminders) == 2
+
+
+def test_reactivating_a_rebooked_slot_conflicts(test_client):
+    # The app imports its modules as the top-level app package
+    from app.auth.dependencies import get_active_principal
+    from app.main import app
+    from app.models.appointment import Appointment, AppointmentStatus
+    from app.models.base import Base, db
+    from app.models.doctor import Doctor, DoctorStatus
+    from app.models.user import User
+    Base.metadata.create_all(db.get_engine())
+
+    slot = dict(appointment_date=date.today() + timedelta(days=30), appointment_time=time(9, 0))
+    with db.get_session_local()() as session:
+        first, second, doctor_user = [
+            User(first_name=name.title(), last_name="Rebook", username=f"{name}rebook", dob=date(1990, 1, 1),
+                 password_hash="not-a-real-hash", email=f"{name}.rebook@example.com", city="Leeds",
+                 state="Yorkshire", country="UK")
+            for name in ("first", "second", "doctor")
+        ]
+        session.add_all([first, second, doctor_user])
+        session.flush()
+        doctor = Doctor(user_id=doctor_user.id, phone_number="0123456789", specialization="General Practice",
+                        license_number="LICREBOOK1", status=DoctorStatus.APPROVED)
+        session.add(doctor)
+        session.flush()
+        # Cancelled, then booked by someone else
+        cancelled = Appointment(doctor_id=doctor.id, user_id=first.id, appointment_note="First",
+                                status=AppointmentStatus.CANCELLED, **slot)
+        session.add(cancelled)
+        session.flush()
+        session.add(Appointment(doctor_id=doctor.id, user_id=second.id, appointment_note="Second", **slot))
+        session.commit()
+        principal = first
+        session.expunge(principal)
+
+    app.dependency_overrides[get_active_principal] = lambda: principal
+    try:
+        response = test_client.put(f"/api/v1/appointments/{cancelled.id}", json={"status": "SCHEDULED"})
+    finally:
+        app.dependency_overrides.pop(get_active_principal)
+
+    assert response.status_code == 409
+    assert response.json() == {"message": "This time slot has already been booked. Please choose another time."}
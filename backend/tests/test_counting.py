@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Testing exact, estimated and skipped row counts
+"""
+import asyncio
+from datetime import date
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from .conftest import db_session
+from ..app.db.counting import RowCounter, CountMode, Explain, PENDING_DELTAS, counter_key, _background_tasks, _spawn
+from ..app.models.user import User, UserRole
+
+
+class FakeRedis:
+    """Just the hash read the counter uses"""
+    def __init__(self, values):
+        self.values = values
+
+    async def hget(self, key, field):
+        return self.values.get(field)
+
+
+metadata = MetaData()
+items = Table(
+    "items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("kind", String(10)),
+)
+
+
+async def count_items(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'items.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(metadata.create_all)
+        await connection.execute(insert(items), [{"kind": "a"}, {"kind": "a"}, {"kind": "b"}])
+
+    counter = RowCounter(redis=FakeRedis({"items:kind=a": "40"}), exact_ttl=60)
+    query = select(items).where(items.c.kind == "a")
+    results = {}
+    async with AsyncSession(engine) as session:
+        results["none"] = await counter.count(session, query, CountMode.NONE)
+        results["counter"] = await counter.count(session, query, CountMode.ESTIMATE, counter_key("items", kind="a"))
+        # No counter and no planner estimate on SQLite: exact instead
+        results["fallback"] = await counter.count(session, query, CountMode.ESTIMATE)
+
+        await session.execute(insert(items), [{"kind": "a"}])
+        results["cached"] = await counter.count(session, query, CountMode.EXACT)
+        counter.configure(redis=None, exact_ttl=0)
+        results["fresh"] = await counter.count(session, query, CountMode.EXACT)
+    await engine.dispose()
+    return counter, results
+
+
+def test_count_modes(tmp_path):
+    counter, results = asyncio.run(count_items(tmp_path))
+
+    assert results["none"] == (None, "none")
+    assert results["counter"] == (40, "estimate")
+    assert results["fallback"] == (2, "exact")
+    assert results["cached"] == (2, "exact")
+    assert results["fresh"] == (3, "exact")
+
+    stats = counter.stats()
+    assert stats["estimate_counter"] == 1
+    assert stats["exact"] == 2
+    assert stats["exact_cached"] == 1
+
+
+def test_user_counters_follow_role_changes(db_session):
+    user = User(
+        first_name="Grace",
+        last_name="Hopper",
+        username="gracehopper",
+        dob=date(1906, 12, 9),
+        password_hash=User.set_password("cobolcompiler"),
+        email="grace.hopper@example.com",
+        city="New York",
+        state="New York",
+        country="USA"
+    )
+    db_session.add(user)
+    db_session.flush()
+    assert db_session.info[PENDING_DELTAS] == {"users": 1, "users:role=user": 1}
+
+    user.role = UserRole.DOCTOR_PENDING
+    db_session.flush()
+    deltas = db_session.info[PENDING_DELTAS]
+    assert deltas["users"] == 1
+    assert deltas["users:role=user"] == 0
+    assert deltas["users:role=doctor_pending"] == 1
+
+
+def test_planner_estimate_explains_the_query():
+    statement = Explain(select(items).where(items.c.kind == "a")).compile(dialect=postgresql.dialect())
+    assert str(statement).startswith("EXPLAIN (FORMAT JSON) SELECT items.id, items.kind")
+    assert statement.params == {"kind_1": "a"}
+
+
+def test_background_tasks_are_held_until_done(caplog):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def apply():
+            await release.wait()
+
+        async def fail():
+            raise RuntimeError("redis went away")
+
+        loop = asyncio.get_running_loop()
+        tasks = [_spawn(loop, apply()), _spawn(loop, fail())]
+        held = set(tasks) <= _background_tasks
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        return held
+
+    assert asyncio.run(scenario())
+    assert not _background_tasks
+    assert "redis went away" in caplog.text
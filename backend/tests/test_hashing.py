@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Testing the password hashing pool
+"""
+import asyncio
+import pytest
+from ..app.auth.hashing import PasswordHasher, HasherBusy, normalize_method
+from ..app.models.user import User
+
+
+def test_hash_and_verify_on_pool():
+    hasher = PasswordHasher(workers=1)
+
+    async def run():
+        password_hash = await hasher.hash("longenough")
+        return (await hasher.verify(password_hash, "longenough"),
+                await hasher.verify(password_hash, "wrongpassword"),
+                User(password_hash=password_hash).check_password("longenough"))
+
+    try:
+        assert asyncio.run(run()) == (True, False, True)
+        stats = hasher.stats()
+        assert stats["completed"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["queue_depth"] == 0
+    finally:
+        hasher.shutdown()
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(workers=1, max_concurrency=1, max_queue=1)
+
+    async def burst():
+        password_hash = await hasher.hash("longenough")
+        return await asyncio.gather(
+            *(hasher.verify(password_hash, "longenough") for _ in range(3)),
+            return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(burst())
+        assert sum(isinstance(r, HasherBusy) for r in results) == 1
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
+
+def test_set_password_async_validates_length():
+    with pytest.raises(ValueError):
+        asyncio.run(User.set_password_async("short"))
+
+def test_needs_rehash_compares_against_target_method():
+    assert normalize_method("scrypt") == "scrypt:32768:8:1"
+    assert normalize_method("pbkdf2:sha256:1000") == "pbkdf2:sha256:1000"
+
+    cheap_hash = PasswordHasher(method="pbkdf2:sha256:1000").hash_sync("longenough")
+    assert PasswordHasher().needs_rehash(cheap_hash) is False
+    assert PasswordHasher(method="pbkdf2:sha256:1000").needs_rehash(cheap_hash) is False
+    assert PasswordHasher(method="pbkdf2:sha256:2000").needs_rehash(cheap_hash) is True
+    # Moving to scrypt at werkzeug's default cost is an upgrade
+    assert PasswordHasher(method="scrypt").needs_rehash(cheap_hash) is True
+
+def test_needs_rehash_never_downgrades():
+    strong_hash = PasswordHasher(method="scrypt:65536:8:1").hash_sync("longenough")
+    assert PasswordHasher(method="scrypt:65536:8:1").needs_rehash(strong_hash) is False
+    assert PasswordHasher(method="scrypt:16384:8:1").needs_rehash(strong_hash) is False
+    assert PasswordHasher(method="pbkdf2:sha256:1000").needs_rehash(strong_hash) is False
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Testing the identity cache used by get_current_user
+"""
+import asyncio
+from datetime import date
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from .conftest import db_session
+from ..app.auth.identity_cache import IdentityCache, identity_cache
+from ..app.models.base import Base
+from ..app.models.user import User, UserRole
+
+
+def make_user():
+    return User(
+        first_name="Grace",
+        last_name="Hopper",
+        username="gracehopper",
+        dob=date(1996, 12, 9),
+        password_hash=User.set_password("cobolrules"),
+        email="grace.hopper@example.com",
+        city="Arlington",
+        state="VA",
+        country="USA"
+    )
+
+def test_hit_miss_counters():
+    cache = IdentityCache(maxsize=10, ttl=60)
+
+    assert asyncio.run(cache.get("ada")) is None
+    asyncio.run(cache.set("ada", {"id": 1}))
+    assert asyncio.run(cache.get("ada")) == {"id": 1}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_lru_eviction_and_ttl():
+    cache = IdentityCache(maxsize=2, ttl=60)
+    asyncio.run(cache.set("a", {"id": 1}))
+    asyncio.run(cache.set("b", {"id": 2}))
+    asyncio.run(cache.get("a"))  # "b" is now least recently used
+    asyncio.run(cache.set("c", {"id": 3}))
+
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a")) == {"id": 1}
+
+    expired = IdentityCache(maxsize=2, ttl=0)
+    asyncio.run(expired.set("a", {"id": 1}))
+    assert asyncio.run(expired.get("a")) is None
+
+def test_identity_round_trip(db_session):
+    user = make_user()
+    db_session.add(user)
+    db_session.flush()
+
+    identity = user.to_identity()
+    assert "password_hash" not in identity
+    assert identity["role"] == UserRole.USER.value
+
+    cached_user = User.from_identity(identity)
+    assert cached_user.id == user.id
+    assert cached_user.dob == user.dob
+    assert cached_user.role == UserRole.USER
+
+def test_cached_user_refuses_to_load_its_password_hash(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            user = make_user()
+            session.add(user)
+            await session.commit()
+            identity = user.to_identity()
+
+        async with AsyncSession(engine) as session:
+            cached_user = await User.merge_identity_async(identity, session)
+            assert cached_user.username == "gracehopper"
+            # A clear error, not MissingGreenlet from an implicit load
+            with pytest.raises(InvalidRequestError, match="password_hash"):
+                cached_user.password_hash
+            cached_user.password_hash = "replaced"
+            await session.commit()
+
+        async with AsyncSession(engine) as session:
+            stored = await User.get_user_by_username_async("gracehopper", session=session)
+            password_hash = stored.password_hash
+        await engine.dispose()
+        return password_hash
+
+    assert asyncio.run(scenario()) == "replaced"
+
+def test_update_user_invalidates_after_commit(db_session):
+    user = make_user()
+    db_session.add(user)
+    db_session.flush()
+    asyncio.run(identity_cache.set(user.username, user.to_identity()))
+
+    user.update_user(session=db_session, city="New York")
+    assert asyncio.run(identity_cache.get(user.username)) is None
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self)
+        self.messages = asyncio.Queue()
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.redis.subscribers.remove(self)
+
+
+class FakeRedis:
+    """Just the pub/sub the identity cache broadcasts over"""
+    def __init__(self):
+        self.subscribers = []
+        self.published = []
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        for subscriber in self.subscribers:
+            subscriber.messages.put_nowait({"type": "message", "data": message})
+
+def test_invalidation_reaches_every_worker():
+    async def scenario():
+        redis = FakeRedis()
+        workers = [IdentityCache(maxsize=10, ttl=60), IdentityCache(maxsize=10, ttl=60)]
+        for worker in workers:
+            await worker.start(redis)
+        await asyncio.sleep(0)
+        for worker in workers:
+            await worker.set("ada", {"id": 1, "role": "ADMIN"})
+
+        await workers[0].invalidate("ada")
+        await asyncio.sleep(0.05)
+        results = [await worker.get("ada") for worker in workers]
+        broadcasting = workers[1].stats()["broadcasting"]
+        for worker in workers:
+            await worker.stop()
+        return redis, results, broadcasting
+
+    redis, results, broadcasting = asyncio.run(scenario())
+    assert redis.published == [("identity_invalidated", "ada")]
+    assert results == [None, None]
+    assert broadcasting
+    assert redis.subscribers == []
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Testing that importing the models stays cheap: no engine, no
+database connection and no settings validation at import time
+"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for app.models.base, in milliseconds.
+# Most of it is SQLAlchemy itself; a connection attempt at import
+# (retried for up to ~40 seconds) or an eager Celery import blows it.
+IMPORT_BUDGET_MS = 1500
+
+IMPORT_CHECK = (
+    "import sys\n"
+    "import app.models.base as base\n"
+    "assert base.db.engine is None, 'engine created at import'\n"
+    "assert 'celery' not in sys.modules, 'Celery imported by the models'\n"
+)
+
+
+def import_times(code: str, env: dict) -> dict:
+    """
+    Run code under -X importtime and return the cumulative
+    microseconds of each module it imported. A module whose parent
+    package imports it is listed twice; the larger entry counts.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = max(int(cumulative), times.get(module.strip(), 0))
+    return times
+
+
+def test_models_import_within_budget():
+    # An unreachable database and no other settings: importing must
+    # neither connect nor validate Settings
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": BACKEND_DIR,
+        "DATABASE_URL": "postgresql://nobody@127.0.0.1:1/unreachable",
+    }
+    times = import_times(IMPORT_CHECK, env)
+
+    cumulative_ms = times["app.models.base"] / 1000
+    assert cumulative_ms < IMPORT_BUDGET_MS, f"app.models.base took {cumulative_ms:.0f} ms to import"
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Testing login throttling
+"""
+import asyncio
+from .conftest import test_client
+from ..app.auth.login_throttle import LoginThrottle
+
+
+class FakeRedis:
+    """
+    Stands in for Redis, running the sliding window
+    script's logic in Python
+    """
+    def __init__(self):
+        self.windows = {}
+        self.calls = 0
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            now, window, member = int(args[0]), int(args[1]), args[2]
+            waits = []
+            for key, limit in zip(keys, args[3:]):
+                attempts = [t for t in self.windows.get(key, []) if t > now - window]
+                self.windows[key] = attempts
+                waits.append(max(1, attempts[0] + window - now) if len(attempts) >= limit else 0)
+            if not any(waits):
+                for key in keys:
+                    self.windows[key].append(now)
+            return waits
+        return run
+
+    async def delete(self, key):
+        self.windows.pop(key, None)
+
+    async def zpopmax(self, key):
+        if self.windows.get(key):
+            self.windows[key].pop()
+
+
+def test_username_limit_with_retry_after():
+    throttle = LoginThrottle(redis=FakeRedis(), max_per_username=3, max_per_ip=100, window=60)
+    results = []
+    for _ in range(4):
+        results.append(asyncio.run(throttle.check("Ada", "10.0.0.1")))
+        # Spread the attempts so the one second burst counter stays out of it
+        throttle._recent.clear()
+
+    assert results[:3] == [0, 0, 0]
+    assert 0 < results[3] <= 60
+    # Another user from the same IP is unaffected
+    assert asyncio.run(throttle.check("grace", "10.0.0.1")) == 0
+
+def test_blocked_keys_are_rejected_without_redis():
+    redis = FakeRedis()
+    throttle = LoginThrottle(redis=redis, max_per_username=1, max_per_ip=100, window=60)
+    asyncio.run(throttle.check("ada", "10.0.0.1"))
+    throttle._recent.clear()
+    assert asyncio.run(throttle.check("ada", "10.0.0.1")) > 0
+
+    calls = redis.calls
+    assert asyncio.run(throttle.check("ADA ", "10.0.0.2")) > 0
+    assert redis.calls == calls
+    assert throttle.stats()["rejected_locally"] == 1
+
+    asyncio.run(throttle.record_success("ada", "10.0.0.1"))
+    assert asyncio.run(throttle.check("ada", "10.0.0.1")) == 0
+
+def test_burst_is_absorbed_locally():
+    redis = FakeRedis()
+    throttle = LoginThrottle(redis=redis, max_per_username=100, max_per_ip=3, window=60)
+    results = [asyncio.run(throttle.check(f"user{i}", "10.0.0.9")) for i in range(5)]
+
+    assert results[:3] == [0, 0, 0]
+    assert all(results[3:])
+    assert redis.calls == 3
+
+def test_only_failures_count_against_an_ip():
+    throttle = LoginThrottle(redis=FakeRedis(), max_per_username=5, max_per_ip=3, window=60)
+    # A clinic's staff all logging in from one address
+    for n in range(10):
+        assert asyncio.run(throttle.check(f"nurse{n}", "10.0.0.5")) == 0
+        asyncio.run(throttle.record_success(f"nurse{n}", "10.0.0.5"))
+        throttle._recent.clear()
+
+    for n in range(3):
+        assert asyncio.run(throttle.check(f"guess{n}", "10.0.0.5")) == 0
+        throttle._recent.clear()
+    assert asyncio.run(throttle.check("nurse0", "10.0.0.5")) > 0
+
+def test_login_endpoint_returns_retry_after(test_client):
+    # The app imports its modules as the top-level app package
+    from app.auth.login_throttle import login_throttle
+    from app.models.base import Base, db
+    Base.metadata.create_all(db.get_engine())
+    login_throttle.configure(redis=FakeRedis(), max_per_username=2, max_per_ip=100, window=60, enabled=True)
+    try:
+        responses = []
+        for _ in range(3):
+            responses.append(test_client.post("/auth/login", data={"username": "nobody", "password": "wrong"}))
+            login_throttle._recent.clear()
+    finally:
+        login_throttle.configure(redis=None)
+
+    assert [response.status_code for response in responses] == [401, 401, 429]
+    assert responses[0].headers["WWW-Authenticate"] == "Bearer"
+    assert 0 < int(responses[2].headers["Retry-After"]) <= 60
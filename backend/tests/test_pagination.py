@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Testing keyset (cursor) pagination
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import select
+from .conftest import db_session
+from ..app.db.pagination import Keyset, InvalidCursor
+from ..app.models.user import User
+
+
+def add_users(session, count):
+    # Pairs of users share a created_at to exercise the id tie-breaker
+    started = datetime(2025, 1, 1)
+    for i in range(count):
+        session.add(User(
+            first_name="Page", last_name=f"{i:02d}", username=f"paged{i:02d}", dob=date(1990, 1, 1),
+            password_hash="not-a-real-hash", email=f"paged{i:02d}@example.com", city="Boston",
+            state="MA", country="USA", created_at=started + timedelta(minutes=i // 2)
+        ))
+    session.commit()
+
+
+def fetch(session, keyset, limit, cursor=None):
+    query = select(User).where(User.username.like("paged%"))
+    rows = session.scalars(keyset.apply(query, limit, cursor)).all()
+    users, next_cursor, prev_cursor = keyset.page(rows, limit, cursor, lambda user: (user.created_at, user.id))
+    return [user.username for user in users], next_cursor, prev_cursor
+
+
+def test_walk_forwards_and_backwards(db_session):
+    add_users(db_session, 7)
+    keyset = Keyset("users:created_at", [User.created_at, User.id], descending=True)
+    expected = sorted((f"paged{i:02d}" for i in range(7)), reverse=True)
+
+    first, next_cursor, prev_cursor = fetch(db_session, keyset, 3)
+    assert first == expected[:3]
+    assert prev_cursor is None
+
+    second, next_cursor, prev_cursor = fetch(db_session, keyset, 3, next_cursor)
+    assert second == expected[3:6]
+
+    last, end_cursor, last_prev = fetch(db_session, keyset, 3, next_cursor)
+    assert last == expected[6:]
+    assert end_cursor is None
+
+    back, _, _ = fetch(db_session, keyset, 3, last_prev)
+    assert back == second
+    back, _, start_cursor = fetch(db_session, keyset, 3, prev_cursor)
+    assert back == first
+    assert start_cursor is None
+
+
+def test_cursor_is_bound_to_its_sort():
+    by_created = Keyset("users:created_at", [User.created_at, User.id], descending=True)
+    by_username = Keyset("users:username", [User.username, User.id])
+    cursor = by_created.encode((datetime(2025, 1, 1, 12, 30), 42))
+
+    assert by_created.decode(cursor) == ([datetime(2025, 1, 1, 12, 30), 42], False)
+    with pytest.raises(InvalidCursor):
+        by_username.decode(cursor)
+    with pytest.raises(InvalidCursor):
+        by_created.decode("not-a-cursor")
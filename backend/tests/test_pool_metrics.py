@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Testing connection pool sizing and instrumentation
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from ..app.db.pool_metrics import PoolMetrics, instrumented_pool_class, instrument_engine
+from ..app.models.base import DatabaseConnection
+from ..app.settings import get_settings
+
+
+def test_checkout_waits_gauges_and_timeouts(tmp_path):
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=instrumented_pool_class(metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1
+    )
+    instrument_engine(engine, metrics)
+
+    held = engine.connect()
+    stats = metrics.stats()
+    assert stats["in_use"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["connects"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+
+    stats = metrics.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 0
+    assert stats["max_in_use"] == 1
+    assert sum(stats["wait_histogram"].values()) == 1
+    engine.dispose()
+
+def test_pool_sizes_follow_process_role():
+    settings = get_settings()
+    web = DatabaseConnection("sqlite:///unused.db").pool_options()
+    celery = DatabaseConnection("sqlite:///unused.db", pool_role="celery").pool_options()
+
+    assert web["pool_size"] == settings.DB_POOL_SIZE
+    assert web["max_overflow"] == settings.DB_MAX_OVERFLOW
+    assert celery["pool_size"] == settings.CELERY_DB_POOL_SIZE
+    assert celery["pool_timeout"] == settings.CELERY_DB_POOL_TIMEOUT
@@ -3,7 +3,7 @@
 Testing the Prescription model
 """
 import pytest
-from .conftest import db_session
+from .conftest import db_session, assert_max_queries, make_consultation
 from ..app.models.user import User
 from ..app.models.doctor import Doctor
 from ..app.models.appointment import Appointment, AppointmentStatus
@@ -286,4 +286,36 @@ def test_check_expired_prescriptions(db_session):
 
     # Query the database to confirm status was updated
     refreshed_prescription = db_session.query(Prescription).filter_by(id=prescription.id).first()
-    assert refreshed_prescription.status == PrescriptionStatus.EXPIRED
\ No newline at end of file
+    assert refreshed_prescription.status == PrescriptionStatus.EXPIRED
+
+
+def test_create_prescriptions_in_item_order(db_session):
+    appointment = make_consultation(db_session, "bulkrx")
+    items = [
+        {"medication_name": f"Medicine {n}", "dosage": "10mg", "instructions": "Once daily", "duration_days": n}
+        for n in range(1, 6)
+    ]
+
+    # One INSERT ... RETURNING on PostgreSQL; SQLite cannot return
+    # rows of a multi-row insert in order, so it inserts row by row
+    prescriptions = Prescription.create_prescriptions(
+        appointment.doctor_id, appointment.id, items, session=db_session
+    )
+
+    assert [p.medication_name for p in prescriptions] == [item["medication_name"] for item in items]
+    assert all(p.id is not None and p.status == PrescriptionStatus.ACTIVE for p in prescriptions)
+    assert prescriptions[4].expiry_date - prescriptions[0].expiry_date >= timedelta(days=4) - timedelta(seconds=1)
+
+def test_create_prescriptions_reports_every_invalid_item(db_session):
+    appointment = make_consultation(db_session, "badrx")
+    items = [
+        {"medication_name": "", "dosage": "10mg", "instructions": "Daily"},
+        {"medication_name": "Valid", "dosage": "10mg", "instructions": "Daily"},
+        {"medication_name": "Valid", "dosage": "10mg", "instructions": "Daily", "colour": "red"},
+    ]
+
+    with assert_max_queries(0), pytest.raises(ValueError) as error:
+        Prescription.create_prescriptions(appointment.doctor_id, appointment.id, items, session=db_session)
+    assert "Item 0" in str(error.value)
+    assert "Item 1" not in str(error.value)
+    assert "Item 2" in str(error.value)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Testing the per-request query counter and N+1 detection
+"""
+import logging
+from datetime import date
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from .conftest import db_session, assert_max_queries
+from ..app.db.query_counter import query_counter
+from ..app.models.user import User
+from ..app.models.doctor import Doctor
+
+
+def add_doctors(session, count):
+    for i in range(count):
+        user = User(
+            first_name="Doc",
+            last_name=str(i),
+            username=f"counted{i}",
+            dob=date(1980, 1, 1),
+            password_hash="not-a-real-hash",
+            email=f"counted{i}@example.com",
+            city="Boston",
+            state="MA",
+            country="USA"
+        )
+        session.add(user)
+        session.flush()
+        session.add(Doctor(
+            user_id=user.id,
+            phone_number=f"555-000{i}",
+            specialization="Cardiology",
+            license_number=f"LICCOUNT{i}"
+        ))
+    session.commit()
+    session.expunge_all()
+
+
+def test_lazy_loads_in_a_loop_are_flagged(db_session, caplog, monkeypatch):
+    add_doctors(db_session, 4)
+    monkeypatch.setattr(query_counter, "repeat_threshold", 2)
+
+    with caplog.at_level(logging.WARNING), query_counter.track("GET /doctors") as stats:
+        doctors = db_session.scalars(select(Doctor)).all()
+        usernames = [doctor.user.username for doctor in doctors]
+
+    assert len(usernames) == 4
+    assert stats.count == 5
+    assert stats.time_ms > 0
+    assert any("Possible N+1 in GET /doctors: statement ran 4 times" in message for message in caplog.messages)
+
+
+def test_assert_max_queries(db_session):
+    add_doctors(db_session, 4)
+
+    with assert_max_queries(2):
+        doctors = db_session.scalars(select(Doctor).options(selectinload(Doctor.user))).all()
+        assert [doctor.user.username for doctor in doctors]
+
+    db_session.expunge_all()
+    with pytest.raises(AssertionError, match="5 statements, budget 2"):
+        with assert_max_queries(2):
+            for doctor in db_session.scalars(select(Doctor)).all():
+                doctor.user.username
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Testing the sampled slow query log
+"""
+import json
+import logging
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from ..app.db.query_log import SlowQueryLog
+
+
+@pytest.fixture
+def sql_records(caplog, monkeypatch):
+    """
+    Records of the "sql" logger; app.logging stops it propagating
+    to the root logger caplog listens on
+    """
+    monkeypatch.setattr(logging.getLogger("sql"), "propagate", True)
+    return lambda: [json.loads(record.getMessage()) for record in caplog.records if record.name == "sql"]
+
+
+def test_slow_and_sampled_statements(tmp_path, caplog, sql_records):
+    query_log = SlowQueryLog(threshold_ms=0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    query_log.instrument(engine)
+
+    with caplog.at_level(logging.INFO, logger="sql"), engine.connect() as connection:
+        connection.execute(text("SELECT :value"), {"value": 1})
+
+        query_log.configure(threshold_ms=10_000, sample_rate=1.0)
+        connection.execute(text("SELECT 2"))
+
+        query_log.configure(sample_rate=0.0)
+        connection.execute(text("SELECT 3"))
+
+        # A failing statement is not timed and does not upset the next one
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing_table"))
+        connection.execute(text("SELECT 4"))
+
+    records = sql_records()
+    assert [record["event"] for record in records] == ["slow_query", "sampled_query"]
+    assert records[0]["statement"] == "SELECT ?"
+    assert "parameters" not in records[0]
+    assert "plan" not in records[0]
+
+    stats = query_log.stats()
+    assert stats["statements"] == 4
+    assert stats["slow"] == 1
+    assert stats["sampled"] == 1
+
+
+def test_explain_only_postgres_selects_once_per_interval():
+    query_log = SlowQueryLog(explain=True, explain_interval=300)
+    postgres = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+    sqlite = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+
+    assert query_log._should_explain(postgres, "SELECT * FROM users WHERE id = %(id)s")
+    assert not query_log._should_explain(postgres, "SELECT * FROM users WHERE id = %(id)s")
+    assert not query_log._should_explain(postgres, "UPDATE users SET status = %(status)s")
+    assert not query_log._should_explain(sqlite, "SELECT * FROM doctors")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Plan regression check for the hot queries.
+
+Seeds a PostgreSQL database with realistic volumes, runs EXPLAIN on
+each hot query and fails when a plan sequentially scans a table with
+more rows than the threshold, i.e. when a query lost its index.
+
+Needs a local PostgreSQL and is skipped without one:
+
+    PLAN_CHECK_DATABASE_URL=postgresql://localhost/healthhaven_plans \
+        python -m pytest backend/tests/test_query_plans.py
+
+Everything is created in a scratch schema that is dropped afterwards.
+PLAN_CHECK_SEQ_SCAN_ROWS overrides the threshold (default 1000).
+"""
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, text
+from ..app.db.counting import Explain
+from ..app.db.pagination import Keyset
+from ..app.models.base import Base
+from ..app.models.user import User, UserRole, USER_BY_USERNAME, USER_BY_EMAIL, user_typeahead
+from ..app.models.doctor import Doctor, DoctorStatus
+from ..app.models.appointment import Appointment, AppointmentStatus
+from ..app.models.symptom import Symptom
+from ..app.models.medical_record import MedicalRecord
+from ..app.models.prescription import Prescription, PrescriptionStatus
+
+
+DATABASE_URL = os.environ.get("PLAN_CHECK_DATABASE_URL")
+SEQ_SCAN_ROWS = int(os.environ.get("PLAN_CHECK_SEQ_SCAN_ROWS", "1000"))
+SCHEMA = "plan_check"
+
+USERS = 20_000
+DOCTORS = 200
+APPOINTMENTS = 60_000
+SYMPTOMS = 60_000
+MEDICAL_RECORDS = 40_000
+PRESCRIPTIONS = 60_000
+BATCH = 5_000
+
+
+def large_seq_scans(plan: dict, table_rows: Dict[str, float], threshold: int) -> List[str]:
+    """
+    Sequential scans in an EXPLAIN (FORMAT JSON) plan tree over
+    tables with more than threshold rows
+    """
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        table = plan.get("Relation Name")
+        rows = table_rows.get(table, 0)
+        if rows > threshold:
+            found.append(f"Seq Scan on {table} ({int(rows)} rows)")
+    for child in plan.get("Plans", []):
+        found.extend(large_seq_scans(child, table_rows, threshold))
+    return found
+
+
+def insert_batches(connection, model, rows):
+    for start in range(0, len(rows), BATCH):
+        connection.execute(insert(model), rows[start:start + BATCH])
+
+
+def seed(connection, today: date):
+    """Deterministic rows in the proportions of production"""
+    insert_batches(connection, User, [{
+        "id": n,
+        "first_name": f"First{n}",
+        "last_name": f"Last{n}",
+        "dob": date(1950, 1, 1) + timedelta(days=n % 18_000),
+        "username": f"user{n}",
+        "password_hash": "x",
+        "email": f"user{n}@example.com",
+        "city": f"City{n % 300}",
+        "state": f"State{n % 40}",
+        "country": "Country",
+        "role": UserRole.DOCTOR if n <= DOCTORS else UserRole.USER,
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=n),
+    } for n in range(1, USERS + 1)])
+    insert_batches(connection, Doctor, [{
+        "id": n,
+        "user_id": n,
+        "phone_number": "0123456789",
+        "specialization": f"Specialization{n % 12}",
+        "license_number": f"LIC{n:06d}",
+        "status": DoctorStatus.APPROVED,
+    } for n in range(1, DOCTORS + 1)])
+    # Each doctor gets one appointment a day, spread around today
+    insert_batches(connection, Appointment, [{
+        "id": n,
+        "doctor_id": n % DOCTORS + 1,
+        "user_id": n % (USERS - DOCTORS) + DOCTORS + 1,
+        "appointment_date": today + timedelta(days=n // DOCTORS - APPOINTMENTS // DOCTORS // 2),
+        "appointment_time": time(9, 0),
+        "appointment_note": "Checkup",
+        "status": AppointmentStatus.CANCELLED if n % 10 == 0 else AppointmentStatus.SCHEDULED,
+    } for n in range(1, APPOINTMENTS + 1)])
+    insert_batches(connection, Symptom, [{
+        "user_id": n % (USERS - DOCTORS) + DOCTORS + 1,
+        "appointment_id": n,
+        "symptom_name": f"Symptom{n % 50}",
+        "severity_level": ("mild", "moderate", "severe")[n % 3],
+    } for n in range(1, SYMPTOMS + 1)])
+    insert_batches(connection, MedicalRecord, [{
+        "user_id": n % (USERS - DOCTORS) + DOCTORS + 1,
+        "doctor_id": n % DOCTORS + 1,
+        "record_date": datetime(2024, 1, 1) + timedelta(hours=n),
+        "description": f"Record {n}",
+    } for n in range(1, MEDICAL_RECORDS + 1)])
+    # Mostly expired already, a few active ones about to expire
+    insert_batches(connection, Prescription, [{
+        "doctor_id": n % DOCTORS + 1,
+        "appointment_id": n,
+        "medication_name": f"Medicine{n % 100}",
+        "dosage": "10mg",
+        "instructions": "Daily",
+        "status": PrescriptionStatus.ACTIVE if n % 20 == 0 else PrescriptionStatus.EXPIRED,
+        "expiry_date": datetime.combine(today, time()) + timedelta(days=n % 60 - 2),
+    } for n in range(1, PRESCRIPTIONS + 1)])
+
+
+def hot_queries(today: date) -> Dict[str, tuple]:
+    """(statement, parameters) of each query on a hot path"""
+    user_id, doctor_id = DOCTORS + 42, 7
+    slot = (today, time(9, 0))
+    user_page = Keyset("users:created_at", [User.created_at, User.id], descending=True)
+    appointment_page = Keyset(
+        "appointments", [Appointment.appointment_date, Appointment.appointment_time, Appointment.id]
+    )
+    return {
+        "appointment list": (appointment_page.apply(
+            Appointment.response_query().filter(
+                Appointment.user_id == user_id,
+                Appointment.appointment_date >= today,
+                Appointment.appointment_date <= today + timedelta(days=30)
+            ).add_columns(func.count().over().label("total")), 10
+        ), {}),
+        "user conflict check": (select(Appointment.id).where(
+            Appointment.user_id == user_id,
+            Appointment.appointment_date == slot[0],
+            Appointment.appointment_time == slot[1],
+            Appointment.status != AppointmentStatus.CANCELLED
+        ).limit(1), {}),
+        "doctor conflict check": (select(Appointment.id).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date == slot[0],
+            Appointment.appointment_time == slot[1],
+            Appointment.status != AppointmentStatus.CANCELLED
+        ).limit(1), {}),
+        "admin users page": (user_page.apply(select(User), 10), {}),
+        "admin users by role": (user_page.apply(select(User).where(User.role == UserRole.DOCTOR), 10), {}),
+        "user by username": (USER_BY_USERNAME, {"username": "user123"}),
+        "user by email": (USER_BY_EMAIL, {"email": "user123@example.com"}),
+        "symptoms of a user": (select(Symptom).where(Symptom.user_id == user_id), {}),
+        "recorded symptoms": (Symptom._recorded_query(user_id, 1234, [{"symptom_name": "Symptom1"}]), {}),
+        "medical records of a user": (
+            select(MedicalRecord).where(MedicalRecord.user_id == user_id).order_by(MedicalRecord.record_date), {}
+        ),
+        "user search by misspelt name": (User._search_query("Frist123", (), [], "postgresql").limit(20), {}),
+        # A prefix every seeded user shares
+        "admin user typeahead": (user_typeahead.query("us", 10, "postgresql"), {}),
+        "doctor search by misspelt name": (Doctor._search_query("Frist12", (), [], "postgresql").limit(20), {}),
+        "symptom search of a user": (Symptom._search_query(
+            "symptom1", (), [Symptom.user_id == user_id], "postgresql"
+        ).limit(20), {}),
+        "prescription search of a user": (Prescription._search_query(
+            "medicine1", (), [Prescription.appointment.has(user_id=user_id)], "postgresql"
+        ).limit(20), {}),
+        "expired prescriptions": (select(Prescription).where(
+            Prescription.status == PrescriptionStatus.ACTIVE,
+            Prescription.expiry_date < datetime.combine(today, time())
+        ), {}),
+    }
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    if not DATABASE_URL:
+        pytest.skip("PLAN_CHECK_DATABASE_URL is not set")
+    admin = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    try:
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            seed(connection, date.today())
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("ANALYZE"))
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+def test_large_seq_scans_walks_the_plan_tree():
+    plan = {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "doctors"},
+        {"Node Type": "Limit", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "appointments"}]},
+    ]}
+    rows = {"doctors": 200, "appointments": 60_000}
+    assert large_seq_scans(plan, rows, 1000) == ["Seq Scan on appointments (60000 rows)"]
+    assert large_seq_scans(plan, rows, 100_000) == []
+
+
+def test_hot_queries_use_indexes(plan_engine):
+    failures = []
+    with plan_engine.connect() as connection:
+        table_rows = dict(connection.execute(text(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relkind = 'r' AND relnamespace = CAST(:schema AS regnamespace)"
+        ), {"schema": SCHEMA}).all())
+        for name, (statement, parameters) in hot_queries(date.today()).items():
+            plan = connection.execute(Explain(statement), parameters).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for scan in large_seq_scans(plan[0]["Plan"], table_rows, SEQ_SCAN_ROWS):
+                failures.append(f"{name}: {scan}")
+    assert not failures, "Queries lost their index:\n" + "\n".join(failures)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Testing refresh token rotation and reuse detection
+"""
+import asyncio
+import pytest
+from ..app.auth.refresh_tokens import RefreshTokenStore, RefreshTokenReused
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    """Just the commands the refresh token store uses"""
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+
+CLAIMS = {"sub": "ada", "role": "user", "uid": 1, "status": "active", "tv": 0}
+
+def test_tokens_are_stored_hashed_and_rotate():
+    redis = FakeRedis()
+    store = RefreshTokenStore(redis=redis)
+    token = asyncio.run(store.issue(CLAIMS))
+    assert not any(token in key or token == value for key, value in redis.values.items())
+
+    claims, rotated = asyncio.run(store.rotate(token))
+    assert claims == CLAIMS
+    assert rotated != token
+    assert asyncio.run(store.rotate("unknown")) is None
+
+def test_reuse_revokes_the_family():
+    store = RefreshTokenStore(redis=FakeRedis())
+    token = asyncio.run(store.issue(CLAIMS))
+    _, rotated = asyncio.run(store.rotate(token))
+
+    with pytest.raises(RefreshTokenReused):
+        asyncio.run(store.rotate(token))
+    # The token issued by the legitimate rotation is revoked too
+    assert asyncio.run(store.rotate(rotated)) is None
+    assert store.stats()["reuse_detected"] == 1
+
+def test_revoke_on_logout():
+    store = RefreshTokenStore(redis=FakeRedis())
+    token = asyncio.run(store.issue(CLAIMS))
+    asyncio.run(store.revoke(token))
+    assert asyncio.run(store.rotate(token)) is None
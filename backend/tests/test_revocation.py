@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Testing token revocation and its Bloom filter
+"""
+import asyncio
+import time
+from ..app.auth.jwt import create_access_token, verify_token
+from ..app.auth.revocation import BloomFilter, RevocationList
+
+
+class FakeRedis:
+    """Just the commands the revocation list uses"""
+    def __init__(self):
+        self.keys = {}
+        self.published = []
+        self.lookups = 0
+
+    async def set(self, key, value, ex=None):
+        self.keys[key] = value
+
+    async def exists(self, key):
+        self.lookups += 1
+        return int(key in self.keys)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    async def scan_iter(self, match=None, count=None):
+        for key in list(self.keys):
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+
+def test_only_filter_hits_reach_redis():
+    redis = FakeRedis()
+    revocations = RevocationList(redis=redis)
+    payload = verify_token(create_access_token({"sub": "ada"}))
+    assert payload["jti"]
+
+    asyncio.run(revocations.revoke(payload["jti"], payload["exp"]))
+    assert redis.published == [("revoked_jti", payload["jti"])]
+
+    assert asyncio.run(revocations.is_revoked("never-revoked")) is False
+    assert redis.lookups == 0
+    assert asyncio.run(revocations.is_revoked(payload["jti"])) is True
+    assert redis.lookups == 1
+
+def test_rebuild_drops_expired_revocations():
+    redis = FakeRedis()
+    revocations = RevocationList(redis=redis)
+    asyncio.run(revocations.revoke("expiring", time.time() + 60))
+
+    # Redis expired the key
+    redis.keys.clear()
+    asyncio.run(revocations.rebuild())
+    assert asyncio.run(revocations.is_revoked("expiring")) is False
+    assert revocations.stats()["filter_items"] == 0
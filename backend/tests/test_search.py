@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Testing full-text search behind Base.search
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from .conftest import db_session, assert_max_queries, make_consultation
+from ..app.db.full_text import FullTextIndex, full_text, search_terms
+from ..app.models.appointment import Appointment
+from ..app.models.doctor import Doctor
+from ..app.models.medical_record import MedicalRecord
+from ..app.models.prescription import Prescription
+from ..app.models.symptom import Symptom
+from ..app.models.user import User
+
+
+def add_records(db_session, descriptions):
+    consultation = make_consultation(db_session, "search")
+    records = [
+        MedicalRecord(user_id=consultation.user_id, doctor_id=consultation.doctor_id, description=description)
+        for description in descriptions
+    ]
+    db_session.add_all(records)
+    db_session.flush()
+    return records
+
+
+def test_search_terms_keep_only_words():
+    assert search_terms("Cardio-logy  \"x\"* OR") == ["cardio", "logy", "x", "or"]
+    assert search_terms("'; --") == []
+
+
+def test_indexes_follow_searchable_columns():
+    assert full_text.indexes[User].columns == ["first_name", "last_name", "username", "email"]
+    # Columns of related models are joined, enum columns left out
+    assert full_text.indexes[Doctor].columns == ["specialization", "license_number"]
+    assert full_text.indexes[Doctor].paths == ["user.first_name", "user.last_name"]
+    assert full_text.indexes[Symptom].columns == ["symptom_name", "description"]
+
+
+def test_search_ranks_matches_by_relevance(db_session):
+    add_records(db_session, [
+        "Follow-up on blood pressure",
+        "Blood test; blood pressure high, repeat blood test",
+        "Sprained ankle",
+    ])
+
+    found = MedicalRecord.search("blood", session=db_session)
+    assert [record.description for record in found] == [
+        "Blood test; blood pressure high, repeat blood test",
+        "Follow-up on blood pressure",
+    ]
+    # Every word must match, each as a prefix
+    assert [record.description for record in MedicalRecord.search("ank spr", session=db_session)] == [
+        "Sprained ankle"
+    ]
+    assert MedicalRecord.search("blood ankle", session=db_session) == []
+    assert MedicalRecord.search("!!", session=db_session) == []
+
+
+def test_search_pages_in_sql(db_session):
+    records = add_records(db_session, [f"Routine checkup {n}" for n in range(5)])
+
+    page = MedicalRecord.search("routine", session=db_session, limit=2, offset=2)
+    assert [record.id for record in page] == [record.id for record in records[2:4]]
+
+
+def test_index_follows_updates_and_deletes(db_session):
+    record, = add_records(db_session, ["Migraine"])
+
+    record.description = "Tension headache"
+    db_session.flush()
+    assert MedicalRecord.search("migraine", session=db_session) == []
+    assert MedicalRecord.search("headache", session=db_session) == [record]
+
+    db_session.delete(record)
+    db_session.flush()
+    assert MedicalRecord.search("headache", session=db_session) == []
+
+
+def test_other_columns_fall_back_to_substring_match(db_session):
+    consultation = make_consultation(db_session, "fallback")
+
+    found = User.search("allbac", "first_name", session=db_session)
+    assert [user.id for user in found] == sorted([consultation.user_id, consultation.doctor.user_id])
+
+
+def test_postgresql_query_ranks_by_ts_rank():
+    index = FullTextIndex("doctors", ["specialization", "license_number"])
+    query = index.apply(select(Doctor), Doctor, "cardio lic", "postgresql")
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "doctors.search_vector @@ to_tsquery('simple'::regconfig, 'cardio:* & lic:*')" in sql
+    assert "ORDER BY ts_rank(doctors.search_vector, to_tsquery('simple'::regconfig, 'cardio:* & lic:*')) DESC" in sql
+    assert index.create_ddl("postgresql")[0] == (
+        "ALTER TABLE doctors ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('simple'::regconfig, coalesce(specialization, '') || ' ' || "
+        "coalesce(license_number, ''))) STORED"
+    )
+
+
+def add_symptoms(db_session, name, symptom_names):
+    consultation = make_consultation(db_session, name)
+    symptoms = [
+        Symptom(user_id=consultation.user_id, appointment_id=consultation.id,
+                symptom_name=symptom_name, severity_level="mild")
+        for symptom_name in symptom_names
+    ]
+    db_session.add_all(symptoms)
+    db_session.flush()
+    return consultation, symptoms
+
+
+def test_user_search_is_filtered_in_sql(db_session):
+    mine, symptoms = add_symptoms(db_session, "mine", ["Headache", "Head cold", "Nausea"])
+    add_symptoms(db_session, "theirs", ["Headache"])
+
+    with assert_max_queries(1):
+        found = Symptom.search_symptoms(mine.user_id, "head", session=db_session, limit=1, offset=1)
+    assert found == [symptoms[1]]
+    assert Symptom.search_symptoms(mine.user_id, "head", session=db_session) == symptoms[:2]
+
+    prescription = Prescription(doctor_id=mine.doctor_id, appointment_id=mine.id, medication_name="Ibuprofen",
+                                dosage="200mg", instructions="After meals")
+    db_session.add(prescription)
+    db_session.flush()
+    assert Prescription.search_prescriptions(mine.user_id, "ibuprofen", session=db_session) == [prescription]
+    assert Prescription.search_prescriptions(mine.user_id + 1, "ibuprofen", session=db_session) == []
+    assert Appointment.search_appointments(mine.user_id, "consultation", session=db_session) == [mine]
+
+
+def test_search_iter_streams_every_match(db_session):
+    records = add_records(db_session, [f"Physiotherapy session {n}" for n in range(7)])
+
+    found = MedicalRecord.search_iter("physiotherapy", session=db_session, batch_size=3)
+    assert next(found) == records[0]
+    assert [record.id for record in found] == [record.id for record in records[1:]]
+
+
+def test_doctors_are_found_by_name_in_one_statement(db_session):
+    cardiologist = make_consultation(db_session, "ada").doctor
+    cardiologist.specialization = "Cardiology"
+    make_consultation(db_session, "grace")
+    db_session.flush()
+
+    with assert_max_queries(1) as stats:
+        found = Doctor.search_doctors("ada", session=db_session)
+    assert found == [cardiologist]
+    # Names are looked up in users on their own, not through a join
+    assert "doctors.user_id IN (SELECT users.id" in list(stats.shapes)[0]
+    assert "JOIN users" not in list(stats.shapes)[0]
+    # Words may match the index or the related columns
+    assert Doctor.search_doctors("cardio doct", session=db_session) == [cardiologist]
+    assert Doctor.search_doctors("cardio grace", session=db_session) == []
+    # Explicit dotted columns fall back to a substring match
+    assert Doctor.search("rac", "user.first_name", session=db_session)[0].user.first_name == "Grace"
+    with pytest.raises(ValueError):
+        Doctor.search("x", "appointments.appointment_note", session=db_session)
+
+
+def test_postgresql_names_match_by_trigram_similarity():
+    query = Doctor._search_query("Smth", (), [], "postgresql")
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    # Candidates come from one table at a time; users is joined only to rank them
+    assert sql.count("JOIN users AS users_1") == 1
+    assert "doctors.id IN (SELECT doctors.id \nFROM doctors \nWHERE doctors.search_vector @@" in sql
+    assert ("UNION SELECT doctors.id \nFROM doctors \nWHERE doctors.user_id IN (SELECT users.id \nFROM users \n"
+            "WHERE users.last_name ILIKE 'smth%%' OR (users.last_name %% 'smth'))") in sql
+    assert "greatest(similarity(users_1.first_name, 'smth'), similarity(users_1.last_name, 'smth')) DESC" in sql
+    assert full_text.indexes[User].create_ddl("postgresql")[-1] == (
+        "CREATE INDEX IF NOT EXISTS ix_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops)"
+    )
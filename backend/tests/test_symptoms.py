@@ -3,7 +3,7 @@
 Testing the Symptom model
 """
 import pytest
-from .conftest import db_session
+from .conftest import db_session, make_consultation
 from ..app.models.user import User
 from ..app.models.appointment import Appointment, AppointmentStatus
 from ..app.models.doctor import Doctor
@@ -256,4 +256,27 @@ def test_update_symptom(db_session):
     # Verify unchanged attributes
     assert updated_symptom.symptom_name == "Arm Pain"
     assert updated_symptom.user_id == user.id
-    assert updated_symptom.appointment_id == appointment.id
\ No newline at end of file
+    assert updated_symptom.appointment_id == appointment.id
+
+
+def test_create_symptoms_updates_recorded_and_inserts_the_rest(db_session):
+    appointment = make_consultation(db_session, "bulksym")
+    Symptom.create_symptoms(appointment.user_id, appointment.id, [
+        {"symptom_name": "Cough", "severity_level": "mild"},
+    ], session=db_session)
+
+    symptoms = Symptom.create_symptoms(appointment.user_id, appointment.id, [
+        {"symptom_name": "Fever", "severity_level": "moderate", "description": "Evenings"},
+        {"symptom_name": "Cough", "severity_level": "severe"},
+        {"symptom_name": "Headache", "severity_level": "mild"},
+    ], session=db_session)
+
+    assert [s.symptom_name for s in symptoms] == ["Fever", "Cough", "Headache"]
+    assert symptoms[1].severity_level == "severe"
+    assert db_session.query(Symptom).filter(Symptom.appointment_id == appointment.id).count() == 3
+
+    with pytest.raises(ValueError):
+        Symptom.create_symptoms(appointment.user_id, appointment.id, [
+            {"symptom_name": "Fever", "severity_level": "mild"},
+            {"symptom_name": "Fever", "severity_level": "severe"},
+        ], session=db_session)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Testing the verified JWT payload cache
+"""
+import time
+from ..app.auth.jwt import create_access_token, verify_token
+from ..app.auth.token_cache import VerifiedTokenCache, token_cache
+
+
+def test_verify_token_hits_cache_until_exp():
+    token_cache.clear()
+    token = create_access_token({"sub": "ada"})
+    hits = token_cache.hits
+
+    assert verify_token(token)["sub"] == "ada"
+    assert verify_token(token)["sub"] == "ada"
+    assert token_cache.hits == hits + 1
+
+    assert verify_token(token + "x") is None
+
+def test_expired_and_exp_less_tokens_are_not_served():
+    cache = VerifiedTokenCache(maxsize=10)
+    cache.set("expired", {"sub": "ada", "exp": time.time() - 1})
+    cache.set("no-exp", {"sub": "ada"})
+
+    assert cache.get("expired") is None
+    assert cache.get("no-exp") is None
+    assert cache.stats()["size"] == 0
+
+def test_lru_bound_and_disable_switch():
+    cache = VerifiedTokenCache(maxsize=1)
+    exp = time.time() + 60
+    cache.set("a", {"sub": "a", "exp": exp})
+    cache.set("b", {"sub": "b", "exp": exp})
+    assert cache.get("a") is None
+    assert cache.get("b")["sub"] == "b"
+
+    cache.configure(enabled=False)
+    cache.set("b", {"sub": "b", "exp": exp})
+    assert cache.get("b") is None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Testing token versions and the claims used by stateless auth
+"""
+import asyncio
+from datetime import date
+from .conftest import db_session
+from ..app.auth.jwt import create_access_token, verify_token, user_claims, is_stateless_payload
+from ..app.auth.token_versions import TokenVersionStore, PENDING_BUMPS
+from ..app.models.user import User, UserRole
+
+
+class FakeRedis:
+    """Just the hash commands the store uses"""
+    def __init__(self):
+        self.hashes = {}
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+        return int(values[field])
+
+
+def make_user():
+    return User(
+        first_name="Alan",
+        last_name="Turing",
+        username="alanturing",
+        dob=date(1992, 6, 23),
+        password_hash=User.set_password("enigmamachine"),
+        email="alan.turing@example.com",
+        city="London",
+        state="London",
+        country="UK"
+    )
+
+def test_stateless_claims_round_trip(db_session):
+    user = make_user()
+    db_session.add(user)
+    db_session.flush()
+
+    assert not is_stateless_payload(verify_token(create_access_token(user_claims(user))))
+
+    payload = verify_token(create_access_token(user_claims(user, token_version=3)))
+    assert is_stateless_payload(payload)
+    assert payload["uid"] == user.id
+    assert payload["tv"] == 3
+    assert payload["status"] == "active"
+    assert UserRole[payload["role"]] == UserRole.USER
+
+def test_bump_revokes_older_versions():
+    store = TokenVersionStore(redis=FakeRedis(), local_ttl=60)
+
+    assert asyncio.run(store.get(1)) == 0
+    asyncio.run(store.bump(1))
+    assert asyncio.run(store.is_current(1, 0)) is False
+    assert asyncio.run(store.is_current(1, 1)) is True
+
+def test_only_claim_fields_bump_on_update(db_session):
+    user = make_user()
+    db_session.add(user)
+    db_session.flush()
+
+    user.update_user(session=db_session, city="Manchester")
+    assert user.id not in db_session.info.get(PENDING_BUMPS, set())
+
+    user.update_user(session=db_session, role=UserRole.ADMIN)
+    assert user.id in db_session.info[PENDING_BUMPS]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Testing the admin user typeahead
+"""
+import asyncio
+from datetime import date
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from ..app.db.typeahead import next_prefix
+from ..app.models.base import Base
+from ..app.models.user import User, UserRole, user_typeahead
+
+
+def user_row(username, first_name, last_name):
+    return {
+        "username": username,
+        "email": f"{username}@example.com",
+        "first_name": first_name,
+        "last_name": last_name,
+        "dob": date(1990, 1, 1),
+        "password_hash": "x",
+        "city": "Lagos",
+        "state": "Lagos",
+        "country": "Nigeria",
+        "role": UserRole.USER,
+    }
+
+
+async def suggest(tmp_path, typeahead, searches):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'typeahead.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [
+            user_row("adaeze", "Adaeze", "Okafor"),
+            user_row("tunde_b", "Babatunde", "Adeyemi"),
+            user_row("kemi", "Oluwakemi", "Bello"),
+        ])
+
+    results = []
+    async with AsyncSession(engine) as session:
+        for prefix, limit in searches:
+            rows = await typeahead.search(session, prefix, limit)
+            results.append([row["username"] for row in rows])
+        # A new user shows up for long prefixes, not cached short ones
+        await session.execute(insert(User), [user_row("adamu", "Adamu", "Musa")])
+        results.append([row["username"] for row in await typeahead.search(session, "ad", 8)])
+        results.append([row["username"] for row in await typeahead.search(session, "ada", 8)])
+    await engine.dispose()
+    return results
+
+
+def test_prefix_matches_any_column(tmp_path):
+    user_typeahead.configure(cache_ttl=60)
+    user_typeahead.counts.clear()
+    results = asyncio.run(suggest(tmp_path, user_typeahead, [
+        ("ad", 8),          # username adaeze, last name Adeyemi
+        ("  ADA ", 8),
+        ("tunde_", 8),      # LIKE wildcards are plain characters
+        ("ad", 1),
+        ("zz", 8),
+        ("   ", 8),
+    ]))
+
+    assert results == [
+        ["adaeze", "tunde_b"],
+        ["adaeze"],
+        ["tunde_b"],
+        ["adaeze"],
+        [],
+        [],
+        ["adaeze", "tunde_b"],
+        ["adaeze", "adamu"],
+    ]
+    assert user_typeahead.stats()["cached"] == 1
+    assert user_typeahead.stats()["queries"] == 6
+
+
+def test_postgresql_prefix_match_is_an_ordered_range_seek():
+    statement = user_typeahead.query("o'k_", 5, "postgresql")
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    # Read in index order, so each branch stops after its LIMIT
+    assert ("WHERE (lower(users.username) COLLATE \"C\") >= 'o''k_' "
+            "AND (lower(users.username) COLLATE \"C\") < 'o''k`' "
+            "ORDER BY lower(users.username) COLLATE \"C\", users.id") in sql
+    assert sql.count(" UNION ALL ") == 3
+    assert "GROUP BY anon_1.id" in sql
+    assert user_typeahead.create_ddl("postgresql")[0] == (
+        'CREATE INDEX IF NOT EXISTS ix_users_username_prefix ON users ((lower(username) COLLATE "C"), id)'
+    )
+    assert next_prefix("ad") == "ae"
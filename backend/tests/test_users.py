@@ -3,6 +3,7 @@
 Testing the User model
 """
 import pytest
+from datetime import date
 from .conftest import db_session
 from ..app.models.user import User
 from sqlalchemy.exc import IntegrityError
@@ -121,4 +122,46 @@ def test_delete_user(db_session):
     db_session.commit()
 
     deleted_user = db_session.query(User).filter(User.id == user_id).first()
-    assert deleted_user is None
\ No newline at end of file
+    assert deleted_user is None
+
+def test_model_methods_share_the_callers_session(db_session):
+    user = User(
+        first_name="Ella",
+        last_name="Fitzgerald",
+        username="ellafitzgerald",
+        dob=date(1995, 4, 25),
+        password_hash=User.set_password("firstlady"),
+        email="ella.fitzgerald@example.com",
+        city="Newport News",
+        state="VA",
+        country="USA"
+    )
+    db_session.add(user)
+    db_session.flush()
+
+    # The lookup runs inside the caller's transaction, so it sees the uncommitted row
+    fetched_user = User.get_user_by_username("ellafitzgerald", session=db_session)
+    assert fetched_user is user
+
+    user.update_user(session=db_session, city="Yonkers")
+    assert User.get_user_by_id(user.id, session=db_session).city == "Yonkers"
+
+def test_lookups_reuse_prebuilt_statements(db_session):
+    user = User(
+        first_name="Ada",
+        last_name="Lovelace",
+        username="adalovelace",
+        dob=date(1815, 12, 10),
+        password_hash=User.set_password("analyticalengine"),
+        email="ada.lovelace@example.com",
+        city="London",
+        state="London",
+        country="UK"
+    )
+    db_session.add(user)
+    db_session.flush()
+
+    assert User.get_user_by_username("adalovelace", session=db_session) is user
+    assert User.get_user_by_email("ada.lovelace@example.com", session=db_session) is user
+    assert User.get_user_by_id(user.id, session=db_session) is user
+    assert User.get_user_by_username("nobody", session=db_session) is None
@@ -5,6 +5,9 @@ const API_BASE_URL = '/api/v1/appointments';
 const ITEMS_PER_PAGE = 10;
 let currentPage = 1;
 let totalAppointments = 0;
+// Cursors of the pages around the current one, from the last response
+let nextCursor = null;
+let prevCursor = null;
 let isLoading = false;
 
 // Get token from localStorage
@@ -68,17 +71,14 @@ function setupEventListeners() {
     
     // Pagination
     document.getElementById('prevPage').addEventListener('click', () => {
-        if (currentPage > 1) {
-            currentPage--;
-            loadAppointments();
+        if (currentPage > 1 && prevCursor) {
+            loadAppointments('prev');
         }
     });
     
     document.getElementById('nextPage').addEventListener('click', () => {
-        const maxPage = Math.ceil(totalAppointments / ITEMS_PER_PAGE);
-        if (currentPage < maxPage) {
-            currentPage++;
-            loadAppointments();
+        if (nextCursor) {
+            loadAppointments('next');
         }
     });
 }
@@ -114,8 +114,9 @@ async function loadDoctors() {
     }
 }
 
-// Load appointments with filters
-async function loadAppointments() {
+// Load appointments with filters. direction 'next' or 'prev' follows
+// the last page's cursor; otherwise the first page is loaded
+async function loadAppointments(direction) {
     if (isLoading) return;
 
     try {
@@ -124,13 +125,13 @@ async function loadAppointments() {
 
         const status = document.getElementById('statusFilter').value;
         const date = document.getElementById('dateFilter').value;
-        const offset = (currentPage - 1) * ITEMS_PER_PAGE;
+        const cursor = direction === 'next' ? nextCursor : direction === 'prev' ? prevCursor : null;
 
         const queryParams = new URLSearchParams({
-            limit: ITEMS_PER_PAGE,
-            offset: offset
+            limit: ITEMS_PER_PAGE
         });
 
+        if (cursor) queryParams.append('cursor', cursor);
         if (status) queryParams.append('status', status);
         if (date) queryParams.append('start_date', date);
 
@@ -146,7 +147,15 @@ async function loadAppointments() {
         }
 
         const data = await response.json();
-        totalAppointments = data.total;
+        // Only the first page carries a total; later pages keep it
+        if (cursor) {
+            currentPage += direction === 'next' ? 1 : -1;
+        } else {
+            currentPage = 1;
+            totalAppointments = data.total;
+        }
+        nextCursor = data.next_cursor;
+        prevCursor = data.prev_cursor;
         renderAppointments(data.items);
         updatePagination();
 
@@ -322,8 +331,8 @@ function updatePagination() {
     document.getElementById('totalAppointments').textContent = totalAppointments;
     
     // Update button states
-    document.getElementById('prevPage').disabled = currentPage === 1;
-    document.getElementById('nextPage').disabled = endRange >= totalAppointments;
+    document.getElementById('prevPage').disabled = currentPage === 1 || !prevCursor;
+    document.getElementById('nextPage').disabled = !nextCursor;
 }
 
 // Show notification using Toastify